@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Union
+
+
+class AccountCache:
+    """
+    Persistent cache mapping Gerrit user names to their account ID and if the account is active.
+    With a cached account ID the changes are queried directly by it, which saves the failing 'owner:<name>' request
+    for inactive accounts on every page and in every run. The least recently used entries are evicted once the cache
+    is full.
+    """
+
+    def __init__(self, path: str = None, maxSize: int = 100000) -> None:
+        """
+        Initializes the Cache and loads the entries of the file if it exists.
+
+        :param path: Optional. The path of the JSON file the cache is saved in. Without one it only lives in memory.
+        :type path: str
+        :param maxSize: Optional. The maximum amount of entries. Default is 100000.
+        :type maxSize: int
+        """
+        self.path = path
+        self.maxSize = maxSize
+
+        #user name -> [account id, active], in order of use
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for user, entry in json.load(f):
+                    self.entries[user] = tuple(entry)
+
+    def get(self, user: str) -> Optional[Tuple[int, bool]]:
+        """
+        Returns the cached account of the user.
+
+        :param user: The name of the user.
+        :type user: str
+        :return: The account id and if the account is active or None if the user isn't cached
+        :rtype: Tuple[int, bool]
+        """
+        with self.lock:
+            entry = self.entries.get(user)
+            if entry is not None:
+                self.entries.move_to_end(user)
+            return entry
+
+    def put(self, user: str, accountID: int, active: bool) -> None:
+        """
+        Caches the account of the user and evicts the least recently used entry if the cache is full.
+
+        :param user: The name of the user.
+        :type user: str
+        :param accountID: The account id of the user.
+        :type accountID: int
+        :param active: If the account is active.
+        :type active: bool
+        """
+        with self.lock:
+            self.entries[user] = (int(accountID), bool(active))
+            self.entries.move_to_end(user)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        Saves the cache into its file if it has one.
+        """
+        if not self.path:
+            return
+        with self.lock:
+            entries = list(self.entries.items())
+
+        #writes a temporary file first so an interrupted save doesn't destroy the cache
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(entries, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def preloadDevs(self, source: Union[str, Any], separator: str = ',') -> int:
+        """
+        Fills the cache from the allDevs output of earlier crawls.
+
+        :param source: Either the path of an allDevs.csv file or the allDevs MongoDB collection.
+        :type source: str or pymongo.collection.Collection
+        :param separator: Optional. The separator of the csv file. Default is ','.
+        :type separator: str
+        :return: The amount of cached users
+        :rtype: int
+        """
+        amount = 0
+        if isinstance(source, str):
+            with open(source) as f:
+                for line in f:
+                    #user, user-id, commits, active, the user name itself may contain the separator
+                    parts = line.rstrip("\n").rsplit(separator, 3)
+                    if len(parts) == 4 and parts[1].isdigit():
+                        self.put(parts[0], int(parts[1]), parts[3] == "True")
+                        amount += 1
+        else:
+            for dev in source.find({"user-id": {"$ne": None}}, {"author": 1, "user-id": 1, "active": 1}):
+                self.put(dev["author"], dev["user-id"], dev.get("active", True))
+                amount += 1
+        return amount
+
+    def preloadNoCommits(self, source: Any) -> int:
+        """
+        Fills the cache from the noCommits collection of earlier crawls. Only entries with a resolved 'user-id' can be
+        cached, the noCommitsUser.csv file doesn't contain the account ids.
+
+        :param source: The noCommits MongoDB collection.
+        :type source: pymongo.collection.Collection
+        :return: The amount of cached users
+        :rtype: int
+        """
+        amount = 0
+        for user in source.find({"user-id": {"$ne": None}}, {"author": 1, "user-id": 1, "active": 1}):
+            self.put(user["author"], user["user-id"], user.get("active", True))
+            amount += 1
+        return amount
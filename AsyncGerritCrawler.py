@@ -0,0 +1,462 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class AsyncGerritCrawler:
+    """
+    Asyncio engine that crawls the commits of many users of a GerritCrawler concurrently.
+    The number of requests in flight per host is bounded and all requests share one keep-alive connection pool.
+    The results are written through the GerritCrawler into the same folder and MongoDB outputs.
+    """
+
+    def __init__(self, crawler, concurrency: int = 8, prefetch: int = 2) -> None:
+        """
+        Initializes the engine for the given crawler.
+
+        :param crawler: The crawler whose handler performs the requests and which saves the results.
+        :type crawler: GerritCrawler.GerritCrawler
+        :param concurrency: Optional. The maximum amount of requests in flight per host. Default is 8.
+        :type concurrency: int
+        :param prefetch: Optional. The maximum amount of pages of a user requested ahead of the page being written.
+        Default is 2.
+        :type prefetch: int
+        """
+        self.crawler = crawler
+        self.handler = crawler.handler
+        self.concurrency = concurrency
+        self.prefetch = max(0, prefetch)
+
+        #users whose crawl failed in the last run
+        self.failedUsers = []
+
+        #one keep-alive pool for all requests, big enough for every request in flight
+        self.handler.session.poolSize(concurrency)
+
+        #per host limits, created inside the running event loop
+        self.hostLimits = {}
+        self.executor = None
+
+    def hostLimit(self, url: str) -> asyncio.Semaphore:
+        """
+        Returns the semaphore limiting the requests in flight to the host of the url.
+
+        :param url: The url of the request.
+        :type url: str
+        :return: The semaphore of the host
+        :rtype: asyncio.Semaphore
+        """
+        host = urlparse(url).netloc
+        if host not in self.hostLimits:
+            self.hostLimits[host] = asyncio.Semaphore(self.concurrency)
+        return self.hostLimits[host]
+
+    async def fetch(self, user: str, startPoint: int, since: str = None) -> Tuple[List[Dict], bool, bool, str]:
+        """
+        Requests one page of commits of the user without blocking the event loop.
+
+        :param user: The respective user of the request.
+        :type user: str
+        :param startPoint: The startpoint of the query.
+        :type startPoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
+        :return: The commits, if there are more commits to be requested, if the user is active and the server time of
+        the request
+        :rtype: Tuple[List[Dict], bool, bool, str]
+        """
+        async with self.hostLimit(self.handler.url):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.handler.getCommits, user, startPoint, since)
+
+    async def crawlUser(self, user: str) -> None:
+        """
+        Crawls all commits of one user page by page and saves them through the crawler.
+        The pages are written in order, while the following pages are already requested: the amount of pages in
+        flight grows by one with every page up to 1 + prefetch, so users with a few pages cause hardly any requests
+        past their last page. Pages requested past the last one are discarded.
+
+        :param user: The respective user of the request.
+        :type user: str
+        """
+        checkpoint = self.crawler.checkpoint
+        progress = checkpoint.gerritUser(user) if checkpoint else None
+
+        #skips users that are done already
+        if progress and progress[4]:
+            return
+
+        #in incremental crawls only the changes updated after the watermark are requested
+        watermark = self.crawler.watermarks.get(user) if self.crawler.watermarks else None
+        since = watermark["updated"] if watermark else None
+        latest = since
+
+        #continues after the last written page of an interrupted crawl
+        if progress and progress[0] is not None:
+            startPoint, userID, active, commitCounter, _ = progress
+            notDone = True
+        else:
+            startPoint = 0
+
+            commitsList, notDone, active, sent = await self.fetch(user, startPoint, since)
+
+            #handles no commits users and ends call, the watermark of users without changes since moves to the request
+            if not commitsList:
+                if not watermark:
+                    self.crawler.storeNoCommits(user, active)
+                    if self.crawler.watermarks:
+                        self.crawler.watermarks.set(user, {"updated": None, "commits": 0, "user-id": None})
+                elif since:
+                    self.crawler.watermarks.set(user, dict(watermark, updated=max(since, sent)))
+                if checkpoint:
+                    checkpoint.gerritDone(user)
+                return
+
+            #gets account id out of the commits list
+            userID = commitsList[0]['owner']['_account_id']
+            self.crawler.storeCommits(userID, commitsList)
+            commitCounter = watermark["commits"] if watermark else 0
+            commitCounter += self.countNew(commitsList, since)
+            #changes updated after the first page was requested are requested again by the next crawl
+            latest = max(self.latestUpdate(commitsList, latest) or "", sent)
+            if checkpoint:
+                checkpoint.gerritPage(user, startPoint, userID, active, commitCounter)
+
+        #loops request until all commits have been found, the next pages are requested ahead
+        pending = deque()
+        nextStart = startPoint
+        pages = 1
+        try:
+            while notDone:
+                while len(pending) < 1 + min(self.prefetch, pages - 1):
+                    nextStart += self.crawler.startpointIncrease
+                    pending.append((nextStart, asyncio.ensure_future(self.fetch(user, nextStart, since))))
+                startPoint, page = pending.popleft()
+                commitsList, notDone, active, _ = await page
+                pages += 1
+                self.crawler.storeCommits(userID, commitsList)
+                commitCounter += self.countNew(commitsList, since)
+                latest = self.latestUpdate(commitsList, latest)
+                if checkpoint:
+                    checkpoint.gerritPage(user, startPoint, userID, active, commitCounter)
+        finally:
+            #discards the pages requested past the last one
+            for _, page in pending:
+                #retrieves the error of a page that already failed, so it isn't reported as unhandled
+                if not page.cancel() and not page.cancelled():
+                    page.exception()
+            if pending:
+                self.crawler.metrics.inc("gerrit_prefetch_discarded_total", len(pending))
+
+        #puts user in dev collection with the count of commits
+        self.crawler.storeDev(user, userID, commitCounter, active)
+        if checkpoint:
+            checkpoint.gerritDone(user)
+
+        #stages the new watermark, it's committed once all outputs are flushed
+        if self.crawler.watermarks and latest:
+            self.crawler.watermarks.set(user, {"updated": latest, "commits": commitCounter, "user-id": userID})
+
+    async def fetchFused(self, users: List[str], startPoint: int,
+                         since: str = None) -> Tuple[Optional[List[Dict]], bool, Optional[str]]:
+        """
+        Requests one page of the commits of several users with one query without blocking the event loop.
+
+        :param users: The respective users of the request.
+        :type users: List[str]
+        :param startPoint: The startpoint of the query.
+        :type startPoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
+        :return: The commits or None if an inactive account failed the query, if there are more commits and the server
+        time of the request
+        :rtype: Tuple[List[Dict], bool, str]
+        """
+        async with self.hostLimit(self.handler.url):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.handler.getFusedCommits, users, startPoint, since,
+                                              self.crawler.startpointIncrease)
+
+    async def crawlBatch(self, users: List[str]) -> None:
+        """
+        Crawls the commits of several users with one query, which saves most requests for users with few commits.
+        The commits are assigned to the users by their account id, users without commits are saved as such. If
+        commits can't be assigned to a user, the users that weren't assigned are crawled with one query each instead,
+        like users that don't exist and fail the query. The users of a batch either have no watermark or are
+        incremental, then the query starts at the oldest watermark of the batch and only the commits created after a
+        user's own watermark are counted for it.
+
+        :param users: The respective users of the request.
+        :type users: List[str]
+        """
+        watermarks = self.crawler.watermarks
+        userWatermarks = {user: watermarks.get(user) if watermarks else None for user in users}
+        userSince = {user: watermark["updated"] if watermark else None for user, watermark in userWatermarks.items()}
+        since = min(userSince.values()) if all(userSince.values()) else None
+
+        #a failing inactive account is resolved and the query repeated, at most once per user
+        for _ in range(len(users) + 1):
+            resolved = sum(1 for user in users if self.handler.accounts.get(user))
+            commitsList, notDone, sent = await self.fetchFused(users, 0, since)
+            if commitsList is not None:
+                break
+
+            #a failing unknown user is crawled alone, which saves it as user without commits, and the query repeated
+            unknown = [user for user in users if user in self.handler.unknownUsers]
+            if unknown:
+                for user in unknown:
+                    await self.crawlUser(user)
+                users = [user for user in users if user not in unknown]
+                if not users:
+                    return
+                continue
+            if sum(1 for user in users if self.handler.accounts.get(user)) == resolved:
+                break
+
+        #falls back to one query per user if an account can't be resolved
+        if commitsList is None:
+            for user in users:
+                await self.crawlUser(user)
+            return
+
+        userIDs = {}
+        commitCounters = {user: watermark["commits"] if watermark else 0
+                          for user, watermark in userWatermarks.items()}
+        latest = dict(userSince)
+        startPoint = 0
+        unassigned = False
+
+        while True:
+            #groups the commits of the page by their owner
+            owners = {}
+            for commit in commitsList:
+                owners.setdefault(commit['owner']['_account_id'], []).append(commit)
+
+            for userID, commits in owners.items():
+                user = self.ownerOf(commits[0]['owner'], users, userIDs)
+                if user is None:
+                    #the commits are stored by the single queries of the unassigned users below
+                    unassigned = True
+                    continue
+                self.crawler.storeCommits(userID, commits)
+                commitCounters[user] += self.countNew(commits, userSince[user])
+                latest[user] = self.latestUpdate(commits, latest[user])
+
+            if not notDone:
+                break
+
+            #continues after the returned commits, the server may return less than requested
+            startPoint += len(commitsList)
+            commitsList, notDone, _ = await self.fetchFused(users, startPoint, since)
+            if commitsList is None:
+                raise RuntimeError('Fused query failed after its first page')
+
+        checkpoint = self.crawler.checkpoint
+        fallback = []
+        for user in users:
+            cached = self.handler.accounts.get(user)
+            active = cached[1] if cached else True
+            if user not in userIDs and unassigned:
+                #commits of the batch couldn't be assigned, they may belong to this user
+                fallback.append(user)
+                continue
+            if user in userIDs:
+                self.crawler.storeDev(user, userIDs[user], commitCounters[user], active)
+                #changes updated after the first page was requested are requested again by the next crawl
+                if watermarks:
+                    watermarks.set(user, {"updated": max(latest[user] or "", sent), "commits": commitCounters[user],
+                                          "user-id": userIDs[user]})
+            elif not userWatermarks[user]:
+                self.crawler.storeNoCommits(user, active)
+                if watermarks:
+                    watermarks.set(user, {"updated": None, "commits": 0, "user-id": None})
+            elif userSince[user]:
+                #the watermark of users without changes since moves to the request
+                watermarks.set(user, dict(userWatermarks[user], updated=max(userSince[user], sent)))
+            if checkpoint:
+                checkpoint.gerritDone(user)
+
+        if fallback:
+            print('Error: Commits of the batch could not be assigned to a user, crawling ' + str(fallback) +
+                  ' one by one')
+            for user in fallback:
+                await self.crawlUser(user)
+
+    def ownerOf(self, owner: Dict, users: List[str], userIDs: Dict[str, int]) -> Optional[str]:
+        """
+        Returns the user of the batch the owner of commits belongs to, by the cached account id or by the account id,
+        user name, email or full name of the account. The account id of the user is recorded in userIDs and cached.
+
+        :param owner: The owner of a commit, with account details.
+        :type owner: Dict
+        :param users: The users of the batch.
+        :type users: List[str]
+        :param userIDs: The account ids of the users assigned so far.
+        :type userIDs: Dict[str, int]
+        :return: The user or None if none of the users matches
+        :rtype: str
+        """
+        userID = owner['_account_id']
+        for user, assignedID in userIDs.items():
+            if assignedID == userID:
+                return user
+
+        names = {str(owner.get(field, '')).lower() for field in ('username', 'email', 'name')}
+        names.add(str(userID))
+        match = None
+        for user in users:
+            if user in userIDs:
+                continue
+            cached = self.handler.accounts.get(user)
+            if (cached and cached[0] == userID) or (not cached and user.lower() in names):
+                match = user
+                break
+
+        if match is not None:
+            userIDs[match] = userID
+            if not self.handler.accounts.get(match):
+                self.handler.accounts.put(match, userID, True)
+        return match
+
+    def batches(self, userList: List[str]) -> List:
+        """
+        Splits the users into the units of work: batches of users that are crawled with one query and single users
+        that are continued from a checkpoint. The batches respect the maximum amount of owners and URL length, users
+        with watermarks are batched by their watermark so the queries of a batch start close together.
+
+        :param userList: List of users.
+        :type userList: List
+        :return: The batches as lists of users and the single users as str
+        :rtype: List
+        """
+        checkpoint = self.crawler.checkpoint
+        watermarks = self.crawler.watermarks
+        units = []
+        fresh = []
+        incremental = []
+        for user in userList:
+            progress = checkpoint.gerritUser(user) if checkpoint else None
+            if progress and progress[4]:
+                continue
+            if progress and progress[0] is not None:
+                units.append(user)
+            elif watermarks and watermarks.get(user) and watermarks.get(user)["updated"]:
+                incremental.append(user)
+            else:
+                fresh.append(user)
+        incremental.sort(key=lambda user: watermarks.get(user)["updated"])
+
+        #users are added to a batch while the longest url of it stays short enough
+        since = '0' * 19
+        for group, groupSince in ((fresh, None), (incremental, since)):
+            batch = []
+            for user in group:
+                url = self.handler.buildFusedURL(batch + [user], 10 ** 9, groupSince, self.crawler.startpointIncrease)
+                if batch and (len(batch) >= self.crawler.fuseOwners or len(url) > self.crawler.maxURLLength):
+                    units.append(batch)
+                    batch = []
+                batch.append(user)
+            if batch:
+                units.append(batch)
+        return units
+
+    @staticmethod
+    def countNew(commitsList: List[Dict], since: str = None) -> int:
+        """
+        Counts the changes that weren't counted by an earlier crawl, i.e. the ones created after the watermark.
+
+        :param commitsList: The changes of a page.
+        :type commitsList: List[Dict]
+        :param since: The watermark of an incremental crawl or None.
+        :type since: str
+        :return: The amount of new changes
+        :rtype: int
+        """
+        if not since:
+            return len(commitsList)
+        return sum(1 for commit in commitsList if commit.get('created', since) > since)
+
+    @staticmethod
+    def latestUpdate(commitsList: List[Dict], latest: str = None) -> str:
+        """
+        Returns the latest update time of the changes and latest.
+
+        :param commitsList: The changes of a page.
+        :type commitsList: List[Dict]
+        :param latest: The latest update time so far or None.
+        :type latest: str
+        :return: The latest update time
+        :rtype: str
+        """
+        for commit in commitsList:
+            if 'updated' in commit and (latest is None or commit['updated'] > latest):
+                latest = commit['updated']
+        return latest
+
+    async def crawl(self, userList: List[str]) -> List[str]:
+        """
+        Crawls the commits of all users concurrently. Users are handed out through a queue so that only as many user
+        crawls as requests allowed in flight are active at the same time.
+
+        :param userList: List of users.
+        :type userList: List
+        :return: The users whose crawl failed
+        :rtype: List[str]
+        """
+        self.failedUsers = []
+        self.hostLimits = {}
+
+        #fused queries crawl batches of users at once
+        units = self.batches(userList) if self.crawler.fuseOwners > 1 else list(userList)
+
+        queue = asyncio.Queue()
+        for unit in units:
+            queue.put_nowait(unit)
+
+        async def worker() -> None:
+            while True:
+                try:
+                    unit = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                self.crawler.metrics.gauge("crawler_queue_depth", queue.qsize(), queue="gerrit_users")
+                try:
+                    if isinstance(unit, list):
+                        await self.crawlBatch(unit)
+                    else:
+                        await self.crawlUser(unit)
+                except Exception as e:
+                    print('Error: Crawling the commits of ' + str(unit) + ' failed: ' + repr(e))
+                    self.failedUsers += unit if isinstance(unit, list) else [unit]
+
+        #the blocking requests run in threads sharing the session
+        self.executor = ThreadPoolExecutor(self.concurrency)
+        try:
+            await asyncio.gather(*[worker() for _ in range(min(self.concurrency, max(len(units), 1)))])
+        finally:
+            self.executor.shutdown()
+            self.executor = None
+
+        if self.failedUsers:
+            print('Error: ' + str(len(self.failedUsers)) + ' users could not be crawled: ' + str(self.failedUsers))
+        return self.failedUsers
+
+    def run(self, userList: List[str]) -> List[str]:
+        """
+        Runs crawl in a new event loop and blocks until all users are crawled. Called from a running event loop
+        (e.g. in Jupyter), where asyncio.run is not possible, the crawl runs in the event loop of a separate thread and
+        the calling loop is blocked meanwhile, so coroutines should await crawl instead.
+
+        :param userList: List of users.
+        :type userList: List
+        :return: The users whose crawl failed
+        :rtype: List[str]
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.crawl(userList))
+        with ThreadPoolExecutor(1) as executor:
+            return executor.submit(asyncio.run, self.crawl(userList)).result()
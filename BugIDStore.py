@@ -0,0 +1,177 @@
+import os
+import pickle
+import struct
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+#the header of an ID file: magic and amount of IDs, followed by the IDs as little-endian int64
+MAGIC = b"BUGIDS01"
+HEADER = struct.Struct("<8sQ")
+DTYPE = np.dtype("<i8")
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    """
+    Unpickler for the bug ID lists of older versions, which are plain lists of ints. It refuses to load any class or
+    function, so a manipulated pickle can't run code.
+    """
+
+    def find_class(self, module: str, name: str) -> None:
+        raise pickle.UnpicklingError("Bug ID pickles may only contain a list of ints, found " + module + "." + name)
+
+
+class BugIDStore:
+    """
+    Compact list of bug IDs backed by an int64 array. Saved as a file with a small header that is memory-mapped on
+    load, so millions of IDs neither have to be read nor unpickled before crawling. Slices (e.g. shards for several
+    workers or nodes) are views without copying. Set operations keep the order of the IDs.
+    """
+
+    def __init__(self, ids: Union[Iterable, np.ndarray] = ()) -> None:
+        """
+        Initializes the Store with the IDs.
+
+        :param ids: Optional. The bug IDs, a numpy array is used without copying if it already has int64 elements.
+        Default is no IDs.
+        :type ids: Iterable or np.ndarray
+        """
+        if isinstance(ids, BugIDStore):
+            ids = ids.ids
+        elif not isinstance(ids, np.ndarray):
+            ids = np.fromiter((int(id) for id in ids), dtype=DTYPE)
+        self.ids = ids.astype(DTYPE, copy=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BugIDStore":
+        """
+        Memory-maps an ID file written by save.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The IDs of the file
+        :rtype: BugIDStore
+        """
+        with open(path, "rb") as f:
+            magic, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(path + " is no bug ID file.")
+        if not count:
+            return cls()
+        return cls(np.memmap(path, dtype=DTYPE, mode="r", offset=HEADER.size, shape=(count,)))
+
+    @classmethod
+    def importLegacy(cls, path: str) -> "BugIDStore":
+        """
+        Reads the bug ID lists of older versions, a pickled list (bugIDListP.pickle) or a CSV file with one ID per
+        line (bugIDList.csv).
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The IDs of the file
+        :rtype: BugIDStore
+        """
+        with open(path, "rb") as f:
+            if ".pickle" in path:
+                return cls(LegacyUnpickler(f).load())
+            return cls(np.array(f.read().split(), dtype=DTYPE))
+
+    @classmethod
+    def open(cls, path: str) -> "BugIDStore":
+        """
+        Opens an ID file or imports a legacy pickle or CSV file, depending on the name.
+
+        :param path: The path of the file.
+        :type path: str
+        :return: The IDs of the file
+        :rtype: BugIDStore
+        """
+        if ".pickle" in path or path.endswith(".csv"):
+            return cls.importLegacy(path)
+        return cls.load(path)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the IDs into a file that can be memory-mapped by load.
+
+        :param path: The path of the file.
+        :type path: str
+        """
+        #writes a temporary file first, so the file isn't destroyed by an interrupted save or while it is mapped
+        with open(path + ".tmp", "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(self.ids)))
+            f.write(self.ids.tobytes())
+        os.replace(path + ".tmp", path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(id) for id in self.ids)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, "BugIDStore"]:
+        """
+        Returns the ID at the index or the IDs of the slice as view.
+        """
+        if isinstance(index, slice):
+            return BugIDStore(self.ids[index])
+        return int(self.ids[index])
+
+    def __contains__(self, id: int) -> bool:
+        return bool((self.ids == int(id)).any())
+
+    def tolist(self) -> list:
+        """
+        Returns the IDs as list of ints.
+        """
+        return self.ids.tolist()
+
+    def shard(self, index: int, count: int) -> "BugIDStore":
+        """
+        Returns one of count disjoint, contiguous ranges of the IDs as view, e.g. for one of several nodes.
+
+        :param index: The index of the shard, from 0 to count - 1.
+        :type index: int
+        :param count: The amount of shards.
+        :type count: int
+        :return: The IDs of the shard
+        :rtype: BugIDStore
+        """
+        if not 0 <= index < count:
+            raise ValueError("The shard index needs to be between 0 and " + str(count - 1) + ".")
+        return self[len(self) * index // count:len(self) * (index + 1) // count]
+
+    def batches(self, size: int) -> Iterator["BugIDStore"]:
+        """
+        Yields the IDs in consecutive views of at most size IDs.
+        """
+        for start in range(0, len(self), size):
+            yield self[start:start + size]
+
+    @staticmethod
+    def asArray(ids: Union["BugIDStore", Iterable]) -> np.ndarray:
+        """
+        Returns the IDs of a store or an iterable as int64 array.
+        """
+        return BugIDStore(ids).ids
+
+    def difference(self, other: Union["BugIDStore", Iterable]) -> "BugIDStore":
+        """
+        Returns the IDs that are not in other, e.g. the bugs whose comments aren't crawled yet.
+        """
+        return BugIDStore(self.ids[~np.isin(self.ids, self.asArray(other))])
+
+    def intersection(self, other: Union["BugIDStore", Iterable]) -> "BugIDStore":
+        """
+        Returns the IDs that are also in other.
+        """
+        return BugIDStore(self.ids[np.isin(self.ids, self.asArray(other))])
+
+    def union(self, other: Union["BugIDStore", Iterable]) -> "BugIDStore":
+        """
+        Returns the IDs followed by the IDs of other that are new, each only once.
+        """
+        other = self.asArray(other)
+        other = other[~np.isin(other, self.ids)]
+        _, first = np.unique(other, return_index=True)
+        return BugIDStore(np.concatenate((self.ids, other[np.sort(first)])))
@@ -1,15 +1,36 @@
 import requests
-import pprint
-import ast
 import os
 import pickle
-from pymongo import MongoClient
-from pymongo.database import Database
-from tqdm import tqdm
-from multiprocessing.pool import ThreadPool as Pool
-import numpy as np
-from typing import List, Union, Dict, Optional, Tuple
+import array
+import queue
+import threading
+import time
+from typing import List, Union, Dict, Optional, Tuple, TYPE_CHECKING
 import enum
+from collections import defaultdict, deque
+from urllib.parse import quote
+import ResponseDecoder
+import FileSink
+import CheckpointStore
+import WatermarkStore
+import SummaryStore
+import HttpClient
+import Metrics
+import ParquetSink
+from LazyImport import LazyImport
+
+#heavy dependencies are imported when they are used first
+np = LazyImport("numpy")
+tqdm = LazyImport("tqdm", "tqdm")
+Pool = LazyImport("multiprocessing.pool", "ThreadPool")
+multiprocessing = LazyImport("multiprocessing")
+ProcessPoolExecutor = LazyImport("concurrent.futures", "ProcessPoolExecutor")
+MongoSink = LazyImport("MongoSink")
+BugIDStore = LazyImport("BugIDStore")
+
+if TYPE_CHECKING:
+    from pymongo.database import Database
+    import WorkQueue
 
 class CrawlMode(enum.IntEnum):
     """
@@ -21,6 +42,54 @@ class CrawlMode(enum.IntEnum):
     CFAST = 3
     BFAST = 4
     NO = 5
+    CPIPE = 6
+    BPIPE = 7
+
+#fields the crawler needs from every bug and comment, they are always requested
+REQUIRED_BUG_FIELDS = ["id", "last_change_time"]
+REQUIRED_COMMENT_FIELDS = ["id", "bug_id", "creation_time"]
+#format of the timestamps of Bugzilla
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def decode_comments(data: bytes, idBatch: List, decoder: ResponseDecoder.ResponseDecoder, documents: bool,
+                    lines: bool) -> Tuple[Optional[List[Dict]], bytes, Dict[int, Optional[str]], List, float]:
+    """
+    Decodes the response of a comment request and normalises it into the comments of the batch. Runs in the decode
+    processes of get_all_comments_pipeline, so it only returns what the writer needs.
+
+    :param data: The body of the response.
+    :type data: bytes
+    :param idBatch: The bug IDs of the request.
+    :type idBatch: List
+    :param decoder: The decoder of the crawler.
+    :type decoder: ResponseDecoder.ResponseDecoder
+    :param documents: If the comments are returned as documents (for the MongoDB, the Parquet dataset or the
+    summary).
+    :type documents: bool
+    :param lines: If the comments are returned encoded as JSON Lines (for the file).
+    :type lines: bool
+    :return: The comments or None, the JSON Lines, the latest creation time of the comments per bug of the response,
+    the bug IDs missing in the response and the seconds it took
+    :rtype: Tuple[List[Dict], bytes, Dict[int, str], List, float]
+    """
+    start = time.perf_counter()
+    bugs = decoder.loads(data)["bugs"]
+    comments = [comment for id in idBatch for comment in (bugs.get(str(id)) or {}).get("comments", [])]
+    latest = {id: latest_comment((bugs[str(id)] or {}).get("comments", [])) for id in idBatch if str(id) in bugs}
+    encoded = b"".join(decoder.dumps(comment) + b"\n" for comment in comments) if lines else b""
+    missing = [id for id in idBatch if str(id) not in bugs]
+    return (comments if documents else None), encoded, latest, missing, time.perf_counter() - start
+
+def latest_comment(comments: List[Dict]) -> Optional[str]:
+    """
+    Returns the creation time of the latest of the comments of a bug or None if it has none.
+
+    :param comments: The comments of the bug.
+    :type comments: List[Dict]
+    :return: The latest creation time
+    :rtype: str
+    """
+    return max((comment.get("creation_time") or "" for comment in comments), default=None) or None
 
 #class to crawl Bugzilla bugs and comments
 class BugzillaCrawler:
@@ -35,9 +104,26 @@ class BugzillaCrawler:
                  loginPW: str = None,
                  furtherparams: str = None,
                  workers: int = 10,
-                 mongoDB: Database = None,
+                 mongoDB: "Database" = None,
                  foldername: str = None,
-                 bugList: Union[List, str] = None) -> None:
+                 bugList: Union[List, "BugIDStore.BugIDStore", str] = None,
+                 commentBatchSize: int = 1,
+                 compression: str = None,
+                 checkpoint: str = None,
+                 watermarks: str = None,
+                 httpClient: HttpClient.HttpClient = None,
+                 includeFields: List[str] = None,
+                 excludeFields: List[str] = None,
+                 commentFields: List[str] = None,
+                 pageBytes: int = 2 * 1024 * 1024,
+                 maxPageSize: int = 10000,
+                 decoders: int = None,
+                 pipelineQueue: int = 64,
+                 fileFormat: str = "jsonl",
+                 partitionBy: str = None,
+                 metrics: Metrics.Metrics = None,
+                 metricsFile: str = None,
+                 summary: str = None) -> None:
         """
         Initializes the Crawler and decides which action to take based on the mode.
 
@@ -51,6 +137,8 @@ class BugzillaCrawler:
         CFAST -> like COMMENT but with parallelisation. In the default 10 workers are used, can be changed in param workers.
         BFAST -> like BOTH but with parallelisation. In the default 10 workers are used, can be changed in param workers.
         NO -> No action is taken. The object just gets initialized.
+        CPIPE -> like CFAST but the responses are decoded in separate processes, see get_all_comments_pipeline.
+        BPIPE -> like BFAST but the comments are crawled like in CPIPE.
         :type mode: CrawlMode
         :param loginUrl: Optional. If a login is required to access the data, the login url.
         :type loginUrl: str
@@ -64,16 +152,96 @@ class BugzillaCrawler:
         :type workers: int
         :param mongoDB: Optional. If the data should be saved into collection in the here entered MongoDB
         :type mongoDB: pymongo.database.Database
-        :param foldername: Optional. If the data should be saved as files (txt, csv), enter the folder name here.
+        :param foldername: Optional. If the data should be saved as files (JSON Lines, csv), enter the folder name here.
         :type foldername: str
-        :param bugList: Optional. Needed for the COMMENT and CFAST mode. Either a list object or the name of a pickle
-        object as a string (needs to contain .pickle) where bug IDS are saved in.
-        :type bugList: List or str
+        :param bugList: Optional. Needed for the COMMENT and CFAST mode. Either a list object, a BugIDStore (e.g. a
+        shard of one) or the name of a file where bug IDS are saved in (an ID file like bugIDList.ids, a pickle file
+        containing .pickle or a csv file).
+        :type bugList: List, BugIDStore.BugIDStore or str
+        :param commentBatchSize: Optional. The amount of bugs whose comments are requested together with one request.
+        Batches that fail are split and retried. Default is 1.
+        :type commentBatchSize: int
+        :param compression: Optional. Compresses the files in the folder on the fly, either 'gzip' or 'zstd'.
+        :type compression: str
+        :param checkpoint: Optional. The path of a checkpoint file. If given, the progress is recorded in it and a
+        restarted crawl continues after the last written bug page and skips the bugs whose comments are written.
+        :type checkpoint: str
+        :param watermarks: Optional. The path of a watermark file. If given, the crawl is incremental: the server time
+        at which the crawl of the bugs started and per bug the time its comments were requested (or its latest comment
+        if newer) are stored in it and the next crawl only requests the bugs changed since (last_change_time) and their
+        new comments (new_since).
+        Batches with a bug that wasn't crawled yet request all comments. They are merged into the outputs (upserted
+        into the MongoDB, appended to the files).
+        :type watermarks: str
+        :param httpClient: Optional. The HTTP client performing the requests with adaptive rate limits and retries. It
+        can be shared with other crawlers. Default is a new client.
+        :type httpClient: HttpClient.HttpClient
+        :param includeFields: Optional. Only these fields of the bugs are requested (include_fields), e.g. ['id',
+        'status', 'creation_time']. The fields the crawler needs are always added.
+        :type includeFields: List[str]
+        :param excludeFields: Optional. These fields of the bugs are not requested (exclude_fields), e.g.
+        ['cc_detail', 'flags'].
+        :type excludeFields: List[str]
+        :param commentFields: Optional. Only these fields of the comments are requested (include_fields), e.g.
+        ['creator', 'text']. The fields the crawler needs are always added.
+        :type commentFields: List[str]
+        :param pageBytes: Optional. The size of a bug page in bytes the page size is tuned to, so smaller bugs (e.g.
+        because of includeFields) are requested with fewer requests. Default is 2 MiB.
+        :type pageBytes: int
+        :param maxPageSize: Optional. The maximum amount of bugs per page. A lower maximum of the server is detected.
+        Default is 10000.
+        :type maxPageSize: int
+        :param decoders: Optional. The amount of processes decoding the comments in the CPIPE and BPIPE modes, started
+        through a fork server, so scripts using these modes need an if __name__ == "__main__" guard. Default is the
+        amount of CPUs.
+        :type decoders: int
+        :param pipelineQueue: Optional. The maximum amount of responses waiting between the stages of the CPIPE and
+        BPIPE modes. Default is 64.
+        :type pipelineQueue: int
+        :param fileFormat: Optional. The format of the documents in the folder, either 'jsonl' (JSON Lines) or
+        'parquet' (Parquet datasets, needs the pyarrow package, see ParquetSink). The compression of the Parquet files
+        is the compression parameter, zstd if not given. Default is 'jsonl'.
+        :type fileFormat: str
+        :param partitionBy: Optional. Partitions the Parquet datasets by 'month' or 'account'. Default is no
+        partitioning.
+        :type partitionBy: str
+        :param metrics: Optional. Collects the request latencies, bytes, parse and flush times, retries and queue
+        depths, hooks can be registered on it. Default are new metrics, available as the metrics attribute.
+        :type metrics: Metrics.Metrics
+        :param metricsFile: Optional. The metrics are written into this file after the crawl of the mode (see
+        dump_metrics), in the Prometheus text format if it ends with .prom, else as JSON.
+        :type metricsFile: str
+        :param summary: Optional. The path of a summary file. If given, the comments per bug and per author and the
+        first and last activity of the bugs and authors are maintained in it while crawling, see SummaryStore.
+        :type summary: str
         """
+        #metrics of the crawl
+        self.metrics = metrics if metrics is not None else Metrics.Metrics()
+        self.metricsFile = metricsFile
+
+        #rate limits and retries the requests
+        self.session = httpClient if httpClient is not None else HttpClient.HttpClient()
+        if self.session.metrics is None:
+            self.session.metrics = self.metrics
+
+        #decodes the responses with the fastest available JSON backend
+        self.decoder = ResponseDecoder.defaultDecoder
+
+        #amount of bugs per comment request
+        self.commentBatchSize = max(1, commentBatchSize)
+
+        #work queue and workers of a running get_all_comments_mp
+        self.workQueue = None
+        self.workerThreads = {}
+        self.failedIDs = []
+        self.lock = threading.Lock()
 
-        self.session = requests.session()
+        #amount of workers and matching connection pool size
+        self.set_workers(workers)
 
-        self.workers = workers
+        #stage sizes of the comment pipeline
+        self.decoders = decoders or os.cpu_count() or 1
+        self.pipelineQueue = pipelineQueue
 
         if loginUrl:
             #bugzilla user data
@@ -88,24 +256,73 @@ class BugzillaCrawler:
         if restUrl[-1] != '/':
             restUrl += '/'
 
-        #prepares URLs for crawling of bugs and comments
-        self.bugURL = restUrl + 'bug?limit=500' + furtherparams
+        #projection of the bugs and comments
+        bugFields = ''
+        if includeFields:
+            bugFields += '&include_fields=' + ','.join(dict.fromkeys(list(includeFields) + REQUIRED_BUG_FIELDS))
+        if excludeFields:
+            bugFields += '&exclude_fields=' + ','.join(f for f in excludeFields if f not in REQUIRED_BUG_FIELDS)
+        self.commentFields = None
+        if commentFields:
+            #the summary counts the comments per author
+            required = REQUIRED_COMMENT_FIELDS + (["creator"] if summary else [])
+            self.commentFields = ','.join(dict.fromkeys(list(commentFields) + required))
+
+        #page size, tuned to the size of the bugs while crawling
+        self.pageSize = 500
+        self.pageBytes = pageBytes
+        self.maxPageSize = maxPageSize
+        self.bugBytes = None
+
+        #prepares URLs for crawling of bugs and comments, the limit is added per page
+        self.bugURL = restUrl + 'bug?' + (furtherparams or '').lstrip('&') + bugFields
         self.commentURL = restUrl + 'bug/{}/comment'
 
         #database if given one
         self.mongoDB = mongoDB
+        if mongoDB is not None:
+            #buffers the documents and upserts them in bulk
+            self.mongoSink = MongoSink.MongoSink(mongoDB)
 
         #foldername if given one
         self.folder = foldername
+        self.parquetSink = None
         if foldername:
             #creates directory
             self.createFolder(foldername)
             self.folderpath = foldername + '/'
 
+            #keeps the files open with large buffers and serialises the writes of the workers
+            self.sink = FileSink.FileSink(self.folderpath, compression if fileFormat == "jsonl" else None)
+
+            #writes the bugs and comments as Parquet datasets instead of JSON Lines
+            if fileFormat == "parquet":
+                self.parquetSink = ParquetSink.ParquetSink(self.folderpath, partitionBy, compression or "zstd")
+            elif fileFormat != "jsonl":
+                raise ValueError("Unknown file format '{}', choices are jsonl and parquet".format(fileFormat))
+
+        #records the progress of the crawl if a checkpoint file is given
+        self.checkpoint = None
+        if checkpoint:
+            self.checkpoint = CheckpointStore.CheckpointStore(checkpoint, self.bugURL, beforeCommit=self.flush_sinks)
+
+        #stores the watermarks of incremental crawls if a watermark file is given
+        self.watermarks = None
+        if watermarks:
+            self.watermarks = WatermarkStore.WatermarkStore(watermarks, self.bugURL)
+
+        #maintains the aggregates of the crawl if a summary file is given
+        self.summary = None
+        if summary:
+            self.summary = SummaryStore.SummaryStore(summary, self.bugURL)
+        self.bugsSince = None
+        self.bugsStart = None
+
         #checks on which crawl operation to execute
         self.decide_action(mode, bugList)
 
-    def decide_action(self, mode: CrawlMode = CrawlMode.NO, bugList: Union[List, str] = None) -> None:
+    def decide_action(self, mode: CrawlMode = CrawlMode.NO,
+                      bugList: Union[List, "BugIDStore.BugIDStore", str] = None) -> List:
         """
         Decides which action to start depending on the mode.
 
@@ -117,154 +334,731 @@ class BugzillaCrawler:
         CFAST -> like COMMENT but with parallelisation. In the default 10 workers are used, can be changed in param workers.
         BFAST -> like BOTH but with parallelisation. In the default 10 workers are used, can be changed in param workers.
         NO -> No action is taken. The object just gets initialized.
+        CPIPE -> like CFAST but the responses are decoded in separate processes, see get_all_comments_pipeline.
+        BPIPE -> like BFAST but the comments are crawled like in CPIPE.
         :type mode: CrawlMode
-        :param bugList: Optional. Needed for the COMMENT and CFAST mode. Either a list object or the name of a pickle
-        object as a string (needs to contain .pickle) where bug IDS are saved in.
-        :type bugList: List or str
+        :param bugList: Optional. Needed for the COMMENT and CFAST mode. Either a list object, a BugIDStore (e.g. a
+        shard of one) or the name of a file where bug IDS are saved in (an ID file like bugIDList.ids, a pickle file
+        containing .pickle or a csv file).
+        :type bugList: List, BugIDStore.BugIDStore or str
+        :return: The bug IDs whose comments could not be crawled
+        :rtype: List
         """
         # checks on which crawl operation to execute
-        if mode == CrawlMode.BUG:
-            self.get_all_bugs()
-        elif mode == CrawlMode.COMMENT:
-            if bugList:
-                self.get_all_comments(bugList)
+        failedIDs = []
+        try:
+            if mode == CrawlMode.BUG:
+                self.get_all_bugs()
+            elif mode == CrawlMode.COMMENT:
+                if bugList:
+                    failedIDs = self.get_all_comments(bugList)
+                else:
+                    print('Error: No buglist to be found. Please check your params and start again.')
+                    return []
+            elif mode == CrawlMode.BOTH:
+                bugIDList = self.get_all_bugs()
+                failedIDs = self.get_all_comments(bugIDList)
+            elif mode == CrawlMode.CFAST:
+                failedIDs = self.get_all_comments_mp(bugList, self.workers)
+            elif mode == CrawlMode.BFAST:
+                bugsIDList = self.get_all_bugs()
+                failedIDs = self.get_all_comments_mp(bugsIDList, self.workers)
+            elif mode == CrawlMode.CPIPE:
+                failedIDs = self.get_all_comments_pipeline(bugList)
+            elif mode == CrawlMode.BPIPE:
+                bugsIDList = self.get_all_bugs()
+                failedIDs = self.get_all_comments_pipeline(bugsIDList)
             else:
-                print('Error: No buglist to be found. Please check your params and start again.')
-                return
-        elif mode == CrawlMode.BOTH:
-            bugIDList = self.get_all_bugs()
-            self.get_all_comments(bugIDList)
-        elif mode == CrawlMode.CFAST:
-            self.get_all_comments_mp(bugList, self.workers)
-        elif mode == CrawlMode.BFAST:
-            bugsIDList = self.get_all_bugs()
-            self.get_all_comments_mp(bugsIDList, self.workers)
-        else:
-            return
+                return []
+        finally:
+            self.dump_metrics()
+
+        #only interrupted or failed crawls are continued, the next run of a finished one starts over
+        if self.checkpoint and not failedIDs:
+            self.checkpoint.reset()
+        return failedIDs
 
-    def get_all_bugs(self) -> List:
+    @Metrics.profiled("get_all_bugs")
+    def get_all_bugs(self) -> "BugIDStore.BugIDStore":
         """
         Crawls all requested bug data and bug ids.
-        Saves them in files (bugIDListP.pickle, bugIDList.csv, bugsData.txt ) and/or
-        Mongo DB collections (BugIDs, BugsData) depending if they are given at initialization.
+        The pages are requested concurrently by speculatively fetching ahead (as many pages in flight as workers)
+        until an empty page comes back. Each page is streamed directly into the files (bugIDList.csv, bugsData.jsonl)
+        and/or Mongo DB collections (BugIDs, BugsData) depending if they are given at initialization, only the bug IDs
+        are kept in memory as int64 array. At the end they are saved into bugIDList.ids (see BugIDStore).
 
-        :return: returns a List object where the bug IDs are saved
-        :rtype: List
+        :return: returns a BugIDStore object where the bug IDs are saved
+        :rtype: BugIDStore.BugIDStore
         """
         #starting point
         offset = 0
-        #list for all bugs
-        resultBugList = []
-        #list for bug IDs
-        bugIDList = []
-        #checks if there are still results returned
-        notEmpty = True
-
-        #queries in 500 bug steps until the result list is empty
-        while notEmpty:
-            print("entered")
-            #interpretation of result as list plus formatting for eval errors
-            result = ast.literal_eval(self.session.get(self.bugURL + "&offset=" + str(offset)).text.
-                                      replace('true', 'True').replace('false', 'False').replace('null', 'None'))["bugs"]
-            #checks if the query needs to be set again with a new offset
-            if result:
-                resultBugList += result
+        #compact array for bug IDs
+        bugIDList = array.array("q")
+
+        #takes over the pages written by an earlier, interrupted crawl
+        pages = self.checkpoint.bugPages() if self.checkpoint else {}
+        if self.checkpoint and self.checkpoint.getState("bugs") == "done":
+            return BugIDStore.BugIDStore(id for pageOffset in sorted(pages) for id in pages[pageOffset])
+        while offset in pages and pages[offset]:
+            bugIDList.extend(pages[offset])
+            offset += len(pages[offset])
+
+        #in incremental crawls only the bugs changed since the watermark are requested
+        watermark = self.watermarks.get("bugs") if self.watermarks else None
+        self.bugsSince = watermark["last_change_time"] if watermark else None
+        #the server time of the first request, bugs changed after it are requested again by the next crawl
+        self.bugsStart = self.checkpoint.getState("bugsStart") if self.checkpoint else None
+        complete = False
+
+        #overwrites the files of an earlier crawl or continues them
+        if self.folder:
+            mode = "a" if bugIDList or watermark else "w"
+            #incremental crawls add the new IDs to the ID list at the end, the changed bugs are mostly listed already
+            if not watermark:
+                self.sink.open("bugIDList.csv", mode)
+            if self.parquetSink:
+                self.parquetSink.open("bugs", mode)
             else:
-                notEmpty = False
+                self.sink.open("bugsData.jsonl", mode)
+
+        pool = Pool(self.workers)
+        try:
+            #requests the first pages speculatively
+            pending = deque()
+            for _ in range(self.workers):
+                pending.append((offset, self.pageSize, pool.apply_async(self.get_bug_page, (offset, self.pageSize))))
+                offset += self.pageSize
+
+            with tqdm(unit=" bugs", initial=len(bugIDList)) as progress:
+                #handles the pages in order until an empty one comes back
+                while pending:
+                    pageOffset, limit, page = pending.popleft()
+                    result = page.get()
+                    self.metrics.gauge("crawler_queue_depth", len(pending), queue="bug_pages")
+                    if not result:
+                        if self.checkpoint:
+                            self.checkpoint.setState("bugs", "done")
+                        complete = True
+                        break
+
+                    #a short page is either the last one or the maximum of the server, the pages in flight are then
+                    #discarded and requested again after it with the page size of the server
+                    if len(result) < limit:
+                        self.maxPageSize = len(result)
+                        pending.clear()
+                        offset = pageOffset + len(result)
+                    self.tune_page_size()
+
+                    #requests the next pages to keep the amount of pages in flight
+                    while len(pending) < self.workers:
+                        pending.append((offset, self.pageSize,
+                                        pool.apply_async(self.get_bug_page, (offset, self.pageSize))))
+                        offset += self.pageSize
+
+                    #gets the ID out of all bugs
+                    partList = [bug["id"] for bug in result]
+                    bugIDList.extend(partList)
+
+                    self.store_bugs(result, partList)
+                    if self.checkpoint:
+                        if self.bugsStart != self.checkpoint.getState("bugsStart"):
+                            self.checkpoint.setState("bugsStart", self.bugsStart)
+                        self.checkpoint.bugPage(pageOffset, partList)
+                    progress.update(len(partList))
+        finally:
+            #discards the speculative requests past the end
+            pool.terminate()
+            self.save_progress()
 
-            #gets the ID out of all comments
-            partList = [bug["id"] for bug in result]
-            bugIDList += partList
-            #sets new starting point
-            offset += 500
+        #moves the watermark to the start of the crawl once all changed bugs are written
+        if self.watermarks and complete and self.bugsStart:
+            self.watermarks.set("bugs", {"last_change_time": self.bugsStart})
+            self.watermarks.commit()
+
+        bugIDs = BugIDStore.BugIDStore(np.frombuffer(bugIDList, dtype="q"))
+
+        #saves the bug IDs as ID file, incremental crawls add the new IDs to the ones of the earlier crawl (also if
+        #it only left the pickled list of older versions)
+        if self.folder:
+            allIDs = bugIDs
+            if watermark:
+                earlierIDs = BugIDStore.BugIDStore()
+                for name in ("bugIDList.ids", "bugIDListP.pickle"):
+                    if os.path.exists(self.folderpath + name):
+                        earlierIDs = BugIDStore.BugIDStore.open(self.folderpath + name)
+                        break
+                allIDs = earlierIDs.union(bugIDs)
+                self.sink.open("bugIDList.csv", "a")
+                self.sink.writeLines("bugIDList.csv", [str(id) for id in allIDs[len(earlierIDs):]])
+                self.sink.flush()
+            allIDs.save(self.folderpath + "bugIDList.ids")
+
+        #returns the IDs for further processing, in incremental crawls only the changed bugs
+        return(bugIDs)
+
+    def get_bug_page(self, offset: int, limit: int = None) -> List[Dict]:
+        """
+        Requests one page of bugs.
+
+        :param offset: The offset of the page.
+        :type offset: int
+        :param limit: Optional. The amount of bugs of the page. Default is the current page size.
+        :type limit: int
+        :return: The bugs of the page, an empty list after the last page
+        :rtype: List[Dict]
+        """
+        url = self.bugURL + "&limit=" + str(limit or self.pageSize)
+        if self.bugsSince:
+            url += "&last_change_time=" + quote(self.bugsSince)
+
+        #decodes the bugs of the page, big pages incrementally from the stream
+        response = self.session.get(url + "&offset=" + str(offset), stream=True)
+        response.raise_for_status()
+        sent = HttpClient.HttpClient.requestTime(response).strftime(TIME_FORMAT)
+        with self.lock:
+            if self.bugsStart is None or sent < self.bugsStart:
+                self.bugsStart = sent
+        #streamed bodies are read while decoding
+        with self.metrics.timer("crawler_parse_seconds", crawler="bugzilla_bugs"):
+            bugs = list(self.decoder.decodeStream(response, "bugs"))
+
+        #measures the size of the bugs for tuning the page size
+        size = response.headers.get("Content-Length")
+        if bugs and size:
+            self.bugBytes = int(size) / len(bugs)
+        return bugs
+
+    def tune_page_size(self) -> None:
+        """
+        Sets the page size so that a page has about pageBytes, within the maximum page size.
+        """
+        if self.bugBytes:
+            self.pageSize = max(1, min(self.maxPageSize, int(self.pageBytes / self.bugBytes)))
+
+    def store_bugs(self, bugs: List[Dict], bugIDs: List) -> None:
+        """
+        Saves a page of bugs and their IDs into the BugIDs and BugsData collections and/or files.
+
+        :param bugs: The bugs of the page.
+        :type bugs: List[Dict]
+        :param bugIDs: The IDs of the bugs.
+        :type bugIDs: List
+        """
+        self.metrics.inc("crawler_documents_total", len(bugs), kind="bugs")
 
         #inserts bug ids and bugs into db if given one
-        if self.mongoDB:
-            for id in bugIDList:
-                self.mongoDB["BugIDs"].insert_one({"ID": id})
-            self.mongoDB["BugsData"].insert_many(resultBugList)
+        if self.mongoDB is not None:
+            self.mongoSink.add("BugIDs", [{"ID": id} for id in bugIDs])
+            self.mongoSink.add("BugsData", bugs)
 
-        #creates files for bug ids and bugs if given a folder
+        #writes bug ids and bugs into the files if given a folder
         if self.folder:
-            #saves bug list as python object
-            with open(self.folderpath + "bugIDListP.pickle", "wb") as a:
-                pickle.dump(bugIDList, a)
-            #saves bug list as csv
-            with open(self.folderpath + "bugIDList.csv", "w") as b:
-                for id in bugIDList:
-                    b.write(str(id) + "\n")
-            with open(self.folderpath + "bugsData.txt", "w") as c:
-                for bug in resultBugList:
-                    c.write(str(bug) + "\n")
-
-        #returns List Object for further processing
-        return(bugIDList)
-
-    def get_all_comments(self, idList: Union[List, str]) -> None:
+            if not self.bugsSince:
+                self.sink.writeLines("bugIDList.csv", [str(id) for id in bugIDs])
+            if self.parquetSink:
+                self.parquetSink.writeDocuments("bugs", bugs)
+            else:
+                self.sink.writeDocuments("bugsData.jsonl", bugs)
+
+        #staged once the bugs are in the sinks, so the next flush writes them before they are counted
+        if self.summary:
+            self.summary.addBugs(bugs)
+
+    @Metrics.profiled("get_all_comments")
+    def get_all_comments(self, idList: Union[List, "BugIDStore.BugIDStore", str]) -> List:
         """
         Crawls for all comments belonging to the bugs in the Bug-ID-List.
 
-        :param idList: Either a list object or the name of a pickle
-        object as a string (needs to contain .pickle) where bug IDS are saved in.
-        :type idList: List or str
-        """
-
-        #loads pickle list if it is one
-        if type(idList) == str and ".pickle" in idList:
-            print("pickle load")
-            with open(idList, "rb") as f:
-                idList = pickle.load(f)
-        elif type(idList) == str:
-            print("Error: Buglist parameter seems to be neither a List object or the name of a pickle file "
-                  "(needs to contain .pickle).")
-
-        #goes through idList
-        for id in tqdm(idList):
-            #performs request and replaces trouble some parts
-            commentsString = self.session.get(self.commentURL.format(id)).text.\
-                replace('true', 'True').replace('false', 'False').replace('null', 'None')
-            #gets only the comments
-            commentsDict = ast.literal_eval(commentsString)["bugs"][str(id)]["comments"]
-
-            #enters comments into db or file if there are any comments for the id
-            if commentsDict:
-                if self.mongoDB:
-                    self.mongoDB["Comments"].insert_many(commentsDict)
-                if self.folder:
-                    with open(self.folderpath + "Bugzilla_Comments.txt", 'a') as f:
-                        f.write(str(commentsDict) + "\n")
-
-    def get_all_comments_mp(self, list: Union[List, str], workers: int = 10) -> None:
+        :param idList: Either a list object, a BugIDStore or the name of a file where bug IDS are saved in (an ID
+        file like bugIDList.ids, a pickle file containing .pickle or a csv file).
+        :type idList: List, BugIDStore.BugIDStore or str
+        :return: The bug IDs whose comments could not be crawled
+        :rtype: List
+        """
+
+        #loads the ID file if it is one
+        idList = self.load_bug_list(idList)
+        if idList is None:
+            return []
+        idList = self.skip_done_comments(idList)
+
+        #goes through idList in batches of commentBatchSize bugs per request
+        failedIDs = []
+        with tqdm(total=len(idList)) as progress:
+            for idBatch in idList.batches(self.commentBatchSize):
+                idBatch = idBatch.tolist()
+                failedIDs += self.get_comments_batch(idBatch)
+                progress.update(len(idBatch))
+
+        self.save_progress()
+        if self.watermarks:
+            self.watermarks.commit()
+
+        if failedIDs:
+            print("Error: Comments of " + str(len(failedIDs)) + " bugs could not be crawled: " + str(failedIDs))
+        return failedIDs
+
+    def get_comments_batch(self, idBatch: List) -> List:
+        """
+        Crawls the comments of several bugs with one request and saves them per bug.
+        If the request fails (e.g. because the batch is too large) the batch is split in halves which are retried.
+        Bugs missing in the response are requested again on their own.
+
+        :param idBatch: The bug IDs whose comments are requested together.
+        :type idBatch: List
+        :return: The bug IDs whose comments could not be crawled
+        :rtype: List
+        """
+        try:
+            response = self.session.get(self.comments_url(idBatch))
+            response.raise_for_status()
+            content = response.content
+            with self.metrics.timer("crawler_parse_seconds", crawler="bugzilla_comments"):
+                bugs = self.decoder.loads(content)["bugs"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            #splits the batch and retries the halves
+            if len(idBatch) > 1:
+                half = len(idBatch) // 2
+                return self.get_comments_batch(idBatch[:half]) + self.get_comments_batch(idBatch[half:])
+            print("Error: Comments of bug " + str(idBatch[0]) + " could not be crawled: " + repr(e))
+            return [idBatch[0]]
+
+        #fans the comments out per bug
+        missing = []
+        latest = {}
+        for id in idBatch:
+            bug = bugs.get(str(id))
+            if bug is None:
+                missing.append(id)
+            else:
+                self.store_comments(bug["comments"])
+                latest[id] = latest_comment(bug["comments"])
+        self.stage_comment_watermarks(latest, HttpClient.HttpClient.requestTime(response).strftime(TIME_FORMAT))
+        if self.checkpoint:
+            self.checkpoint.commentsDone([id for id in idBatch if id not in missing])
+
+        if len(idBatch) > 1:
+            return [failedID for id in missing for failedID in self.get_comments_batch([id])]
+        if missing:
+            print("Error: Comments of bug " + str(idBatch[0]) + " are missing in the response")
+        return missing
+
+    def comments_url(self, idBatch: List) -> str:
+        """
+        Builds the url of the request for the comments of several bugs.
+
+        :param idBatch: The bug IDs whose comments are requested together.
+        :type idBatch: List
+        :return: The url of the request
+        :rtype: str
+        """
+        #the first id is part of the path, the others are added as ids params
+        url = self.commentURL.format(idBatch[0])
+        params = ["ids=" + str(id) for id in idBatch[1:]]
+
+        #only requests the needed fields if given
+        if self.commentFields:
+            params.append("include_fields=" + self.commentFields)
+
+        #incremental crawls only request the comments since the watermark of the bugs, if all were crawled before
+        if self.watermarks:
+            since = self.watermarks.getItems("comments", idBatch)
+            if since and len(since) == len(set(idBatch)):
+                params.append("new_since=" + quote(min(since.values())))
+        if params:
+            url += "?" + "&".join(params)
+        return url
+
+    def store_comments(self, commentsDict: List[Dict]) -> None:
+        """
+        Saves the comments of one bug into the Comments collection and/or the Bugzilla_Comments.jsonl file.
+
+        :param commentsDict: The comments of the bug.
+        :type commentsDict: List[Dict]
+        """
+        #enters comments into db or file if there are any comments for the id
+        if commentsDict:
+            self.metrics.inc("crawler_documents_total", len(commentsDict), kind="comments")
+            if self.mongoDB is not None:
+                self.mongoSink.add("Comments", commentsDict)
+            if self.parquetSink:
+                self.parquetSink.writeDocuments("comments", commentsDict)
+            elif self.folder:
+                self.sink.writeDocuments("Bugzilla_Comments.jsonl", commentsDict)
+            #staged once the comments are in the sinks, so the next flush writes them before they are counted
+            if self.summary:
+                self.summary.addComments(commentsDict)
+
+    @Metrics.profiled("get_all_comments_mp")
+    def get_all_comments_mp(self, list: Union[List, "BugIDStore.BugIDStore", str], workers: int = 10) -> List:
         """
         Crawls for all comments belonging to the bugs in the Bug-ID-List utilizing parallelization.
+        The batches of bug IDs are handed out through a shared work queue, so every worker takes the next batch as soon
+        as it is done with its last one. The amount of workers can be changed while crawling with set_workers.
 
-        :param list: Either a list object or the name of a pickle
-        object as a string (needs to contain .pickle) where bug IDS are saved in.
-        :type list: List or str
+        :param list: Either a list object, a BugIDStore or the name of a file where bug IDS are saved in (an ID
+        file like bugIDList.ids, a pickle file containing .pickle or a csv file).
+        :type list: List, BugIDStore.BugIDStore or str
         :param workers: Optional. The amount of workers in the parallelisation method. Default is 10.
         :type workers: int
+        :return: The bug IDs whose comments could not be crawled
+        :rtype: List
+        """
+        # loads the ID file if it is one
+        list = self.load_bug_list(list)
+        if list is None:
+            return []
+        list = self.skip_done_comments(list)
+
+        #fills the work queue with batches of bug IDs, views of the IDs that are turned into lists when taken
+        self.workQueue = queue.Queue()
+        for idBatch in list.batches(self.commentBatchSize):
+            self.workQueue.put(idBatch)
+
+        self.failedIDs = []
+        self.workerThreads = {}
+        self.progress = tqdm(total=len(list))
+
+        #starts the workers and waits until every batch is done
+        self.set_workers(workers)
+        self.workQueue.join()
+        for thread in tuple(self.workerThreads.values()):
+            thread.join()
+        self.progress.close()
+        self.workQueue = None
+
+        self.save_progress()
+        if self.watermarks:
+            self.watermarks.commit()
+
+        if self.failedIDs:
+            print("Error: Comments of " + str(len(self.failedIDs)) + " bugs could not be crawled: " +
+                  str(self.failedIDs))
+        return self.failedIDs
+
+    @Metrics.profiled("get_all_comments_pipeline")
+    def get_all_comments_pipeline(self, idList: Union[List, "BugIDStore.BugIDStore", str]) -> List:
+        """
+        Crawls for all comments belonging to the bugs in the Bug-ID-List in three stages, so that decoding doesn't
+        compete with the downloads for the GIL: as many fetch threads as workers download the raw responses, a pool
+        of decoders processes decodes and normalises them and a single writer (the calling thread) feeds the MongoDB
+        and the files. The stages are connected by a queue of at most pipelineQueue responses, full queues slow the
+        earlier stages down. Batches that fail are split in halves and retried like in the other modes.
+
+        :param idList: Either a list object, a BugIDStore or the name of a file where bug IDS are saved in (an ID
+        file like bugIDList.ids, a pickle file containing .pickle or a csv file).
+        :type idList: List, BugIDStore.BugIDStore or str
+        :return: The bug IDs whose comments could not be crawled
+        :rtype: List
+        """
+        idList = self.load_bug_list(idList)
+        if idList is None:
+            return []
+        idList = self.skip_done_comments(idList)
+
+        batches = queue.Queue()
+        for idBatch in idList.batches(self.commentBatchSize):
+            batches.put(idBatch)
+        remaining = batches.qsize()
+
+        #(batch, future of the decoding, error of the download, request time) from the fetch threads to the writer
+        decoded = queue.Queue(self.pipelineQueue)
+        stop = threading.Event()
+        failedIDs = []
+
+        #the decoders are started from a fresh server process, forks of this one would copy the locks and connections
+        #held by its threads
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(self.decoders, mp_context=multiprocessing.get_context(method))
+
+        def fetch() -> None:
+            while not stop.is_set():
+                try:
+                    idBatch = [id for id in batches.get(timeout=0.1)]
+                except queue.Empty:
+                    continue
+                try:
+                    response = self.session.get(self.comments_url(idBatch))
+                    response.raise_for_status()
+                    future = pool.submit(decode_comments, response.content, idBatch, self.decoder,
+                                         self.mongoDB is not None or self.parquetSink is not None or
+                                         self.summary is not None,
+                                         bool(self.folder) and self.parquetSink is None)
+                    item = (idBatch, future, None, HttpClient.HttpClient.requestTime(response).strftime(TIME_FORMAT))
+                except Exception as e:
+                    item = (idBatch, None, e, None)
+
+                #waits while the queue is full, unless the writer stopped
+                while not stop.is_set():
+                    try:
+                        decoded.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+
+        fetchers = [threading.Thread(target=fetch, daemon=True) for _ in range(self.workers)]
+        for thread in fetchers:
+            thread.start()
+
+        try:
+            with tqdm(total=len(idList)) as progress:
+                while remaining:
+                    idBatch, future, error, sent = decoded.get()
+                    self.metrics.gauge("crawler_queue_depth", decoded.qsize(), queue="decoded_comments")
+                    self.metrics.gauge("crawler_queue_depth", batches.qsize(), queue="comment_batches")
+                    if error is None:
+                        try:
+                            comments, lines, latest, missing, seconds = future.result()
+                            self.metrics.observe("crawler_parse_seconds", seconds, crawler="bugzilla_comments")
+                        except Exception as e:
+                            #e.g. an error body or a broken decode process, the batch is split or failed
+                            error = e
+
+                    #splits the batch and retries the halves
+                    if error is not None:
+                        if len(idBatch) > 1:
+                            half = len(idBatch) // 2
+                            batches.put(idBatch[:half])
+                            batches.put(idBatch[half:])
+                            remaining += 1
+                        else:
+                            print("Error: Comments of bug " + str(idBatch[0]) + " could not be crawled: " + repr(error))
+                            failedIDs.append(idBatch[0])
+                            remaining -= 1
+                            progress.update(1)
+                        continue
+
+                    self.write_comments(comments, lines)
+                    self.stage_comment_watermarks(latest, sent)
+                    if self.checkpoint:
+                        self.checkpoint.commentsDone([id for id in idBatch if id not in missing])
+                    remaining -= 1
+                    progress.update(len(idBatch) - len(missing))
+
+                    #bugs missing in the response are requested again on their own
+                    if len(idBatch) > 1:
+                        for id in missing:
+                            batches.put([id])
+                        remaining += len(missing)
+                    elif missing:
+                        print("Error: Comments of bug " + str(idBatch[0]) + " are missing in the response")
+                        failedIDs += missing
+                        progress.update(1)
+        finally:
+            stop.set()
+            for thread in fetchers:
+                thread.join()
+            pool.shutdown(cancel_futures=True)
+
+        self.save_progress()
+        if self.watermarks:
+            self.watermarks.commit()
+
+        if failedIDs:
+            print("Error: Comments of " + str(len(failedIDs)) + " bugs could not be crawled: " + str(failedIDs))
+        return failedIDs
+
+    def crawl_queue(self, workQueue: "WorkQueue.WorkQueue", worker: str = None) -> List:
+        """
+        Crawls the comments of the bug ID ranges of a shared work queue (see WorkQueue.putBugIDs) as one of several
+        worker processes, until every range is done or failed. Each range is crawled like in the CFAST mode while its
+        lease is kept alive and marked done once its comments are written. Ranges with failed bugs are given back and
+        crawled again (see WorkQueue.failUnits). The outputs of the workers can be separate folders or one MongoDB,
+        where they are upserted.
+
+        :param workQueue: The shared work queue.
+        :type workQueue: WorkQueue.WorkQueue
+        :param worker: Optional. The name of the worker. Default is the host name and process id.
+        :type worker: str
+        :return: The bug IDs of the ranges this worker marked as failed whose comments could not be crawled
+        :rtype: List
+        """
+        worker = worker or workQueue.workerName()
+        failedIDs = []
+        with workQueue.heartbeat(worker):
+            while True:
+                units = workQueue.claimUnits(worker)
+                if not units:
+                    #the remaining ranges are leased by other workers and are taken over if their lease expires
+                    if workQueue.wait():
+                        continue
+                    if self.checkpoint and not failedIDs:
+                        self.checkpoint.reset()
+                    return failedIDs
+                key, idList = units[0]
+                try:
+                    failed = self.get_all_comments_mp(idList, self.workers)
+                except BaseException:
+                    workQueue.releaseUnits(worker, [key])
+                    raise
+                if not failed:
+                    workQueue.doneUnits(worker, [key])
+                elif workQueue.failUnits(worker, [key]):
+                    failedIDs += failed
+
+    def write_comments(self, comments: Optional[List[Dict]], lines: bytes) -> None:
+        """
+        Saves the decoded comments of a batch into the Comments collection and/or the Bugzilla_Comments.jsonl file.
+
+        :param comments: The comments as documents or None if there is no MongoDB, Parquet dataset or summary.
+        :type comments: List[Dict]
+        :param lines: The comments encoded as JSON Lines.
+        :type lines: bytes
         """
-        # loads pickle list if it is one
-        if type(list) == str and ".pickle" in list:
-            print("wat")
-            with open(list, "rb") as f:
-                list = pickle.load(f)
-        elif type(list) == str:
-            print("Error: Buglist parameter seems to be neither a List object or the name of a pickle file "
-                  "(needs to contain .pickle).")
-
-        #gets workers and splits list into chunks fitting the worker amount
-        pool = Pool(workers)
-        list = np.array(list)
-        lists = np.array_split(list, workers)
-
-        #each worker crawls for comments
-        for sub_list in lists:
-            print(sub_list)
-            pool.apply_async(self.get_all_comments, (sub_list,))
-
-        pool.close()
-        pool.join()
+        if comments or lines:
+            self.metrics.inc("crawler_documents_total", len(comments) if comments else lines.count(b"\n"),
+                             kind="comments")
+        if self.mongoDB is not None and comments:
+            self.mongoSink.add("Comments", comments)
+        if self.parquetSink and comments:
+            self.parquetSink.writeDocuments("comments", comments)
+        if self.folder and lines:
+            self.sink.write("Bugzilla_Comments.jsonl", lines)
+        if self.summary and comments:
+            self.summary.addComments(comments)
+
+    def set_workers(self, workers: int) -> None:
+        """
+        Sets the amount of workers, also while get_all_comments_mp is running. Additional workers are started
+        immediately, surplus workers stop after their current batch. The connection pool of the session is sized to
+        match the amount of workers.
+
+        :param workers: The new amount of workers.
+        :type workers: int
+        """
+        self.workers = max(1, workers)
+
+        #every worker gets its own keep-alive connection
+        self.session.poolSize(self.workers)
+
+        #starts the missing workers if a crawl is running
+        if self.workQueue is not None:
+            with self.lock:
+                for index in range(self.workers):
+                    thread = self.workerThreads.get(index)
+                    if thread is None or not thread.is_alive():
+                        thread = threading.Thread(target=self.comment_worker, args=(index,), daemon=True)
+                        self.workerThreads[index] = thread
+                        thread.start()
+
+    def comment_worker(self, index: int) -> None:
+        """
+        Takes batches of bug IDs out of the work queue and crawls their comments until the queue is empty or the
+        amount of workers is reduced below its index.
+
+        :param index: The index of the worker.
+        :type index: int
+        """
+        while index < self.workers:
+            try:
+                idBatch = [id for id in self.workQueue.get_nowait()]
+            except queue.Empty:
+                return
+            self.metrics.gauge("crawler_queue_depth", self.workQueue.qsize(), queue="comment_batches")
+
+            #collects the failed IDs instead of losing the exception
+            try:
+                failed = self.get_comments_batch(idBatch)
+            except Exception as e:
+                print("Error: Comments of bugs " + str(idBatch) + " could not be crawled: " + repr(e))
+                failed = idBatch
+
+            with self.lock:
+                self.failedIDs += failed
+            self.progress.update(len(idBatch))
+            self.workQueue.task_done()
+
+    def flush_sinks(self) -> None:
+        """
+        Writes the buffered documents into the MongoDB and the files and commits the aggregates.
+        """
+        #only the aggregates of documents that were in the sinks before the flush are committed
+        staged = self.summary.takeStaged() if self.summary else None
+        if self.mongoDB is not None:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="mongo"):
+                self.mongoSink.flush()
+        if self.folder:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="file"):
+                self.sink.flush()
+        if self.parquetSink:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="parquet"):
+                self.parquetSink.flush()
+        if self.summary:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="summary"):
+                self.summary.commit(staged)
+
+    def save_progress(self) -> None:
+        """
+        Writes the buffered documents, closes the Parquet files and records the progress in the checkpoint file if one
+        is given. Called at the end of a crawl.
+        """
+        if self.parquetSink:
+            self.parquetSink.close()
+        if self.checkpoint:
+            self.checkpoint.commit()
+        else:
+            self.flush_sinks()
+
+    def dump_metrics(self) -> None:
+        """
+        Writes the metrics into the metrics file if one is given. Called by decide_action after the crawl.
+        """
+        if self.metricsFile:
+            self.metrics.dump(self.metricsFile)
+
+    def stage_comment_watermarks(self, latest: Dict[int, Optional[str]], sent: str) -> None:
+        """
+        Stages the comment watermarks of the bugs of a written batch in an incremental crawl. It is the server time at
+        which their comments were requested, so comments created while the crawl is running are requested by the next
+        crawl, or the latest comment of the bug if it is newer. They are committed once the comments are written.
+
+        :param latest: The creation time of the latest comment per bug of the response, None for bugs without one.
+        :type latest: Dict[int, str]
+        :param sent: The server time of the request.
+        :type sent: str
+        """
+        if not self.watermarks:
+            return
+        bugIDs = defaultdict(list)
+        for id, value in latest.items():
+            bugIDs[max(value or "", sent)].append(id)
+        for value, ids in bugIDs.items():
+            self.watermarks.setItems("comments", ids, value)
+
+    def skip_done_comments(self, idList: "BugIDStore.BugIDStore") -> "BugIDStore.BugIDStore":
+        """
+        Removes the bug IDs whose comments were already written according to the checkpoint file.
+
+        :param idList: The bug IDs.
+        :type idList: BugIDStore.BugIDStore
+        :return: The bug IDs whose comments still need to be crawled
+        :rtype: BugIDStore.BugIDStore
+        """
+        if not self.checkpoint:
+            return idList
+        return idList.difference(int(id) for id in self.checkpoint.doneComments())
+
+    def load_bug_list(self, idList: Union[List, "BugIDStore.BugIDStore", str]) -> Optional["BugIDStore.BugIDStore"]:
+        """
+        Loads the Bug-ID-List if it is the name of a file and turns it into a BugIDStore. ID files are memory-mapped,
+        pickle and csv files of older versions are imported.
+
+        :param idList: Either a list object, a BugIDStore or the name of a file where bug IDS are saved in (an ID
+        file like bugIDList.ids, a pickle file containing .pickle or a csv file).
+        :type idList: List, BugIDStore.BugIDStore or str
+        :return: The bug IDs or None if the param is neither a list nor a readable file
+        :rtype: BugIDStore.BugIDStore or None
+        """
+        if type(idList) == str:
+            try:
+                return BugIDStore.BugIDStore.open(idList)
+            except (OSError, ValueError, pickle.UnpicklingError) as e:
+                print("Error: Buglist parameter seems to be neither a List object or the name of a bug ID, pickle or "
+                      "csv file: " + repr(e))
+                return None
+
+        #lists and numpy arrays are turned into an int64 array, stores and their views are used as they are
+        return BugIDStore.BugIDStore(idList)
 
     def createFolder(self, foldername: str) -> None:
         """
@@ -0,0 +1,215 @@
+import array
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+
+class CheckpointStore:
+    """
+    Records the progress of a crawl in a SQLite file, so that a restarted crawler skips the finished work and continues
+    mid-pagination. The progress is mirrored in memory and writes are collected and committed in one transaction once
+    the commit interval has passed, which keeps them cheap in the hot loop. Before every commit the given callback is
+    called, so that the crawler can flush its sinks and no progress is recorded for data that isn't written yet.
+    Once a crawl finished without failures the crawler resets the progress, so the next run starts over and only an
+    interrupted run is continued.
+    """
+
+    def __init__(self, path: str, instance: str, commitInterval: float = 2.0,
+                 beforeCommit: Callable[[], None] = None) -> None:
+        """
+        Opens or creates the checkpoint file.
+
+        :param path: The path of the SQLite file.
+        :type path: str
+        :param instance: Identifies the crawled instance and query, so one file can hold the progress of several.
+        :type instance: str
+        :param commitInterval: Optional. The seconds between two commits. Default is 2.
+        :type commitInterval: float
+        :param beforeCommit: Optional. Called before every commit, e.g. to flush the sinks of the crawler.
+        :type beforeCommit: Callable
+        """
+        self.path = path
+        self.instance = instance
+        self.commitInterval = commitInterval
+        self.beforeCommit = beforeCommit
+
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS gerrit_users (
+                instance TEXT, user TEXT, startpoint INTEGER, user_id INTEGER, active INTEGER, commits INTEGER,
+                done INTEGER, PRIMARY KEY (instance, user));
+            CREATE TABLE IF NOT EXISTS bugzilla_pages (
+                instance TEXT, offset INTEGER, ids BLOB, PRIMARY KEY (instance, offset));
+            CREATE TABLE IF NOT EXISTS bugzilla_comments (
+                instance TEXT, bug_id TEXT, PRIMARY KEY (instance, bug_id));
+            CREATE TABLE IF NOT EXISTS state (
+                instance TEXT, key TEXT, value TEXT, PRIMARY KEY (instance, key));
+        """)
+
+        #statements not committed yet
+        self.pending = []
+        self.lastCommit = time.monotonic()
+
+        #the recorded progress is mirrored in memory
+        self.load()
+
+    def execute(self, statement: str, parameters: Iterable) -> None:
+        """
+        Collects a write and commits the collected writes if the commit interval has passed.
+
+        :param statement: The SQL statement.
+        :type statement: str
+        :param parameters: The parameters of the statement.
+        :type parameters: Iterable
+        """
+        with self.lock:
+            self.pending.append((statement, parameters))
+            if time.monotonic() - self.lastCommit >= self.commitInterval:
+                self.commit()
+
+    def commit(self) -> None:
+        """
+        Commits all collected writes in one transaction.
+        """
+        with self.lock:
+            if self.beforeCommit:
+                self.beforeCommit()
+            if self.pending:
+                self.connection.execute("BEGIN")
+                for statement, parameters in self.pending:
+                    self.connection.execute(statement, parameters)
+                self.connection.execute("COMMIT")
+                self.pending = []
+            self.lastCommit = time.monotonic()
+
+    def reset(self) -> None:
+        """
+        Commits the collected writes and deletes the recorded progress of the instance.
+        """
+        with self.lock:
+            self.commit()
+            self.connection.execute("BEGIN")
+            for table in ("gerrit_users", "bugzilla_pages", "bugzilla_comments", "state"):
+                self.connection.execute("DELETE FROM {} WHERE instance = ?".format(table), (self.instance,))
+            self.connection.execute("COMMIT")
+            self.users, self.pages, self.comments, self.state = {}, {}, set(), {}
+
+    def close(self) -> None:
+        """
+        Commits the collected writes and closes the file.
+        """
+        with self.lock:
+            self.commit()
+            self.connection.close()
+
+    #Gerrit
+
+    def gerritPage(self, user: str, startPoint: int, userID: int, active: bool, commits: int) -> None:
+        """
+        Records that the page at startPoint of the user has been written and how many commits were written so far.
+        """
+        with self.lock:
+            self.users[user] = (startPoint, userID, active, commits, False)
+            self.execute("INSERT OR REPLACE INTO gerrit_users VALUES (?, ?, ?, ?, ?, ?, 0)",
+                         (self.instance, user, startPoint, userID, int(active), commits))
+
+    def gerritDone(self, user: str) -> None:
+        """
+        Records that the user is completely crawled.
+        """
+        with self.lock:
+            startPoint, userID, active, commits, _ = self.users.get(user, (None, None, True, 0, False))
+            self.users[user] = (startPoint, userID, active, commits, True)
+            self.execute("INSERT INTO gerrit_users VALUES (?, ?, NULL, NULL, NULL, 0, 1) "
+                         "ON CONFLICT (instance, user) DO UPDATE SET done = 1", (self.instance, user))
+
+    def gerritUser(self, user: str) -> Optional[Tuple[Optional[int], Optional[int], bool, int, bool]]:
+        """
+        Returns the progress of the user.
+
+        :return: None if nothing was recorded, else the last written startpoint, the account id, if the account is
+        active, the amount of written commits and if the user is done
+        :rtype: Tuple[int, int, bool, int, bool]
+        """
+        return self.users.get(user)
+
+    #Bugzilla
+
+    def bugPage(self, offset: int, bugIDs: List) -> None:
+        """
+        Records that the bug page at offset has been written together with its bug IDs, kept as int64 array and
+        stored as its bytes.
+        """
+        with self.lock:
+            ids = array.array("q", bugIDs)
+            self.pages[offset] = ids
+            self.execute("INSERT OR REPLACE INTO bugzilla_pages VALUES (?, ?, ?)",
+                         (self.instance, offset, ids.tobytes()))
+
+    def bugPages(self) -> Dict[int, array.array]:
+        """
+        Returns the bug IDs of all written pages by offset as int64 arrays.
+        """
+        return dict(self.pages)
+
+    def commentsDone(self, bugIDs: Iterable) -> None:
+        """
+        Records that the comments of the bugs have been written.
+        """
+        with self.lock:
+            for id in bugIDs:
+                self.comments.add(str(id))
+                self.execute("INSERT OR IGNORE INTO bugzilla_comments VALUES (?, ?)", (self.instance, str(id)))
+
+    def doneComments(self) -> Set[str]:
+        """
+        Returns the bug IDs (as strings) whose comments have been written.
+        """
+        return set(self.comments)
+
+    #general state
+
+    def setState(self, key: str, value: str) -> None:
+        """
+        Records a value of the crawl, e.g. that a phase is finished.
+        """
+        with self.lock:
+            self.state[key] = value
+            self.execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?)", (self.instance, key, value))
+
+    def getState(self, key: str) -> Optional[str]:
+        """
+        Returns a recorded value of the crawl or None.
+        """
+        return self.state.get(key)
+
+    def load(self) -> None:
+        """
+        Reads the recorded progress of the instance into memory, so that reading it doesn't touch the file.
+        """
+        self.users = {user: (startPoint, userID, bool(active) if active is not None else True, commits, bool(done))
+                      for user, startPoint, userID, active, commits, done in self.connection.execute(
+                          "SELECT user, startpoint, user_id, active, commits, done FROM gerrit_users "
+                          "WHERE instance = ?", (self.instance,))}
+        self.pages = {offset: self.pageIDs(ids) for offset, ids in self.connection.execute(
+            "SELECT offset, ids FROM bugzilla_pages WHERE instance = ?", (self.instance,))}
+        self.comments = {row[0] for row in self.connection.execute(
+            "SELECT bug_id FROM bugzilla_comments WHERE instance = ?", (self.instance,))}
+        self.state = {key: value for key, value in self.connection.execute(
+            "SELECT key, value FROM state WHERE instance = ?", (self.instance,))}
+
+    @staticmethod
+    def pageIDs(ids: Union[bytes, str]) -> array.array:
+        """
+        Reads the stored bug IDs of a page, the bytes of an int64 array or a JSON list in files of older versions.
+        """
+        if isinstance(ids, str):
+            return array.array("q", json.loads(ids))
+        page = array.array("q")
+        page.frombytes(ids)
+        return page
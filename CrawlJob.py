@@ -0,0 +1,156 @@
+import time
+
+#the startup time is measured from here, the heavy dependencies of the crawlers are imported lazily
+START = time.perf_counter()
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+import HttpClient
+import ResponseCache
+
+#keys of a crawl entry that are handled by the runner, all others are passed to the constructor of the crawler
+JOB_KEYS = {"type", "name", "url", "mode", "users", "usersFile", "bugList", "mongo"}
+
+
+def loadJob(path: str) -> Dict[str, Any]:
+    """
+    Reads a job file, TOML (Python 3.11+), JSON or YAML (needs the PyYAML package) depending on the extension.
+
+    :param path: The path of the job file.
+    :type path: str
+    :return: The job
+    :rtype: Dict[str, Any]
+    """
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class CrawlJob:
+    """
+    Runs the crawls of a job file one after another in one process. All crawls share one HttpClient, so the keep-alive
+    connections to an instance are reused, and one MongoDB connection. The job file has the optional tables 'http'
+    (parameters of the HttpClient), 'cache' (parameters of its ResponseCache), 'mongo' ('uri' and 'database') and
+    'defaults' (parameters of every crawl) and a list 'crawl' with an entry per crawl:
+
+    type -> 'gerrit' or 'bugzilla'.
+    name -> Optional. Shown in the report. Default is the type and the index.
+    url -> The url of the REST API.
+    users, usersFile -> Gerrit only. The users or the path of a file with one user per line.
+    mode, bugList -> Bugzilla only. The name of the CrawlMode (e.g. 'bfast') and the Bug-IDs or the path of their file.
+    mongo -> Optional. If the crawl writes into the MongoDB of the job. Default is true if the job has one.
+
+    All other keys are passed to the constructor of the crawler, e.g. foldername, checkpoint, workers or concurrency.
+    """
+
+    def __init__(self, job: Dict[str, Any]) -> None:
+        """
+        Initializes the job.
+
+        :param job: The content of the job file.
+        :type job: Dict[str, Any]
+        """
+        self.job = job
+        self.defaults = job.get("defaults", {})
+        self.crawls = job.get("crawl", [])
+        cache = ResponseCache.ResponseCache(**job["cache"]) if "cache" in job else None
+        self.httpClient = HttpClient.HttpClient(cache=cache, **job.get("http", {}))
+        self.mongoDB = None
+
+    def database(self) -> Any:
+        """
+        Returns the MongoDB of the job, connecting on first use.
+        """
+        if self.mongoDB is None:
+            from pymongo import MongoClient
+            mongo = self.job["mongo"]
+            self.mongoDB = MongoClient(mongo.get("uri", "mongodb://localhost:27017/"))[mongo["database"]]
+        return self.mongoDB
+
+    def names(self) -> List[str]:
+        """
+        Returns the names of the crawls.
+        """
+        return [crawl.get("name", "{}{}".format(crawl.get("type"), index)) for index, crawl in enumerate(self.crawls)]
+
+    def runCrawl(self, crawl: Dict[str, Any]) -> List:
+        """
+        Runs one crawl of the job.
+
+        :param crawl: The entry of the crawl, merged with the defaults.
+        :type crawl: Dict[str, Any]
+        :return: The users (Gerrit) or Bug-IDs (Bugzilla) that could not be crawled
+        :rtype: List
+        """
+        params = {key: value for key, value in crawl.items() if key not in JOB_KEYS}
+        params["httpClient"] = self.httpClient
+        #the shared client records its requests into the metrics of the crawler it is used by
+        self.httpClient.metrics = None
+        if "mongo" in self.job and crawl.get("mongo", True):
+            params["mongoDB"] = self.database()
+
+        if crawl["type"] == "gerrit":
+            import GerritCrawler
+            users = crawl.get("users", [])
+            if "usersFile" in crawl:
+                with open(crawl["usersFile"], "r", encoding="utf-8") as f:
+                    users = users + [line.strip() for line in f if line.strip()]
+            crawler = GerritCrawler.GerritCrawler(params.pop("startPointIncrease", 100), crawl["url"], **params)
+            return crawler.enterManyUsersCommits(users)
+        elif crawl["type"] == "bugzilla":
+            import BugzillaCrawler
+            mode = BugzillaCrawler.CrawlMode[crawl.get("mode", "bfast").upper()]
+            crawler = BugzillaCrawler.BugzillaCrawler(crawl["url"], **params)
+            return crawler.decide_action(mode, crawl.get("bugList"))
+        else:
+            raise ValueError("Unknown crawl type '{}', choices are gerrit and bugzilla".format(crawl.get("type")))
+
+    def run(self, only: List[str] = None) -> bool:
+        """
+        Runs the crawls of the job and reports the startup time and the duration of every crawl. A failing crawl, also
+        one where some users or Bug-IDs could not be crawled, is reported and the next one is started.
+
+        :param only: Optional. The names of the crawls to run. Default are all crawls.
+        :type only: List[str]
+        :return: If all crawls succeeded
+        :rtype: bool
+        """
+        print("Startup: {:.1f} ms".format((time.perf_counter() - START) * 1000))
+        succeeded = True
+        for name, crawl in zip(self.names(), self.crawls):
+            if only and name not in only:
+                continue
+            start = time.perf_counter()
+            try:
+                failed = self.runCrawl({**self.defaults, **crawl})
+                if failed:
+                    succeeded = False
+                    print("Error: crawl {} finished in {:.1f} s, {} could not be crawled".format(
+                        name, time.perf_counter() - start, len(failed)))
+                else:
+                    print("{}: finished in {:.1f} s".format(name, time.perf_counter() - start))
+            except Exception as e:
+                succeeded = False
+                print("Error: crawl {} failed after {:.1f} s: {!r}".format(name, time.perf_counter() - start, e))
+        return succeeded
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Runs the crawls of a job file (TOML, JSON or YAML).")
+    parser.add_argument("job", help="path of the job file")
+    parser.add_argument("--crawl", action="append", metavar="NAME", help="only run the named crawl(s)")
+    args = parser.parse_args(argv)
+    return 0 if CrawlJob(loadJob(args.job)).run(args.crawl) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import atexit
+import gzip
+import io
+import threading
+from typing import Dict, Iterable
+
+import ResponseDecoder
+
+#file endings of the supported compressions
+COMPRESSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class FileSink:
+    """
+    Writes the output files of the crawlers. The file handles are kept open with large buffers for the whole crawl,
+    writes from concurrent workers are serialised per file and documents are written as JSON Lines.
+    Optionally the files are compressed on the fly with gzip or zstd.
+    """
+
+    def __init__(self, folderpath: str, compression: str = None, bufferSize: int = 1024 * 1024) -> None:
+        """
+        Initializes the Sink for the given folder.
+
+        :param folderpath: The path of the folder the files are written into, ending with '/'.
+        :type folderpath: str
+        :param compression: Optional. Either 'gzip' or 'zstd' (needs the zstandard package). Default is no compression.
+        :type compression: str
+        :param bufferSize: Optional. The size of the write buffer of every file in bytes. Default is 1 MiB.
+        :type bufferSize: int
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression '{}', choices are gzip and zstd".format(compression))
+
+        self.folderpath = folderpath
+        self.compression = compression
+        self.bufferSize = bufferSize
+        self.encoder = ResponseDecoder.defaultDecoder
+
+        #opened files and their locks by name
+        self.files = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+        #makes sure the buffers and compression trailers are written at exit
+        atexit.register(self.close)
+
+    def path(self, name: str) -> str:
+        """
+        Returns the path of the file including the ending of the compression.
+
+        :param name: The name of the file.
+        :type name: str
+        :return: The path of the file
+        :rtype: str
+        """
+        return self.folderpath + name + COMPRESSIONS[self.compression]
+
+    def open(self, name: str, mode: str = "a") -> None:
+        """
+        Opens the file, an already opened one is closed first. With mode 'w' an existing file is overwritten.
+
+        :param name: The name of the file.
+        :type name: str
+        :param mode: Optional. 'a' to append or 'w' to overwrite. Default is 'a'.
+        :type mode: str
+        """
+        with self.lock:
+            self.openFile(name, mode)
+
+    def openFile(self, name: str, mode: str) -> None:
+        """
+        Opens the file, called with the lock held. An already opened file is closed while holding its lock, so no
+        worker writes into the closed handle.
+        """
+        with self.locks.setdefault(name, threading.Lock()):
+            if name in self.files:
+                self.files.pop(name).close()
+
+            #the large buffer is the BufferedWriter around the (compressing) file
+            if self.compression == "gzip":
+                raw = gzip.GzipFile(self.path(name), mode + "b", compresslevel=6)
+            elif self.compression == "zstd":
+                import zstandard
+                raw = zstandard.ZstdCompressor(level=3).stream_writer(open(self.path(name), mode + "b"),
+                                                                       closefd=True)
+            else:
+                raw = open(self.path(name), mode + "b", buffering=0)
+
+            self.files[name] = io.BufferedWriter(raw, self.bufferSize)
+
+    def write(self, name: str, data: bytes) -> None:
+        """
+        Writes the bytes into the file, opens it for appending if it isn't already.
+
+        :param name: The name of the file.
+        :type name: str
+        :param data: The bytes to be written.
+        :type data: bytes
+        """
+        #checks again with the lock held, so concurrent first writes open the file only once
+        if name not in self.files:
+            with self.lock:
+                if name not in self.files:
+                    self.openFile(name, "a")
+        with self.locks[name]:
+            self.files[name].write(data)
+
+    def writeDocuments(self, name: str, documents: Iterable[Dict]) -> None:
+        """
+        Writes the documents as JSON Lines into the file.
+
+        :param name: The name of the file.
+        :type name: str
+        :param documents: The documents to be written.
+        :type documents: Iterable[Dict]
+        """
+        self.write(name, b"".join(self.encoder.dumps(document) + b"\n" for document in documents))
+
+    def writeLines(self, name: str, lines: Iterable[str]) -> None:
+        """
+        Writes the lines of text into the file.
+
+        :param name: The name of the file.
+        :type name: str
+        :param lines: The lines to be written without line breaks.
+        :type lines: Iterable[str]
+        """
+        self.write(name, "".join(line + "\n" for line in lines).encode("utf-8"))
+
+    def flush(self) -> None:
+        """
+        Writes the buffers of all files to disk.
+        """
+        with self.lock:
+            for name, f in self.files.items():
+                with self.locks[name]:
+                    #also flushes the compressor, so that everything written so far can be read back
+                    f.flush()
+                    f.raw.flush()
+
+    def close(self) -> None:
+        """
+        Closes all files.
+        """
+        with self.lock:
+            for name, f in self.files.items():
+                with self.locks[name]:
+                    f.close()
+            self.files = {}
@@ -1,12 +1,29 @@
 
 import GerritQueryHandler
+import AsyncGerritCrawler
+import FileSink
+import CheckpointStore
+import WatermarkStore
+import SummaryStore
+import AccountCache
+import ParquetSink
+import HttpClient
+import Metrics
 import os
-import pprint
 import re
-from tqdm import tqdm
-from pymongo import MongoClient
-from pymongo.database import Database
-from typing import List, Union, Dict, Optional, Tuple
+from typing import List, Union, Dict, Optional, Tuple, TYPE_CHECKING
+from LazyImport import LazyImport
+
+#pymongo is imported when a MongoDB output is used
+MongoSink = LazyImport("MongoSink")
+
+if TYPE_CHECKING:
+    from pymongo.database import Database
+    from pymongo.collection import Collection
+    import WorkQueue
+
+#fields of the changes the crawler needs, they are always kept
+REQUIRED_CHANGE_FIELDS = ['id', 'owner', 'created', 'updated']
 
 
 class GerritCrawler:
@@ -15,7 +32,13 @@ class GerritCrawler:
     """
 
     def __init__(self, startPointIncrease: int, url: str, beforeDate: str = None, afterDate: str = None,
-                 foldername: str = None, separator: str = ',', mongoDB: Database = None) -> None:
+                 foldername: str = None, separator: str = ',', mongoDB: "Database" = None,
+                 concurrency: int = 8, compression: str = None, checkpoint: str = None,
+                 watermarks: str = None, accountCache: str = None, httpClient: HttpClient.HttpClient = None,
+                 fuseOwners: int = 1, maxURLLength: int = 4000, options: List[str] = None,
+                 fields: List[str] = None, metrics: Metrics.Metrics = None, metricsFile: str = None,
+                 fileFormat: str = "jsonl", partitionBy: str = None, prefetch: int = 2,
+                 summary: str = None) -> None:
         """
         Initializes the Crawler.
 
@@ -30,49 +53,150 @@ class GerritCrawler:
         :param afterDate:Optional. A possible date for a 'after' parameter in your query. It has to be in the format
         of yyyy-mm-dd.
         :type afterDate: str
-        :param foldername: Optional. If the result is supposed to be saved in csv files in a folder, enter a name
-        for the folder. If the directonary doesn't exist already, it will be created.
+        :param foldername: Optional. If the result is supposed to be saved in files (csv, JSON Lines) in a folder,
+        enter a name for the folder. If the directonary doesn't exist already, it will be created.
         :type foldername: str
         :param separator: Optional. Decides how the csv data will be separated. The default is ','.
         :type separator: str
         :param mongoDB: Optional. If the result is supposed to be saved in a Mongo database enter it here.
         :type mongoDB: pymongo.database.Database
+        :param concurrency: Optional. The maximum amount of requests in flight to the Gerrit when crawling many users.
+        Default is 8.
+        :type concurrency: int
+        :param prefetch: Optional. The maximum amount of pages of a user with many commits that are requested ahead
+        while a page is written, 0 requests the pages one after another. Default is 2.
+        :type prefetch: int
+        :param compression: Optional. Compresses the files in the folder on the fly, either 'gzip' or 'zstd'.
+        :type compression: str
+        :param checkpoint: Optional. The path of a checkpoint file. If given, the progress is recorded in it and a
+        restarted crawl skips the users that are done and continues the others after their last written page.
+        :type checkpoint: str
+        :param watermarks: Optional. The path of a watermark file. If given, the crawl is incremental: per user the
+        server time its first page was requested (or its latest update if newer) is stored in it and the next crawl only
+        requests the changes updated since.
+        They are merged into the outputs (upserted into the MongoDB, appended to the files).
+        :type watermarks: str
+        :param accountCache: Optional. The path of a JSON file the resolved account ids of the users are cached in, so
+        that they are queried directly by it in this and later crawls. It can be filled from the outputs of earlier
+        crawls with preloadAccounts.
+        :type accountCache: str
+        :param httpClient: Optional. The HTTP client performing the requests with adaptive rate limits and retries. It
+        can be shared with other crawlers. Default is a new client.
+        :type httpClient: HttpClient.HttpClient
+        :param fuseOwners: Optional. The maximum amount of users whose commits are requested together with one query
+        (owner:a OR owner:b ...), the page size (n) is then startPointIncrease. Default is 1, one query per user.
+        :type fuseOwners: int
+        :param maxURLLength: Optional. The maximum length of the url of a query for several users. Default is 4000.
+        :type maxURLLength: int
+        :param options: Optional. The options (o) of the change queries, e.g. ['LABELS', 'CURRENT_REVISION']. Default
+        is the default ChangeInfo.
+        :type options: List[str]
+        :param fields: Optional. Only these fields of the changes are saved, e.g. ['project', 'status', 'insertions'].
+        The fields the crawler needs (id, owner, created, updated) are always kept.
+        :type fields: List[str]
+        :param metrics: Optional. Collects the request latencies, bytes, parse and flush times, retries and queue
+        depths, hooks can be registered on it. Default are new metrics, available as the metrics attribute.
+        :type metrics: Metrics.Metrics
+        :param metricsFile: Optional. The metrics are written into this file after every crawl, in the Prometheus
+        text format if it ends with .prom, else as JSON.
+        :type metricsFile: str
+        :param fileFormat: Optional. The format of the documents in the folder, either 'jsonl' (JSON Lines) or
+        'parquet' (Parquet datasets, needs the pyarrow package, see ParquetSink). The compression of the Parquet files
+        is the compression parameter, zstd if not given. Default is 'jsonl'.
+        :type fileFormat: str
+        :param partitionBy: Optional. Partitions the Parquet datasets by 'month' or 'account'. Default is no
+        partitioning.
+        :type partitionBy: str
+        :param summary: Optional. The path of a summary file. If given, the changes per owner by status and month and
+        the first and last activity of the owners are maintained in it while crawling, see SummaryStore.
+        :type summary: str
         """
+        #metrics of the crawl
+        self.metrics = metrics if metrics is not None else Metrics.Metrics()
+        self.metricsFile = metricsFile
+
         #handles the actual requests
-        self.handler = GerritQueryHandler.GerritQueryHandler(url=url, beforeDate=beforeDate, afterDate=afterDate)
+        self.handler = GerritQueryHandler.GerritQueryHandler(url=url, beforeDate=beforeDate, afterDate=afterDate,
+                                                             accounts=AccountCache.AccountCache(accountCache),
+                                                             session=httpClient, options=options,
+                                                             metrics=self.metrics)
+
+        #crawls many users concurrently, the sync API is a thin wrapper around it
+        self.engine = AsyncGerritCrawler.AsyncGerritCrawler(self, concurrency, prefetch)
 
         #what amount the startpoint for the query needs to increase
         self.startpointIncrease = startPointIncrease
 
+        #fields of the changes that are saved, all if not given
+        self.fields = set(fields) | set(REQUIRED_CHANGE_FIELDS) if fields else None
+
+        #how many users are crawled with one query
+        self.fuseOwners = max(1, fuseOwners)
+        self.maxURLLength = maxURLLength
+
         #if csv files should be , or ; separated
         self.separator = separator
 
         #MongoDB setup
         self.db = mongoDB
-        if mongoDB:
+        if mongoDB is not None:
+            #buffers the documents and upserts them in bulk
+            self.mongoSink = MongoSink.MongoSink(mongoDB)
+
             # contains all individual information for the MongoDB (corresponding Collections, query limit)
             self.mongoDic = {
-                "devs": self.db.allDevs,
-                "noCommits": self.db.noCommits,
-                "commitsCollections": [self.db['id{}'.format(x)] for x in range(10)],
+                "devs": "allDevs",
+                "noCommits": "noCommits",
+                "commitsCollections": ['id{}'.format(x) for x in range(10)],
             }
 
         #folder setup
         self.folder = foldername
+        self.parquetSink = None
         if foldername:
 
             #creates directory
             self.createFolder(foldername)
             self.folderpath = foldername + '/'
 
+            #keeps the files open with large buffers for the whole crawl
+            self.sink = FileSink.FileSink(self.folderpath, compression if fileFormat == "jsonl" else None)
+
+            #writes the commits as Parquet dataset instead of JSON Lines
+            if fileFormat == "parquet":
+                self.parquetSink = ParquetSink.ParquetSink(self.folderpath, partitionBy, compression or "zstd")
+            elif fileFormat != "jsonl":
+                raise ValueError("Unknown file format '{}', choices are jsonl and parquet".format(fileFormat))
+
             #contains all individual information for the result folder (corresponding files, query limit)
             self.folderDic = {
                 "devs": "allDevs.csv",
                 "noCommits": "noCommitsUser.csv",
-                "commitsCollections": ["id{}.csv".format(x) for x in range(10)],
+                "commitsCollections": ["id{}.jsonl".format(x) for x in range(10)],
             }
 
-    def enterOneUserCommits(self, user: str) -> None:
+        #records the progress of the crawl if a checkpoint file is given, the progress is kept per query, so a crawl
+        #with other date filters doesn't take over the users and startpoints of this one
+        self.checkpoint = None
+        if checkpoint:
+            query = self.handler.url
+            if beforeDate:
+                query += '+before:' + beforeDate
+            if afterDate:
+                query += '+after:' + afterDate
+            self.checkpoint = CheckpointStore.CheckpointStore(checkpoint, query, beforeCommit=self.flushSinks)
+
+        #stores the watermarks of incremental crawls if a watermark file is given
+        self.watermarks = None
+        if watermarks:
+            self.watermarks = WatermarkStore.WatermarkStore(watermarks, self.handler.url)
+
+        #maintains the aggregates of the crawl if a summary file is given
+        self.summary = None
+        if summary:
+            self.summary = SummaryStore.SummaryStore(summary, self.handler.url)
+
+    def enterOneUserCommits(self, user: str) -> List[str]:
         """
         Starts the request process and continues it as long as there are still more commits to be crawled.
         It saves the developers with their commit counter into one file/collection, the commenters into another
@@ -80,84 +204,186 @@ class GerritCrawler:
 
         :param user: The respective user of the request.
         :type user: str
+        :return: The user if its crawl failed, else an empty list
+        :rtype: List[str]
         """
-        startPoint = 0
-
-        #gathers all commits of a user as a list
-        commitsList, notDone, active = self.handler.getCommits(user, startPoint)
+        return self.enterManyUsersCommits([user])
 
+    def enterManyUsersCommits(self, userList) -> List[str]:
+        """
+        Accepts a List of Users to crawl commits for and crawls them concurrently through the AsyncGerritCrawler.
+        Failed users are reported and returned, the commits of the other users are still written. The checkpoint is
+        reset if all users were crawled.
 
-        #checks for commits, if yes into commits collection if no into no commit collection
-        if commitsList:
-
-            #gets account id out of the commits list
-            userID = commitsList[0]['owner']['_account_id']
+        :param userList: List of users.
+        :type userList: List
+        :return: The users whose crawl failed
+        :rtype: List[str]
+        """
+        try:
+            failedUsers = self.engine.run(userList)
+        finally:
+            #the Parquet files are complete once the crawl ends
+            if self.parquetSink:
+                self.parquetSink.close()
+            if self.checkpoint:
+                self.checkpoint.commit()
+            else:
+                self.flushSinks()
+            if self.watermarks:
+                self.watermarks.commit()
+            self.handler.accounts.save()
+            if self.metricsFile:
+                self.metrics.dump(self.metricsFile)
+
+        #only interrupted or failed crawls are continued, the next run of a finished one starts over
+        if self.checkpoint and not failedUsers:
+            self.checkpoint.reset()
+        return failedUsers
+
+    def crawlQueue(self, workQueue: "WorkQueue.WorkQueue", worker: str = None) -> int:
+        """
+        Crawls users of a shared work queue (see WorkQueue.putUsers) as one of several worker processes, until every
+        unit is done or failed. The worker claims as many units as it crawls concurrently, keeps their leases alive
+        while crawling them and marks them done once their commits are written. Units with a failed user are given back
+        and crawled again (see WorkQueue.failUnits). The outputs of the workers can be separate folders or one MongoDB,
+        where they are upserted.
+
+        :param workQueue: The shared work queue.
+        :type workQueue: WorkQueue.WorkQueue
+        :param worker: Optional. The name of the worker. Default is the host name and process id.
+        :type worker: str
+        :return: The amount of units this worker marked done
+        :rtype: int
+        """
+        worker = worker or workQueue.workerName()
+        done = 0
+        with workQueue.heartbeat(worker):
+            while True:
+                units = workQueue.claimUnits(worker, self.engine.concurrency)
+                if not units:
+                    #the remaining units are leased by other workers and are taken over if their lease expires
+                    if workQueue.wait():
+                        continue
+                    return done
+                try:
+                    failed = set(self.enterManyUsersCommits([user for _, users in units for user in users]))
+                except BaseException:
+                    workQueue.releaseUnits(worker, [key for key, _ in units])
+                    raise
+                workQueue.failUnits(worker, [key for key, users in units if failed.intersection(users)])
+                done += workQueue.doneUnits(worker, [key for key, users in units if not failed.intersection(users)])
+
+    def preloadAccounts(self, allDevs: Union[str, "Collection"] = None, noCommits: "Collection" = None) -> None:
+        """
+        Fills the account cache from the outputs of earlier crawls.
 
-            #inserts commits into collection in DB if one given
-            if self.db:
-                self.mongoDic["commitsCollections"][userID % 10].insert_many(commitsList)
+        :param allDevs: Optional. Either the path of an allDevs.csv file or the allDevs MongoDB collection.
+        :type allDevs: str or pymongo.collection.Collection
+        :param noCommits: Optional. The noCommits MongoDB collection.
+        :type noCommits: pymongo.collection.Collection
+        """
+        if allDevs is not None:
+            self.handler.accounts.preloadDevs(allDevs, self.separator)
+        if noCommits is not None:
+            self.handler.accounts.preloadNoCommits(noCommits)
+        self.handler.accounts.save()
 
-            #inserts commits into a file in a folder if one given
-            if self.folder:
-                with open(self.folderpath + self.folderDic["commitsCollections"][userID % 10], 'a') as f:
-                    for i in commitsList:
-                        f.write(str(i) +'\n')
-        #handles no commits users and ends call
-        else:
-            #inserts user without commits into collection in DB if given one
-            if self.db:
-                self.mongoDic["noCommits"].insert_one({'author': user, 'active': active})
+    def flushSinks(self) -> None:
+        """
+        Writes the buffered documents into the MongoDB and the files and commits the aggregates.
+        """
+        #only the aggregates of documents that were in the sinks before the flush are committed
+        staged = self.summary.takeStaged() if self.summary else None
+        if self.db is not None:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="mongo"):
+                self.mongoSink.flush()
+        if self.folder:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="file"):
+                self.sink.flush()
+        if self.parquetSink:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="parquet"):
+                self.parquetSink.flush()
+        if self.summary:
+            with self.metrics.timer("crawler_sink_flush_seconds", sink="summary"):
+                self.summary.commit(staged)
+
+    def storeCommits(self, userID: int, commitsList: List[Dict]) -> None:
+        """
+        Saves a page of commits into the file/collection corresponding to the last digit of the user's id.
 
-            #inserts user without commits into file in folder if given one
-            if self.folder:
-                userString = user + self.separator + str(active)
-                with open(self.folderpath + self.folderDic["noCommits"], 'a') as f:
-                    f.write(userString + "\n")
+        :param userID: The account id of the owner of the commits.
+        :type userID: int
+        :param commitsList: The commits as dictionaries.
+        :type commitsList: List[Dict]
+        """
+        if not commitsList:
             return
 
-        # loops request until all commits have been found
-        while notDone:
+        self.metrics.inc("crawler_documents_total", len(commitsList), kind="commits")
 
-            # adjusts query result limit accordingly
-            startPoint += self.startpointIncrease
+        #leaves out the fields that aren't needed
+        documents = commitsList
+        if self.fields:
+            documents = [{key: value for key, value in commit.items() if key in self.fields} for commit in commitsList]
 
-            #repeats query with new startPoint
-            commitsList, notDone, active = self.handler.getCommits(user, startPoint)
+        #inserts commits into collection in DB if one given
+        if self.db is not None:
+            self.mongoSink.add(self.mongoDic["commitsCollections"][userID % 10], documents)
 
-            # inserts commits into corresponding collection in DB if one given
-            if self.db:
-                self.mongoDic["commitsCollections"][userID % 10].insert_many(commitsList)
+        #inserts commits into a file in a folder if one given, into one dataset if it is Parquet
+        if self.parquetSink:
+            self.parquetSink.writeDocuments("commits", documents)
+        elif self.folder:
+            self.sink.writeDocuments(self.folderDic["commitsCollections"][userID % 10], documents)
 
-            # inserts commits into a file in a folder if one given
-            if self.folder:
-                with open(self.folderpath + self.folderDic["commitsCollections"][userID % 10], 'a') as f:
-                    for i in commitsList:
-                        f.write(str(i) + "\n")
+        #staged once the commits are in the sinks, so the next flush writes them before they are counted
+        if self.summary:
+            self.summary.addChanges(commitsList)
 
-        #counts commits and puts user in dev collection with that count
-        commitCounter = startPoint + len(commitsList)
+    def storeNoCommits(self, user: str, active: bool) -> None:
+        """
+        Saves a user without commits.
 
-        #enters developer into right collection in DB if one is given
-        if self.db:
-            self.mongoDic["devs"].insert_one({'author': user, 'user-id': userID, "commits": commitCounter,
-                                                       'active': active})
+        :param user: The respective user of the request.
+        :type user: str
+        :param active: If the user's account is active.
+        :type active: bool
+        """
+        #inserts user without commits into collection in DB if given one, with the account id if it is resolved
+        if self.db is not None:
+            account = self.handler.accounts.get(user)
+            self.mongoSink.add(self.mongoDic["noCommits"], [{'author': user, 'active': active,
+                                                             'user-id': account[0] if account else None}])
 
-        # inserts commits into a file in a folder if one given
+        #inserts user without commits into file in folder if given one
         if self.folder:
-            userString = user + self.separator + str(userID) + self.separator + str(commitCounter) + self.separator + \
-                         str(active)
-            with open(self.folderpath + self.folderDic["devs"], 'a') as f:
-                f.write(str(userString) + "\n")
+            userString = user + self.separator + str(active)
+            self.sink.writeLines(self.folderDic["noCommits"], [userString])
 
-    def enterManyUsersCommits(self, userList) -> None:
+    def storeDev(self, user: str, userID: int, commitCounter: int, active: bool) -> None:
         """
-        Accepts a List of Users to crawl commits for and executes it for each user.
+        Saves a developer with their commit counter.
 
-        :param userList: List of users.
-        :type userList: List
+        :param user: The respective user of the request.
+        :type user: str
+        :param userID: The account id of the user.
+        :type userID: int
+        :param commitCounter: The amount of commits of the user.
+        :type commitCounter: int
+        :param active: If the user's account is active.
+        :type active: bool
         """
-        for user in userList:
-            self.enterOneUserCommits(user)
+        #enters developer into right collection in DB if one is given
+        if self.db is not None:
+            self.mongoSink.add(self.mongoDic["devs"], [{'author': user, 'user-id': userID, "commits": commitCounter,
+                                                        'active': active}])
+
+        #inserts developer into a file in a folder if one given
+        if self.folder:
+            userString = user + self.separator + str(userID) + self.separator + str(commitCounter) + self.separator + \
+                         str(active)
+            self.sink.writeLines(self.folderDic["devs"], [userString])
 
     def createFolder(self, foldername: str) -> None:
         """
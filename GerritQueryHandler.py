@@ -1,16 +1,24 @@
 import requests
-import ast
 import re
-import pprint
+from urllib.parse import quote
+import ResponseDecoder
+import AccountCache
+import HttpClient
+import Metrics
 from typing import List, Union, Dict, Optional, Tuple
 
+#format of the timestamps of Gerrit
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f000"
+
 
 class GerritQueryHandler:
     """
     Handles the execution of the requests and the formatting of the responses.
     """
 
-    def __init__(self, url: str, beforeDate: str = None, afterDate: str = None) -> None:
+    def __init__(self, url: str, beforeDate: str = None, afterDate: str = None,
+                 accounts: AccountCache.AccountCache = None, session: HttpClient.HttpClient = None,
+                 options: List[str] = None, metrics: Metrics.Metrics = None) -> None:
         """
         Initializes the Query Handler with url and optional time parameters.
 
@@ -22,16 +30,41 @@ class GerritQueryHandler:
         :param afterDate: Optional. A possible date for a 'after' parameter in your query. It has to be in the format
         of yyyy-mm-dd.
         :type afterDate: str
+        :param accounts: Optional. The cache of resolved account ids. Default is a cache only living in memory.
+        :type accounts: AccountCache.AccountCache
+        :param session: Optional. The HTTP client performing the requests, can be shared with other crawlers. Default
+        is a new client.
+        :type session: HttpClient.HttpClient
+        :param options: Optional. The options (o) of the queries, e.g. ['LABELS']. Default is the default ChangeInfo.
+        :type options: List[str]
+        :param metrics: Optional. Records the parse times, inactive accounts and profiles getCommits. Default are new
+        metrics.
+        :type metrics: Metrics.Metrics
         """
-        self.session = requests.session()
+        self.metrics = metrics if metrics is not None else Metrics.Metrics()
+
+        #rate limits and retries the requests
+        self.session = session if session is not None else HttpClient.HttpClient()
+        if self.session.metrics is None:
+            self.session.metrics = self.metrics
+
+        #resolved account ids, so inactive accounts don't need two requests per page
+        self.accounts = accounts if accounts is not None else AccountCache.AccountCache()
+
+        #users that don't exist, found by failed fused queries
+        self.unknownUsers = set()
+
+        #decodes the responses with the fastest available JSON backend
+        self.decoder = ResponseDecoder.defaultDecoder
 
         self.url = url
 
         #optional request parameters
         self.before = beforeDate
         self.after = afterDate
+        self.options = list(options) if options else []
 
-    def buildURL(self, user: str, startpoint: int) -> str:
+    def buildURL(self, user: str, startpoint: int, since: str = None) -> str:
         """
         Builds the request url out the given parameters.
 
@@ -40,6 +73,48 @@ class GerritQueryHandler:
         :param startpoint: The startpoint of the query. Necessary as the response amount is restricted and the request
         needs to be executed multiple times with different startpoints.
         :type startpoint: int
+        :param since: Optional. Only changes updated at or after this timestamp (as in the 'updated' field of a
+        change) are requested. Used by incremental crawls.
+        :type since: str
+        :return: The final request url
+        :rtype: str
+        """
+        return self.buildQueryURL('owner:' + user, startpoint, since)
+
+    def buildFusedURL(self, owners: List[str], startpoint: int, since: str = None, pageSize: int = None) -> str:
+        """
+        Builds the request url of one query for the changes of several owners. The owners are returned with their
+        account details, so the changes can be assigned to the users.
+
+        :param owners: The names or account ids of the owners.
+        :type owners: List[str]
+        :param startpoint: The startpoint of the query.
+        :type startpoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
+        :param pageSize: Optional. The amount of changes per page (n). Default is the limit of the server.
+        :type pageSize: int
+        :return: The final request url
+        :rtype: str
+        """
+        query = '(' + '+OR+'.join('owner:' + owner for owner in owners) + ')'
+        url = self.buildQueryURL(query, startpoint, since)
+        if 'DETAILED_ACCOUNTS' not in self.options:
+            url += '&o=DETAILED_ACCOUNTS'
+        if pageSize:
+            url += '&n=' + str(pageSize)
+        return url
+
+    def buildQueryURL(self, query: str, startpoint: int, since: str = None) -> str:
+        """
+        Builds the request url of the query with the optional time params and the startpoint.
+
+        :param query: The owner part of the query.
+        :type query: str
+        :param startpoint: The startpoint of the query.
+        :type startpoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
         :return: The final request url
         :rtype: str
         """
@@ -48,8 +123,8 @@ class GerritQueryHandler:
         if self.url[-1] != '/':
             url += '/'
 
-        #enters user into request url
-        url += '?q=owner:' + user
+        #enters query into request url
+        url += '?q=' + query
 
         #adds optional time params
         if self.before:
@@ -57,6 +132,14 @@ class GerritQueryHandler:
         if self.after:
             url +='+after:' + self.after
 
+        #adds the watermark of an incremental crawl, cut to seconds as Gerrit doesn't accept nanoseconds
+        if since:
+            url += '+since:' + quote('"' + since[:19] + '"')
+
+        #adds the options of the changes
+        for option in self.options:
+            url += '&o=' + option
+
         #adds the startpoint
         url += '&S=' + str(startpoint)
 
@@ -64,7 +147,8 @@ class GerritQueryHandler:
         return url
 
     #makes request for commits and returns it as formatted list
-    def getCommits(self, user: str, startpoint: int) -> Tuple[List[Dict], bool, bool]:
+    @Metrics.profiled("getCommits")
+    def getCommits(self, user: str, startpoint: int, since: str = None) -> Tuple[List[Dict], bool, bool, str]:
         """
         Executes the request and gets all commits fitting the parameters belonging to the user.
 
@@ -73,12 +157,25 @@ class GerritQueryHandler:
         :param startpoint: The startpoint of the query. Necessary as the response amount is restricted and the request
         needs to be executed multiple times with different startpoints.
         :type startpoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
         :return: Returns the commitList which contains the commits as dictionaries, if there are no commits it will
-        be an empty list. Also returns if the request ist finished and if the user is active.
-        :rtype: Tuple[List[Dict], bool, bool]
+        be an empty list. Also returns if the request ist finished, if the user is active and the server time of the
+        request (see requestTime).
+        :rtype: Tuple[List[Dict], bool, bool, str]
         """
+        #queries directly by the account id if it is already resolved
+        cached = self.accounts.get(user)
+        if cached:
+            accountID, active = cached
+            userCommitsTime = self.session.get(self.buildURL(str(accountID), startpoint, since))
+            if self.isNotFound(userCommitsTime):
+                return [], False, active, self.requestTime(userCommitsTime)
+            commitsList, notDone = self.formatStringToList(userCommitsTime)
+            return commitsList, notDone, active, self.requestTime(userCommitsTime)
+
         active = True
-        url = self.buildURL(user, startpoint)
+        url = self.buildURL(user, startpoint, since)
 
         #actual request
         userCommitsTime = self.session.get(url)
@@ -88,7 +185,7 @@ class GerritQueryHandler:
 
         #handles inactive accounts
         if "following exact account" in userCommitsTime.text:
-            print("inactive!")
+            self.metrics.inc("gerrit_inactive_accounts_total")
 
             active = False
 
@@ -96,45 +193,119 @@ class GerritQueryHandler:
             ID_candidate = re.findall(r'(\d+):', userCommitsTime.text)
 
             if ID_candidate:
-                url = self.buildURL(ID_candidate[0], startpoint)
+                self.accounts.put(user, int(ID_candidate[0]), active)
+                url = self.buildURL(ID_candidate[0], startpoint, since)
 
                 userCommitsTime = self.session.get(url)
             else:
                 print("Error: no ID_candidate" + user)
                 print(userCommitsTime.text)
 
+        #unknown accounts have no changes
+        if self.isNotFound(userCommitsTime):
+            return [], False, active, self.requestTime(userCommitsTime)
+
         commitsList, notDone = self.formatStringToList(userCommitsTime)
 
-        return commitsList, notDone, active
+        #remembers the account id of active users for the next pages and crawls
+        if commitsList and active:
+            self.accounts.put(user, commitsList[0]['owner']['_account_id'], active)
 
-    def formatStringToList(self, string: str) -> Tuple[List[Dict], bool]:
-        """
-        Formats the text of the response (string) into a list of dictionaries.
+        return commitsList, notDone, active, self.requestTime(userCommitsTime)
 
-        :param string: The to be formatted text.
-        :type string: str
-        :return: Returns the formatted list and if the request is finished
-        :rtype: Tuple[List[Dict], bool]
+    @Metrics.profiled("getFusedCommits")
+    def getFusedCommits(self, users: List[str], startpoint: int, since: str = None,
+                        pageSize: int = None) -> Tuple[Optional[List[Dict]], bool, Optional[str]]:
         """
+        Requests one page of the changes of several users with one query. Users whose account id is cached are
+        queried by it. If a user only matches an inactive account the whole query fails, its account id is then
+        taken from the error and cached, so the query can be repeated. If a user doesn't exist the whole query fails
+        as well, the user is then added to unknownUsers, so the query can be repeated without it.
+
+        :param users: The names of the users.
+        :type users: List[str]
+        :param startpoint: The startpoint of the query.
+        :type startpoint: int
+        :param since: Optional. Only changes updated at or after this timestamp are requested.
+        :type since: str
+        :param pageSize: Optional. The amount of changes per page (n).
+        :type pageSize: int
+        :return: The changes, if there are more changes to be requested and the server time of the request (see
+        requestTime). The changes and the time are None if an inactive or unknown account failed the query.
+        :rtype: Tuple[List[Dict], bool, str]
+        """
+        owners = []
+        for user in users:
+            cached = self.accounts.get(user)
+            owners.append(str(cached[0]) if cached else user)
 
-        #cuts first line
-        commitsString = string.text.split("\n", 1)[1]
+        response = self.session.get(self.buildFusedURL(owners, startpoint, since, pageSize))
 
-        if commitsString == '':
-            return [], False
+        #handles inactive accounts
+        if "following exact account" in response.text:
+            name = re.findall(r"ccount '(.+?)' only matches", response.text)
+            ID_candidate = re.findall(r'(\d+):', response.text)
+            if name and ID_candidate and name[0] in users:
+                self.accounts.put(name[0], int(ID_candidate[0]), False)
+            else:
+                print("Error: no ID_candidate in fused query of " + str(users))
+            return None, False, None
+
+        #handles unknown accounts
+        if self.isNotFound(response):
+            name = re.findall(r"ccount '(.+?)' not found", response.text)
+            if name and name[0] in users:
+                self.unknownUsers.add(name[0])
+            else:
+                print("Error: unknown account in fused query of " + str(users) + ": " + response.text)
+            return None, False, None
 
-        #checks for more changes, sets notDone accordingly
-        if '"_more_changes": true' in commitsString:
-            commitsString = commitsString.replace('"_more_changes": true\n', '')
-            notDone = True
-        else:
-            notDone = False
+        return self.formatStringToList(response) + (self.requestTime(response),)
 
-        commitsString = commitsString.replace('true', 'True').replace('false', 'False')
-        # print(user)
-        # print(commitsString)
+    def isNotFound(self, response: requests.Response) -> bool:
+        """
+        Checks if the query failed because an account of it doesn't exist. Gerrit answers it with a plain text error
+        (e.g. "Account 'x' not found") instead of the changes.
 
-        #converts string to a list
-        commitsList = ast.literal_eval(commitsString)
+        :param response: The response of the request.
+        :type response: requests.Response
+        :return: If an account of the query doesn't exist
+        :rtype: bool
+        """
+        if response.status_code not in (400, 404) or response.content.startswith(b")]}'"):
+            return False
+        if "not found" not in response.text:
+            return False
+        self.metrics.inc("gerrit_unknown_accounts_total")
+        return True
+
+    @staticmethod
+    def requestTime(response: requests.Response) -> str:
+        """
+        Returns the server time at which the request of the response was sent as Gerrit timestamp. Changes updated
+        after it can be missing in the response, so it bounds the watermark of an incremental crawl.
+
+        :param response: The response of the request.
+        :type response: requests.Response
+        :return: The time of the request
+        :rtype: str
+        """
+        return HttpClient.HttpClient.requestTime(response).strftime(TIME_FORMAT)
 
-        return commitsList, notDone
+    def formatStringToList(self, string: requests.Response) -> Tuple[List[Dict], bool]:
+        """
+        Formats the body of the response (string) into a list of dictionaries.
+
+        :param string: The response of the request.
+        :type string: requests.Response
+        :return: Returns the formatted list and if the request is finished
+        :rtype: Tuple[List[Dict], bool]
+        """
+        #server errors that persisted through the retries fail the user instead of ending its commits
+        if string.status_code in HttpClient.RETRY_STATUS:
+            string.raise_for_status()
+
+        #strips the XSSI prefix, decodes the changes and reads _more_changes from the last one
+        content = string.content
+        with self.metrics.timer("crawler_parse_seconds", crawler="gerrit"):
+            return self.decoder.decodeGerrit(content)
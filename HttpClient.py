@@ -0,0 +1,306 @@
+import datetime
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import Metrics
+import ResponseCache
+
+#status codes with which the server asks to slow down
+THROTTLE_STATUS = {429, 503}
+
+#status codes that are retried
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+#methods that can be repeated without side effects if the server may have processed them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class HostLimiter:
+    """
+    Token bucket limiting the request rate to one host. The rate adapts additive-increase/multiplicative-decrease:
+    every healthy response raises it a little, every throttling response halves it and pauses the host for the time
+    the server asked for.
+    """
+
+    def __init__(self, rate: float, minRate: float, maxRate: float, increase: float) -> None:
+        """
+        Initializes the bucket full.
+
+        :param rate: The initial requests per second.
+        :type rate: float
+        :param minRate: The lowest requests per second the rate is decreased to.
+        :type minRate: float
+        :param maxRate: The highest requests per second the rate is increased to.
+        :type maxRate: float
+        :param increase: The requests per second the rate is increased by per healthy response.
+        :type increase: float
+        """
+        self.rate = rate
+        self.minRate = minRate
+        self.maxRate = maxRate
+        self.increase = increase
+
+        self.tokens = 1.0
+        self.last = time.monotonic()
+        self.blockedUntil = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Blocks until the host may receive the next request.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                #the bucket holds at most one second of requests
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if now < self.blockedUntil:
+                    wait = self.blockedUntil - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def success(self) -> None:
+        """
+        Raises the rate after a healthy response.
+        """
+        with self.lock:
+            self.rate = min(self.maxRate, self.rate + self.increase)
+
+    def throttle(self, wait: float) -> None:
+        """
+        Halves the rate and pauses the host after a throttling response.
+
+        :param wait: The seconds the host is paused.
+        :type wait: float
+        """
+        with self.lock:
+            self.rate = max(self.minRate, self.rate / 2)
+            self.tokens = 0.0
+            self.blockedUntil = max(self.blockedUntil, time.monotonic() + wait)
+
+
+class HttpClient(requests.Session):
+    """
+    Session shared by the crawlers. Every request passes the adaptive rate limit of its host and a limit of requests
+    in flight. Throttled requests (429, 503) respect 'Retry-After', server errors and connection failures are retried
+    with jittered exponential backoff, so the crawlers run at the rate the server sustains without hand-tuning workers.
+    """
+
+    def __init__(self, rate: float = 20.0, minRate: float = 0.5, maxRate: float = 200.0, increase: float = 0.5,
+                 maxInFlight: int = 32, retries: int = 5, backoff: float = 0.5, maxBackoff: float = 60.0,
+                 metrics: Metrics.Metrics = None, cache: ResponseCache.ResponseCache = None) -> None:
+        """
+        Initializes the Client.
+
+        :param rate: Optional. The initial requests per second per host. Default is 20.
+        :type rate: float
+        :param minRate: Optional. The lowest requests per second per host. Default is 0.5.
+        :type minRate: float
+        :param maxRate: Optional. The highest requests per second per host. Default is 200.
+        :type maxRate: float
+        :param increase: Optional. The requests per second the rate grows by per healthy response. Default is 0.5.
+        :type increase: float
+        :param maxInFlight: Optional. The maximum amount of requests in flight. Default is 32.
+        :type maxInFlight: int
+        :param retries: Optional. How often a failed request is retried. Default is 5.
+        :type retries: int
+        :param backoff: Optional. The seconds of the first backoff, doubled with every retry. Default is 0.5.
+        :type backoff: float
+        :param maxBackoff: Optional. The maximum seconds of a backoff. Default is 60.
+        :type maxBackoff: float
+        :param metrics: Optional. Records the latency, status, size and retries of the requests. Default are the
+        metrics of the first crawler using the client.
+        :type metrics: Metrics.Metrics
+        :param cache: Optional. Answers GET requests from an on-disk cache and revalidates cached responses with
+        conditional requests. Default is no cache.
+        :type cache: ResponseCache.ResponseCache
+        """
+        super().__init__()
+        self.metrics = metrics
+        self.cache = cache
+        self.rate = rate
+        self.minRate = minRate
+        self.maxRate = maxRate
+        self.increase = increase
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+
+        self.inFlight = threading.BoundedSemaphore(maxInFlight)
+
+        #rate limits by host
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+        #amount of retried requests
+        self.retried = 0
+
+        #size of the keep-alive pool per host
+        self.pool = 0
+
+    def poolSize(self, size: int) -> None:
+        """
+        Makes the keep-alive pool of every host hold at least size connections. The pool only grows, so crawls that
+        share the client keep the connections of each other.
+
+        :param size: The amount of connections per host, e.g. the amount of workers.
+        :type size: int
+        """
+        with self.lock:
+            if size <= self.pool:
+                return
+            self.pool = size
+            adapter = HTTPAdapter(pool_maxsize=size)
+            self.mount('http://', adapter)
+            self.mount('https://', adapter)
+
+    def limiter(self, url: str) -> HostLimiter:
+        """
+        Returns the rate limit of the host of the url.
+
+        :param url: The url of the request.
+        :type url: str
+        :return: The limiter of the host
+        :rtype: HostLimiter
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.limiters:
+                self.limiters[host] = HostLimiter(self.rate, self.minRate, self.maxRate, self.increase)
+            return self.limiters[host]
+
+    def backoffTime(self, attempt: int) -> float:
+        """
+        Returns the jittered exponential backoff before the retry.
+
+        :param attempt: The number of the failed attempt starting with 0.
+        :type attempt: int
+        :return: The seconds to wait
+        :rtype: float
+        """
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def retryAfter(response: requests.Response) -> Optional[float]:
+        """
+        Returns the seconds of the 'Retry-After' header of the response, which is either seconds or an HTTP date.
+
+        :param response: The response.
+        :type response: requests.Response
+        :return: The seconds to wait or None if the header is missing or invalid
+        :rtype: float
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def requestTime(response: requests.Response) -> datetime.datetime:
+        """
+        Returns the server time (UTC) at which the request of the response was sent at the latest: the 'Date' header
+        minus the time until the response arrived, or the local time if the server sent no date. Everything changed on
+        the server after it is newer than this time, so it can be the watermark of what the response contains.
+
+        :param response: The response.
+        :type response: requests.Response
+        :return: The time of the request
+        :rtype: datetime.datetime
+        """
+        try:
+            sent = parsedate_to_datetime(response.headers["Date"])
+        except (KeyError, TypeError, ValueError):
+            sent = datetime.datetime.now(datetime.timezone.utc)
+        if sent.tzinfo is None:
+            sent = sent.replace(tzinfo=datetime.timezone.utc)
+        return sent.astimezone(datetime.timezone.utc) - response.elapsed
+
+    def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        """
+        Performs the request, GET requests through the cache if the client has one.
+        """
+        if self.cache is None or method.upper() != "GET" or args or kwargs.get("params"):
+            return self.fetch(method, url, *args, **kwargs)
+
+        def send(validators: dict) -> requests.Response:
+            return self.fetch(method, url, **{**kwargs, "headers": {**(kwargs.get("headers") or {}), **validators}})
+
+        response, result = self.cache.get(url, send, kwargs.get("stream", False))
+        if self.metrics:
+            self.metrics.inc("http_cache_total", result=result)
+        return response
+
+    def fetch(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        """
+        Performs the request within the limits and retries it on throttling, server errors and connection failures.
+        The response of the last attempt is returned, connection failures of the last attempt are raised.
+        """
+        limiter = self.limiter(url)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        metrics = self.metrics
+
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            start = time.perf_counter()
+            try:
+                with self.inFlight:
+                    response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if metrics:
+                    metrics.inc("http_requests_total", status=type(e).__name__)
+                if not idempotent or attempt == self.retries:
+                    raise
+                self.retried += 1
+                if metrics:
+                    metrics.inc("http_retries_total")
+                time.sleep(self.backoffTime(attempt))
+                continue
+
+            status = response.status_code
+            if metrics:
+                #the latency until the headers arrived, streamed bodies are read later
+                metrics.observe("http_request_seconds", time.perf_counter() - start)
+                metrics.inc("http_requests_total", status=str(status))
+                size = response.headers.get("Content-Length")
+                if size and size.isdigit():
+                    metrics.inc("http_response_bytes_total", int(size))
+            if status in THROTTLE_STATUS:
+                wait = self.retryAfter(response)
+                limiter.throttle(wait if wait is not None else self.backoffTime(attempt))
+                if metrics:
+                    metrics.inc("http_throttled_total")
+            elif status < 500:
+                limiter.success()
+
+            #requests the server may have processed are only repeated if they are idempotent
+            retry = status in THROTTLE_STATUS or (status in RETRY_STATUS and idempotent)
+            if not retry or attempt == self.retries:
+                return response
+
+            response.close()
+            self.retried += 1
+            if metrics:
+                metrics.inc("http_retries_total")
+            if status not in THROTTLE_STATUS:
+                time.sleep(self.backoffTime(attempt))
+
+        return response
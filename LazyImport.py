@@ -0,0 +1,40 @@
+import importlib
+import threading
+from typing import Any
+
+
+class LazyImport:
+    """
+    Stands in for a module or an attribute of a module that is only imported when it is used for the first time, so
+    heavy dependencies (e.g. numpy, pymongo, tqdm) don't slow down the start of crawls that don't need them.
+    """
+
+    def __init__(self, module: str, attribute: str = None) -> None:
+        """
+        :param module: The name of the module.
+        :type module: str
+        :param attribute: Optional. The name of the attribute of the module that is stood in for. Default is the
+        module itself.
+        :type attribute: str
+        """
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        """
+        Imports the module and returns the module or its attribute.
+        """
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module)
+                    self._target = getattr(target, self._attribute) if self._attribute else target
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load()(*args, **kwargs)
@@ -0,0 +1,245 @@
+import bisect
+import contextlib
+import functools
+import json
+import threading
+import time
+from typing import Callable, ContextManager, Dict, Iterator, List, Tuple
+
+#upper bounds of the histogram buckets in seconds, the last bucket is unbounded
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        """
+        Initializes the Histogram with the upper bounds of its buckets.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """
+        Counts the value in its bucket.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, share: float) -> float:
+        """
+        Returns the upper bound of the bucket containing the quantile.
+        """
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return 0.0
+
+
+class Metrics:
+    """
+    Collects the metrics of a crawl: counters (e.g. requests, retries, bytes, documents), gauges (e.g. queue depths)
+    and histograms of durations (e.g. request latency, parse time, sink flush time). Every record is also passed to
+    the registered hooks. The metrics can be dumped as JSON or in the Prometheus text format.
+    Recording is a dictionary update under a lock, so it can stay on in production.
+    """
+
+    def __init__(self, profiler: Callable[[str], ContextManager] = None) -> None:
+        """
+        Initializes empty Metrics.
+
+        :param profiler: Optional. Called with the name of a profiled section (getCommits, get_all_bugs,
+        get_all_comments) and returns a context manager running around it, e.g. a sampling profiler. See
+        pyinstrumentProfiler.
+        :type profiler: Callable
+        """
+        self.profiler = profiler
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    def addHook(self, hook: Callable[[str, str, Dict[str, str], float], None]) -> None:
+        """
+        Registers a callback that receives every record as (kind, name, labels, value), kind being 'counter',
+        'gauge' or 'histogram'.
+
+        :param hook: The callback.
+        :type hook: Callable
+        """
+        self.hooks.append(hook)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Increases a counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for hook in self.hooks:
+            hook("counter", name, labels, value)
+
+    def gauge(self, name: str, value: float, **labels: str) -> None:
+        """
+        Sets a gauge.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+        for hook in self.hooks:
+            hook("gauge", name, labels, value)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Adds an observation to a histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+        for hook in self.hooks:
+            hook("histogram", name, labels, value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Observes the seconds the block takes in a histogram.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextlib.contextmanager
+    def profile(self, section: str) -> Iterator[None]:
+        """
+        Times the section and runs the profiler around it if one is set.
+        """
+        with self.timer("crawler_section_seconds", section=section):
+            if self.profiler:
+                with self.profiler(section):
+                    yield
+            else:
+                yield
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """
+        Returns all metrics as JSON compatible dictionary.
+        """
+        with self.lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                "histograms": [{"name": name, "labels": dict(labels), "count": histogram.count,
+                                "sum": histogram.sum, "p50": histogram.quantile(0.5),
+                                "p99": histogram.quantile(0.99),
+                                "buckets": dict(zip([str(bound) for bound in histogram.buckets] + ["+Inf"],
+                                                    histogram.counts))}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def prometheus(self) -> str:
+        """
+        Returns all metrics in the Prometheus text format.
+        """
+        def labelText(labels: Tuple, extra: Tuple = ()) -> str:
+            labels = labels + extra
+            if not labels:
+                return ""
+            return "{" + ",".join('{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in labels) + "}"
+
+        lines = []
+        with self.lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                typed = set()
+                for (name, labels), value in sorted(values.items()):
+                    if name not in typed:
+                        lines.append("# TYPE {} {}".format(name, kind))
+                        typed.add(name)
+                    lines.append("{}{} {}".format(name, labelText(labels), value))
+            typed = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append("# TYPE {} histogram".format(name))
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append("{}_bucket{} {}".format(name, labelText(labels, (("le", bound),)), cumulative))
+                lines.append("{}_sum{} {}".format(name, labelText(labels), histogram.sum))
+                lines.append("{}_count{} {}".format(name, labelText(labels), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """
+        Writes all metrics into the file, in the Prometheus text format if it ends with .prom, else as JSON.
+
+        :param path: The path of the file.
+        :type path: str
+        """
+        with open(path, "w") as f:
+            if path.endswith(".prom"):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+
+def profiled(section: str) -> Callable:
+    """
+    Decorator for methods of objects with a metrics attribute, runs the method as profiled section.
+
+    :param section: The name of the section.
+    :type section: str
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.profile(section):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def pyinstrumentProfiler(folder: str) -> Callable[[str], ContextManager]:
+    """
+    Returns a profiler for Metrics that samples every profiled section with pyinstrument (needs the pyinstrument
+    package) and writes the report as <section>-<time>.txt into the folder.
+
+    :param folder: The folder the reports are written into.
+    :type folder: str
+    :return: The profiler
+    :rtype: Callable
+    """
+    from pyinstrument import Profiler
+
+    @contextlib.contextmanager
+    def profile(section: str) -> Iterator[None]:
+        profiler = Profiler()
+        #pyinstrument can't profile a section that is already profiled in the same thread
+        try:
+            profiler.start()
+        except RuntimeError:
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open("{}/{}-{}.txt".format(folder, section, time.time()), "w") as f:
+                f.write(profiler.output_text())
+
+    return profile
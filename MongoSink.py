@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import Dict, List
+
+from pymongo import ASCENDING, InsertOne, UpdateOne
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, OperationFailure
+
+#natural keys of the documents the crawlers write, used for idempotent upserts
+KEYS = {
+    **{"id{}".format(x): "id" for x in range(10)},
+    "allDevs": "author",
+    "noCommits": "author",
+    "BugIDs": "ID",
+    "BugsData": "id",
+    "Comments": "id",
+}
+
+#indexes needed by the upserts and by the usual downstream queries as (field, unique)
+INDEXES = {
+    **{"id{}".format(x): [("id", True), ("owner._account_id", False)] for x in range(10)},
+    "allDevs": [("author", True), ("user-id", False)],
+    "noCommits": [("author", True)],
+    "BugIDs": [("ID", True)],
+    "BugsData": [("id", True)],
+    "Comments": [("id", True), ("bug_id", False)],
+}
+
+
+class MongoSink:
+    """
+    Writes the documents of the crawlers into a MongoDB. The documents are buffered per collection and flushed as
+    unordered bulk writes once a batch is full or the flush interval has passed. Documents with a natural key are
+    upserted on it, so crawling the same data again doesn't create duplicates.
+    """
+
+    def __init__(self, mongoDB: Database, batchSize: int = 1000, flushInterval: float = 5.0,
+                 keys: Dict[str, str] = None, indexes: Dict[str, List] = None) -> None:
+        """
+        Initializes the Sink and creates the indexes of the collections.
+
+        :param mongoDB: The database the documents are written into.
+        :type mongoDB: pymongo.database.Database
+        :param batchSize: Optional. The amount of buffered documents of a collection after which they are written.
+        Default is 1000.
+        :type batchSize: int
+        :param flushInterval: Optional. The seconds after which the buffers are written even if they aren't full.
+        Default is 5.
+        :type flushInterval: float
+        :param keys: Optional. The natural key of the documents per collection name. Default are the keys of the
+        crawler collections. Documents of collections without a key are inserted.
+        :type keys: Dict[str, str]
+        :param indexes: Optional. The indexes per collection name as lists of (field, unique). Default are the
+        indexes of the crawler collections.
+        :type indexes: Dict[str, List]
+        """
+        self.db = mongoDB
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.keys = KEYS if keys is None else keys
+        self.indexes = INDEXES if indexes is None else indexes
+
+        #buffered write operations per collection
+        self.buffers = {}
+        self.lastFlush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.ensureIndexes()
+
+    def ensureIndexes(self) -> None:
+        """
+        Creates the indexes of the collections if they don't exist already.
+        """
+        for collection, fields in self.indexes.items():
+            for field, unique in fields:
+                try:
+                    self.db[collection].create_index([(field, ASCENDING)], unique=unique)
+                except OperationFailure as e:
+                    #e.g. duplicates from crawls before the upserts
+                    print('Error: Creating index ' + field + ' on ' + collection + ': ' + str(e))
+
+    def add(self, collection: str, documents: List[Dict]) -> None:
+        """
+        Buffers the documents for the collection and writes the buffers if a batch is full or the flush interval has
+        passed.
+
+        :param collection: The name of the collection.
+        :type collection: str
+        :param documents: The documents to be written.
+        :type documents: List[Dict]
+        """
+        key = self.keys.get(collection)
+        if key:
+            operations = [UpdateOne({key: document[key]}, {"$set": document}, upsert=True)
+                          if key in document else InsertOne(document) for document in documents]
+        else:
+            operations = [InsertOne(document) for document in documents]
+
+        with self.lock:
+            buffer = self.buffers.setdefault(collection, [])
+            buffer += operations
+            #writes everything once the interval has passed, otherwise only the full batches
+            if time.monotonic() - self.lastFlush >= self.flushInterval:
+                full = list(self.buffers)
+                self.lastFlush = time.monotonic()
+            else:
+                full = [name for name, operations in self.buffers.items() if len(operations) >= self.batchSize]
+            batches = [(name, self.buffers.pop(name)) for name in full]
+
+        self.write(batches)
+
+    def flush(self) -> None:
+        """
+        Writes all buffered documents.
+        """
+        with self.lock:
+            batches = list(self.buffers.items())
+            self.buffers = {}
+            self.lastFlush = time.monotonic()
+
+        self.write(batches)
+
+    def write(self, batches: List) -> None:
+        """
+        Writes the operations as unordered bulk writes of at most batchSize operations.
+
+        :param batches: The operations as list of (collection name, operations).
+        :type batches: List
+        """
+        for collection, operations in batches:
+            for start in range(0, len(operations), self.batchSize):
+                try:
+                    self.db[collection].bulk_write(operations[start:start + self.batchSize], ordered=False)
+                except BulkWriteError as e:
+                    print('Error: ' + str(len(e.details.get("writeErrors", []))) + ' documents could not be '
+                          'written into ' + collection + ': ' + str(e.details.get("writeErrors", [])[:3]))
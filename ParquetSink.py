@@ -0,0 +1,246 @@
+import atexit
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+#how the documents of the datasets are partitioned: the column holding the date (by month) and the account
+PARTITION_COLUMNS = {
+    "commits": {"month": "created", "account": "owner"},
+    "bugs": {"month": "creation_time", "account": "creator"},
+    "comments": {"month": "creation_time", "account": "creator"},
+}
+
+#amount of account partitions, like the hash split of the JSON Lines files
+ACCOUNT_BUCKETS = 10
+
+#column holding the fields of a document that are not part of the schema as JSON
+EXTRA_COLUMN = "extra"
+
+
+def defaultSchemas() -> Dict[str, Any]:
+    """
+    Returns the schemas of the datasets the crawlers write: Gerrit ChangeInfo (commits), Bugzilla bugs and comments.
+    The schemas contain the fields that are usually analysed, all others are kept in the extra column, also those of
+    the accounts that are not part of their struct (e.g. display_name or avatars of the owner).
+    """
+    import pyarrow as pa
+
+    time = pa.timestamp("us", tz="UTC")
+    account = pa.struct([("_account_id", pa.int64()), ("name", pa.string()), ("email", pa.string()),
+                         ("username", pa.string())])
+    return {
+        "commits": pa.schema([
+            ("id", pa.string()), ("project", pa.string()), ("branch", pa.string()), ("topic", pa.string()),
+            ("change_id", pa.string()), ("subject", pa.string()), ("status", pa.string()), ("created", time),
+            ("updated", time), ("submitted", time), ("mergeable", pa.bool_()), ("insertions", pa.int64()),
+            ("deletions", pa.int64()), ("_number", pa.int64()), ("owner", account),
+        ]),
+        "bugs": pa.schema([
+            ("id", pa.int64()), ("summary", pa.string()), ("status", pa.string()), ("resolution", pa.string()),
+            ("product", pa.string()), ("component", pa.string()), ("version", pa.string()),
+            ("priority", pa.string()), ("severity", pa.string()), ("creator", pa.string()),
+            ("assigned_to", pa.string()), ("creation_time", time), ("last_change_time", time),
+            ("is_open", pa.bool_()), ("keywords", pa.list_(pa.string())), ("cc", pa.list_(pa.string())),
+        ]),
+        "comments": pa.schema([
+            ("id", pa.int64()), ("bug_id", pa.int64()), ("count", pa.int64()), ("creator", pa.string()),
+            ("creation_time", time), ("is_private", pa.bool_()), ("attachment_id", pa.int64()), ("text", pa.string()),
+        ]),
+    }
+
+
+def parseTime(value: Optional[str]) -> Optional[datetime.datetime]:
+    """
+    Parses the timestamps of Gerrit ('2020-01-01 12:00:00.000000000') and Bugzilla ('2020-01-01T12:00:00Z') as UTC.
+    """
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.rstrip("Z")[:26]).replace(tzinfo=datetime.timezone.utc)
+
+
+class ParquetSink:
+    """
+    Writes the documents of the crawlers as Parquet datasets (needs the pyarrow package), one folder per dataset
+    (commits, bugs, comments), optionally partitioned Hive-style by month or account. The documents are converted into
+    the schema of the dataset, given or inferred from the first documents, and buffered per partition until a row
+    group is full. The files stay open across flushes, so a crawl writes one file per partition, and are only complete
+    on disk once they are closed (see close).
+    """
+
+    def __init__(self, folderpath: str, partitionBy: str = None, compression: str = "zstd",
+                 rowGroupSize: int = 100000, maxBufferedRows: int = 500000, schemas: Dict[str, Any] = None) -> None:
+        """
+        Initializes the Sink for the given folder.
+
+        :param folderpath: The path of the folder the datasets are written into, ending with '/'.
+        :type folderpath: str
+        :param partitionBy: Optional. Either 'month' (of the creation) or 'account' (hash buckets of the owner or
+        creator). Default is no partitioning.
+        :type partitionBy: str
+        :param compression: Optional. The compression of the Parquet files, e.g. 'zstd', 'snappy', 'gzip' or 'none'.
+        Default is 'zstd'.
+        :type compression: str
+        :param rowGroupSize: Optional. The amount of rows per row group. Default is 100000.
+        :type rowGroupSize: int
+        :param maxBufferedRows: Optional. The amount of buffered rows of all partitions after which the biggest buffer
+        is written even if its row group isn't full. Default is 500000.
+        :type maxBufferedRows: int
+        :param schemas: Optional. The pyarrow schemas by dataset. Datasets without one get the schema inferred from
+        their first documents. Default are the schemas of defaultSchemas.
+        :type schemas: Dict[str, pyarrow.Schema]
+        """
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+
+        if partitionBy not in (None, "month", "account"):
+            raise ValueError("Unknown partitioning '{}', choices are month and account".format(partitionBy))
+
+        self.folderpath = folderpath
+        self.partitionBy = partitionBy
+        self.compression = compression
+        self.rowGroupSize = rowGroupSize
+        self.maxBufferedRows = maxBufferedRows
+        self.schemas = defaultSchemas() if schemas is None else dict(schemas)
+
+        #buffered rows and open writers by (dataset, partition)
+        self.buffers = {}
+        self.buffered = 0
+        self.writers = {}
+        self.lock = threading.Lock()
+
+        #converters of the schema columns by dataset
+        self.converters = {}
+
+        #files of one run get distinct names, so earlier runs are kept
+        self.run = "{}-{}".format(int(time.time() * 1000), os.getpid())
+        self.parts = 0
+
+        #makes sure the buffered rows are written and the files are complete at exit
+        atexit.register(self.close)
+
+    def open(self, name: str, mode: str = "a") -> None:
+        """
+        Prepares the dataset. With mode 'w' the files of an earlier crawl are deleted.
+
+        :param name: The name of the dataset.
+        :type name: str
+        :param mode: Optional. 'a' to append or 'w' to overwrite. Default is 'a'.
+        :type mode: str
+        """
+        if mode == "w":
+            with self.lock:
+                for key in [key for key in self.writers if key[0] == name]:
+                    self.writers.pop(key).close()
+                for key in [key for key in self.buffers if key[0] == name]:
+                    self.buffered -= len(self.buffers.pop(key))
+                shutil.rmtree(self.folderpath + name, ignore_errors=True)
+
+    def partition(self, name: str, document: Dict) -> str:
+        """
+        Returns the Hive-style partition folder of the document, an empty string without partitioning.
+        """
+        if not self.partitionBy or name not in PARTITION_COLUMNS:
+            return ""
+        value = document.get(PARTITION_COLUMNS[name][self.partitionBy])
+        if self.partitionBy == "month":
+            return "month={}/".format(value[:7] if value else "unknown")
+        if isinstance(value, dict):
+            value = value.get("_account_id")
+        if isinstance(value, int):
+            return "account={}/".format(value % ACCOUNT_BUCKETS)
+        return "account={}/".format(zlib.crc32(str(value).encode()) % ACCOUNT_BUCKETS)
+
+    def converter(self, name: str, documents: List[Dict]) -> List[Tuple[str, Callable, Optional[set]]]:
+        """
+        Returns the columns of the dataset with the conversions of their values and the fields of the struct columns,
+        the schema is inferred from the documents if the dataset has none.
+        """
+        if name not in self.converters:
+            schema = self.schemas.get(name)
+            if schema is None:
+                schema = self.pa.Table.from_pylist(documents).schema
+                self.schemas[name] = schema
+            self.converters[name] = [(field.name, parseTime if self.pa.types.is_timestamp(field.type) else None,
+                                      {field.type.field(index).name for index in range(field.type.num_fields)}
+                                      if self.pa.types.is_struct(field.type) else None)
+                                     for field in schema]
+        return self.converters[name]
+
+    def writeDocuments(self, name: str, documents: Iterable[Dict]) -> None:
+        """
+        Adds the documents to the buffers of their partitions and writes the full row groups. Fields that are not part
+        of the schema are stored as JSON in the extra column, those of struct columns nested under the column name.
+
+        :param name: The name of the dataset.
+        :type name: str
+        :param documents: The documents to be written.
+        :type documents: Iterable[Dict]
+        """
+        documents = list(documents)
+        if not documents:
+            return
+        with self.lock:
+            columns = self.converter(name, documents)
+            known = {column for column, _, _ in columns}
+            for document in documents:
+                row = {column: convert(document.get(column)) if convert else document.get(column)
+                       for column, convert, _ in columns}
+                extra = {key: value for key, value in document.items() if key not in known}
+                for column, _, fields in columns:
+                    value = document.get(column)
+                    if fields is not None and isinstance(value, dict):
+                        nested = {key: item for key, item in value.items() if key not in fields}
+                        if nested:
+                            extra[column] = nested
+                row[EXTRA_COLUMN] = json.dumps(extra) if extra else None
+                self.buffers.setdefault((name, self.partition(name, document)), []).append(row)
+            self.buffered += len(documents)
+
+            for key in [key for key, rows in self.buffers.items() if len(rows) >= self.rowGroupSize]:
+                self.writeRowGroup(key)
+            #writes the biggest buffers if there are too many rows in memory
+            while self.buffered > self.maxBufferedRows:
+                self.writeRowGroup(max(self.buffers, key=lambda key: len(self.buffers[key])))
+
+    def writeRowGroup(self, key: Tuple[str, str]) -> None:
+        """
+        Writes the buffered rows of a partition as row group(s) into its open file. Called with the lock held.
+        """
+        rows = self.buffers.pop(key)
+        self.buffered -= len(rows)
+        name, partition = key
+        schema = self.schemas[name].append(self.pa.field(EXTRA_COLUMN, self.pa.string()))
+        if key not in self.writers:
+            folder = self.folderpath + name + "/" + partition
+            os.makedirs(folder, exist_ok=True)
+            self.parts += 1
+            self.writers[key] = self.pq.ParquetWriter("{}part-{}-{}.parquet".format(folder, self.run, self.parts),
+                                                      schema, compression=self.compression)
+        self.writers[key].write_table(self.pa.Table.from_pylist(rows, schema=schema), row_group_size=self.rowGroupSize)
+
+    def flush(self) -> None:
+        """
+        Writes all buffered rows as row groups into the open files, which stay open.
+        """
+        with self.lock:
+            for key in list(self.buffers):
+                self.writeRowGroup(key)
+
+    def close(self) -> None:
+        """
+        Writes all buffered rows and closes the files, so everything written so far can be read. Later documents go
+        into new files.
+        """
+        with self.lock:
+            for key in list(self.buffers):
+                self.writeRowGroup(key)
+            for writer in self.writers.values():
+                writer.close()
+            self.writers = {}
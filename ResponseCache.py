@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+#headers that describe the body on the wire, the cache stores the decoded body
+TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+#only successful responses are stored, errors (e.g. 404 of a deleted bug or 429) may be different on the next try and
+#redirects are followed by the session
+CACHED_STATUS = range(200, 300)
+
+#size of the chunks streamed bodies are stored in
+CHUNK_SIZE = 1024 * 1024
+
+
+class CacheMiss(requests.RequestException):
+    """
+    Raised in offline mode for requests whose response isn't cached.
+    """
+
+
+class ResponseCache:
+    """
+    On-disk cache of the GET responses of an HttpClient, keyed by the url (e.g. of buildURL or comments_url). Fresh
+    responses (younger than the TTL) are served without request, older ones are revalidated with a conditional request
+    (If-None-Match, If-Modified-Since) if the server sent an ETag or Last-Modified, else they are downloaded again. The
+    bodies are files in the cache folder, the least recently used are deleted once their size exceeds the limit.
+    In offline mode every request is answered from the cache regardless of its age, so the parsing and the sinks of a
+    crawl can be re-run at local disk speed.
+    """
+
+    def __init__(self, folderpath: str, ttl: float = 0.0, maxBytes: int = 1024 ** 3, offline: bool = False) -> None:
+        """
+        Opens or creates the cache folder.
+
+        :param folderpath: The path of the cache folder, ending with '/'.
+        :type folderpath: str
+        :param ttl: Optional. The seconds a response is served without asking the server. Default is 0, every response
+        is revalidated.
+        :type ttl: float
+        :param maxBytes: Optional. The maximum size of the cached bodies, the least recently used are deleted beyond it.
+        Default is 1 GiB.
+        :type maxBytes: int
+        :param offline: Optional. If all requests are answered from the cache, missing responses raise CacheMiss.
+        Default is False.
+        :type offline: bool
+        """
+        self.folderpath = folderpath
+        self.ttl = ttl
+        self.maxBytes = maxBytes
+        self.offline = offline
+        os.makedirs(folderpath, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(folderpath + "index.db", check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY, status INTEGER, headers TEXT, size INTEGER, stored REAL, accessed REAL);
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+        """)
+        self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def path(self, url: str) -> str:
+        """
+        Returns the path of the file holding the body of the url.
+        """
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return self.folderpath + name[:2] + "/" + name
+
+    def get(self, url: str, send: Callable[[Dict[str, str]], requests.Response],
+            stream: bool = False) -> Tuple[requests.Response, str]:
+        """
+        Answers a GET request from the cache or through send and stores the response.
+
+        :param url: The url of the request.
+        :type url: str
+        :param send: Performs the request with the given additional headers (the validators of a revalidation).
+        :type send: Callable
+        :param stream: Optional. If the body of the returned response is read from a stream. Default is False.
+        :type stream: bool
+        :return: The response and how it was answered: 'hit', 'revalidated', 'miss' or 'uncached'
+        :rtype: Tuple[requests.Response, str]
+        """
+        entry = self.lookup(url)
+        if entry is not None and (self.offline or time.time() - entry[3] < self.ttl):
+            response = self.serve(url, entry, stream)
+            if response is not None:
+                return response, "hit"
+            entry = None
+        if self.offline:
+            raise CacheMiss("No cached response for " + url)
+
+        validators = {}
+        if entry is not None:
+            headers = entry[1]
+            if "ETag" in headers:
+                validators["If-None-Match"] = headers["ETag"]
+            if "Last-Modified" in headers:
+                validators["If-Modified-Since"] = headers["Last-Modified"]
+
+        response = send(validators)
+        if response.status_code == 304 and entry is not None:
+            self.refresh(url, response)
+            response.close()
+            cached = self.serve(url, self.lookup(url), stream)
+            if cached is not None:
+                return cached, "revalidated"
+            response = send({})
+        if response.status_code not in CACHED_STATUS:
+            return response, "uncached"
+        return self.store(url, response, stream), "miss"
+
+    def lookup(self, url: str) -> Optional[Tuple[int, CaseInsensitiveDict, int, float]]:
+        """
+        Returns the status, headers, size and storage time of the cached response of the url or None.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT status, headers, size, stored FROM responses WHERE url = ?",
+                                          (url,)).fetchone()
+        if row is None:
+            return None
+        return row[0], CaseInsensitiveDict(json.loads(row[1])), row[2], row[3]
+
+    def serve(self, url: str, entry: Tuple[int, CaseInsensitiveDict, int, float],
+              stream: bool) -> Optional[requests.Response]:
+        """
+        Builds the response from the cache entry, None if its body was deleted meanwhile.
+        """
+        try:
+            body = open(self.path(url), "rb")
+        except OSError:
+            self.delete([url])
+            return None
+        with self.lock:
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE url = ?", (time.time(), url))
+
+        response = requests.Response()
+        response.status_code = entry[0]
+        response.headers = entry[1]
+        response.headers["Content-Length"] = str(entry[2])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = url
+        response.raw = body
+        if not stream:
+            with body:
+                response._content = body.read()
+            response._content_consumed = True
+        return response
+
+    def store(self, url: str, response: requests.Response, stream: bool) -> requests.Response:
+        """
+        Writes the response into the cache and returns it, streamed bodies are written first and then read from the
+        cache file.
+        """
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + "." + uuid.uuid4().hex
+        size = 0
+        with open(temporary, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+        response.close()
+
+        headers = {key: value for key, value in response.headers.items() if key.lower() not in TRANSFER_HEADERS}
+        now = time.time()
+        with self.lock:
+            os.replace(temporary, path)
+            old = self.connection.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                                    (url, response.status_code, json.dumps(headers), size, now, now))
+            self.size += size - (old[0] if old else 0)
+        self.evict(keep=url)
+
+        if not stream:
+            response.headers = CaseInsensitiveDict(headers)
+            response.headers["Content-Length"] = str(size)
+            return response
+        return self.serve(url, (response.status_code, CaseInsensitiveDict(headers), size, now), stream)
+
+    def refresh(self, url: str, response: requests.Response) -> None:
+        """
+        Renews the storage time of an entry the server confirmed with 304 and takes over its new validators.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT headers FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            headers = json.loads(row[0])
+            for key in ("ETag", "Last-Modified", "Cache-Control", "Expires"):
+                if key in response.headers:
+                    headers = {name: value for name, value in headers.items() if name.lower() != key.lower()}
+                    headers[key] = response.headers[key]
+            self.connection.execute("UPDATE responses SET headers = ?, stored = ? WHERE url = ?",
+                                    (json.dumps(headers), time.time(), url))
+
+    def evict(self, keep: str = None) -> None:
+        """
+        Deletes the least recently used responses until the cached bodies fit into maxBytes.
+
+        :param keep: Optional. The url of a response that is kept, e.g. the one just stored. Default is none.
+        :type keep: str
+        """
+        while self.size > self.maxBytes:
+            with self.lock:
+                rows = self.connection.execute("SELECT url, size FROM responses WHERE url != ? ORDER BY accessed "
+                                               "LIMIT 100", (keep or "",)).fetchall()
+            if not rows:
+                return
+            urls = []
+            excess = self.size - self.maxBytes
+            for url, size in rows:
+                if excess <= 0:
+                    break
+                urls.append(url)
+                excess -= size
+            self.delete(urls)
+
+    def delete(self, urls: List[str]) -> None:
+        """
+        Deletes the cached responses of the urls.
+        """
+        with self.lock:
+            for url in urls:
+                row = self.connection.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+                if row is None:
+                    continue
+                self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.size -= row[0]
+                try:
+                    os.remove(self.path(url))
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """
+        Closes the index of the cache.
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,235 @@
+import codecs
+import importlib
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+#prefix Gerrit puts in front of every JSON response to prevent XSSI
+XSSI_PREFIX = b")]}'"
+
+#backends in the order they are preferred if installed
+BACKENDS = ("orjson", "ujson", "json")
+
+
+class ResponseDecoder:
+    """
+    Decodes the JSON responses of Gerrit and Bugzilla into Python objects.
+    Uses the fastest installed JSON backend (orjson, ujson) with the standard library as fallback and can decode
+    very large responses incrementally from the response stream.
+    """
+
+    def __init__(self, backend: str = None, streamThreshold: int = 8 * 1024 * 1024) -> None:
+        """
+        Initializes the Decoder with the given or the fastest available backend.
+
+        :param backend: Optional. The name of the JSON backend ('orjson', 'ujson' or 'json'). If not given the fastest
+        installed one is used.
+        :type backend: str
+        :param streamThreshold: Optional. Responses bigger than this amount of bytes (or of unknown size) are decoded
+        incrementally from the stream in decodeStream. Default is 8 MiB.
+        :type streamThreshold: int
+        """
+        self.backend = backend if backend else self.findBackend()
+        self.streamThreshold = streamThreshold
+
+        #loads the backend module, only its name is kept as attribute so the decoder stays picklable
+        module = importlib.import_module(self.backend)
+        self._loads = module.loads
+        self._dumps = module.dumps
+
+    def __getstate__(self) -> Dict:
+        return {"backend": self.backend, "streamThreshold": self.streamThreshold}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(**state)
+
+    @staticmethod
+    def findBackend() -> str:
+        """
+        Finds the fastest installed JSON backend.
+
+        :return: The module name of the backend
+        :rtype: str
+        """
+        for backend in BACKENDS:
+            try:
+                importlib.import_module(backend)
+                return backend
+            except ImportError:
+                continue
+        return "json"
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """
+        Decodes a complete JSON document, a possible Gerrit XSSI prefix is stripped beforehand.
+
+        :param data: The JSON document as text or bytes.
+        :type data: str or bytes
+        :return: The decoded document
+        :rtype: Any
+        """
+        data = self.stripPrefix(data)
+
+        #ujson only accepts text
+        if self.backend == "ujson" and isinstance(data, bytes):
+            data = data.decode("utf-8")
+
+        return self._loads(data)
+
+    def dumps(self, document: Any) -> bytes:
+        """
+        Encodes a document as compact UTF-8 JSON, the counterpart of loads used for writing JSON Lines.
+
+        :param document: The document to be encoded.
+        :type document: Any
+        :return: The encoded document
+        :rtype: bytes
+        """
+        if self.backend == "orjson":
+            return self._dumps(document, default=str)
+        if self.backend == "ujson":
+            return self._dumps(document, ensure_ascii=False, default=str).encode("utf-8")
+        return self._dumps(document, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    @staticmethod
+    def stripPrefix(data: Union[str, bytes]) -> Union[str, bytes]:
+        """
+        Removes the XSSI prefix ")]}'" of Gerrit responses if there is one.
+
+        :param data: The JSON document as text or bytes.
+        :type data: str or bytes
+        :return: The document without the prefix
+        :rtype: str or bytes
+        """
+        prefix = XSSI_PREFIX if isinstance(data, bytes) else XSSI_PREFIX.decode()
+        if data.startswith(prefix):
+            return data[len(prefix):]
+        return data
+
+    def decodeGerrit(self, data: Union[str, bytes]) -> Tuple[List[Dict], bool]:
+        """
+        Decodes a Gerrit change query response.
+
+        :param data: The body of the response.
+        :type data: str or bytes
+        :return: Returns the list of changes and if there are more changes to be requested
+        :rtype: Tuple[List[Dict], bool]
+        """
+        data = self.stripPrefix(data)
+
+        #empty responses contain no changes
+        if not data.strip():
+            return [], False
+
+        commitsList = self.loads(data)
+
+        #_more_changes is only ever set on the last element
+        notDone = False
+        if commitsList:
+            notDone = bool(commitsList[-1].pop("_more_changes", False))
+
+        return commitsList, notDone
+
+    def decodeStream(self, response: Any, key: str, chunkSize: int = 64 * 1024) -> Iterator[Dict]:
+        """
+        Yields the elements of the list under key of a (requests) response object. Small responses are decoded at
+        once with the fast backend, big ones or ones of unknown size incrementally from the stream.
+
+        :param response: A response of a request that was made with stream=True.
+        :type response: requests.Response
+        :param key: The key of the top level object under which the list is found, e.g. 'bugs'.
+        :type key: str
+        :param chunkSize: Optional. The size of the chunks read from the stream.
+        :type chunkSize: int
+        :return: An iterator over the elements of the list
+        :rtype: Iterator[Dict]
+        :raises ValueError: If the response is an error (e.g. Bugzilla's {"error": true, ...}) or has no list under key
+        """
+        length = response.headers.get("Content-Length")
+        if length is not None and int(length) <= self.streamThreshold:
+            document = self.loads(response.content)
+            #error responses mustn't be mistaken for an empty list, e.g. the end of the pages
+            if not isinstance(document, dict) or document.get("error") or key not in document:
+                raise ValueError("No list '{}' in the response: {}".format(key, str(document)[:200]))
+            yield from document[key] or []
+        else:
+            yield from self.iterItems(response.iter_content(chunkSize), key)
+
+    @staticmethod
+    def iterItems(chunks: Iterable[Union[str, bytes]], key: str) -> Iterator[Any]:
+        """
+        Incrementally decodes the elements of the list under key of the top level object from chunks of a JSON
+        document, so that only one element at a time needs to be kept in memory.
+
+        :param chunks: The document in chunks of text or bytes.
+        :type chunks: Iterable[str or bytes]
+        :param key: The key of the top level object under which the list is found.
+        :type key: str
+        :return: An iterator over the elements of the list
+        :rtype: Iterator[Any]
+        :raises ValueError: If the document has no list under key, e.g. because it is an error response
+        """
+        decoder = json.JSONDecoder()
+        textDecoder = codecs.getincrementaldecoder("utf-8")()
+        listStart = re.compile(r'"' + re.escape(key) + r'"\s*:\s*(\[|null)')
+        chunks = iter(chunks)
+
+        buffer = ""
+        exhausted = False
+
+        def readMore() -> bool:
+            nonlocal buffer, exhausted
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+                buffer += textDecoder.decode(b"", final=True)
+                return False
+            buffer += textDecoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            return True
+
+        #searches for the start of the list
+        while True:
+            match = listStart.search(buffer)
+            if match:
+                break
+            if not readMore():
+                raise ValueError("No list '{}' in the response: {}".format(key, buffer[:200]))
+        if match.group(1) == "null":
+            return
+        pos = match.end()
+
+        #decodes one element after the other
+        while True:
+            #skips whitespace and separators
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer) or not readMore():
+                    break
+            if pos >= len(buffer):
+                raise ValueError("Unexpected end of document in list '{}'".format(key))
+            if buffer[pos] == "]":
+                return
+
+            #tries to decode the next element, reads further chunks if it is incomplete
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted or not readMore():
+                        raise
+                    continue
+                #a number at the end of the buffer might still continue in the next chunk
+                if end == len(buffer) and not exhausted and readMore():
+                    continue
+                break
+
+            yield item
+
+            #drops the already decoded part of the buffer
+            buffer = buffer[end:]
+            pos = 0
+
+
+#shared decoder used by the crawlers
+defaultDecoder = ResponseDecoder()
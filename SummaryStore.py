@@ -0,0 +1,272 @@
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+#amount of keys looked up with one query
+CHUNK_SIZE = 500
+
+
+class SummaryStore:
+    """
+    Maintains aggregates of a crawl in a SQLite file while the pages stream through, so common reports don't need a
+    scan over the raw outputs: the changes per Gerrit owner by status and month, the comments per bug and per author
+    and the first and last activity of owners, bugs and authors. The aggregates of the pages are staged in memory once
+    the pages are handed to the sinks and stored with commit, which the crawlers call whenever their sinks are flushed
+    with the aggregates staged before the flush. Re-crawled data is counted once: the
+    status and month of every change are kept, so a change whose status changed moves to the new status, and comments
+    are only counted if their id is above the highest counted comment of their bug.
+    """
+
+    def __init__(self, path: str, instance: str) -> None:
+        """
+        Opens or creates the summary file.
+
+        :param path: The path of the SQLite file.
+        :type path: str
+        :param instance: Identifies the crawled instance and query, so one file can hold the summaries of several.
+        :type instance: str
+        """
+        self.path = path
+        self.instance = instance
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS gerrit_changes (
+                instance TEXT, id TEXT, owner INTEGER, status TEXT, month TEXT,
+                PRIMARY KEY (instance, id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS gerrit_owners (
+                instance TEXT, owner INTEGER, status TEXT, month TEXT, changes INTEGER,
+                PRIMARY KEY (instance, owner, status, month)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS bugzilla_bugs (
+                instance TEXT, bug_id INTEGER, comments INTEGER, last_comment INTEGER,
+                PRIMARY KEY (instance, bug_id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS bugzilla_authors (
+                instance TEXT, author TEXT, comments INTEGER, PRIMARY KEY (instance, author)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS activity (
+                instance TEXT, kind TEXT, key TEXT, first TEXT, last TEXT,
+                PRIMARY KEY (instance, kind, key)) WITHOUT ROWID;
+        """)
+
+        #aggregates of the pages that are not committed yet
+        self.changes = {}
+        self.comments = {}
+        self.bugs = {}
+
+    def addChanges(self, changes: Iterable[Dict]) -> None:
+        """
+        Stages a page of Gerrit changes (ChangeInfo).
+
+        :param changes: The changes.
+        :type changes: Iterable[Dict]
+        """
+        with self.lock:
+            for change in changes:
+                created = change.get("created") or ""
+                self.changes[change["id"]] = (change["owner"]["_account_id"], change.get("status") or "",
+                                              created[:7], created, change.get("updated") or created)
+
+    def addBugs(self, bugs: Iterable[Dict]) -> None:
+        """
+        Stages a page of Bugzilla bugs.
+
+        :param bugs: The bugs.
+        :type bugs: Iterable[Dict]
+        """
+        with self.lock:
+            for bug in bugs:
+                created = bug.get("creation_time") or ""
+                self.bugs[bug["id"]] = (created, bug.get("last_change_time") or created)
+
+    def addComments(self, comments: Iterable[Dict]) -> None:
+        """
+        Stages Bugzilla comments.
+
+        :param comments: The comments.
+        :type comments: Iterable[Dict]
+        """
+        with self.lock:
+            for comment in comments:
+                self.comments.setdefault(comment["bug_id"], {})[comment["id"]] = (comment.get("creator") or "",
+                                                                                  comment.get("creation_time") or "")
+
+    def takeStaged(self) -> Tuple[Dict, Dict, Dict]:
+        """
+        Returns the staged aggregates and starts staging anew, e.g. before the sinks are flushed, so pages that are
+        staged while flushing aren't committed with them.
+
+        :return: The staged changes, comments and bugs for commit
+        :rtype: Tuple[Dict, Dict, Dict]
+        """
+        with self.lock:
+            staged = self.changes, self.comments, self.bugs
+            self.changes, self.comments, self.bugs = {}, {}, {}
+        return staged
+
+    def commit(self, staged: Tuple[Dict, Dict, Dict] = None) -> None:
+        """
+        Adds the staged aggregates to the stored ones in one transaction. Must only be called once the staged data has
+        been written, like the commits of the checkpoint and watermark files.
+
+        :param staged: Optional. The aggregates returned by takeStaged before the data was written. Default are all
+        staged aggregates.
+        :type staged: Tuple[Dict, Dict, Dict]
+        """
+        changes, comments, bugs = self.takeStaged() if staged is None else staged
+        if not changes and not comments and not bugs:
+            return
+        with self.lock:
+            with self.connection:
+                activity = {}
+                if changes:
+                    self.commitChanges(changes, activity)
+                if comments:
+                    self.commitComments(comments, activity)
+                for id, (first, last) in bugs.items():
+                    self.mergeActivity(activity, "bug", str(id), first, last)
+                self.connection.executemany(
+                    "INSERT INTO activity VALUES (?, ?, ?, ?, ?) ON CONFLICT (instance, kind, key) DO UPDATE SET "
+                    "first = min(first, excluded.first), last = max(last, excluded.last)",
+                    [(self.instance, kind, key, first, last) for (kind, key), (first, last) in activity.items()])
+
+    @staticmethod
+    def mergeActivity(activity: Dict[Tuple[str, str], Tuple[str, str]], kind: str, key: str, first: str,
+                      last: str) -> None:
+        """
+        Widens the staged activity of the key to the first and last time, empty times are ignored.
+        """
+        if not first:
+            return
+        if (kind, key) in activity:
+            oldFirst, oldLast = activity[(kind, key)]
+            first, last = min(first, oldFirst), max(last, oldLast)
+        activity[(kind, key)] = (first, last)
+
+    def known(self, statement: str, keys: List) -> Dict:
+        """
+        Returns the stored rows of the keys by key, the statement selects the key first and has a placeholder for the
+        list of keys.
+        """
+        rows = {}
+        for start in range(0, len(keys), CHUNK_SIZE):
+            chunk = keys[start:start + CHUNK_SIZE]
+            for row in self.connection.execute(statement.format(",".join("?" * len(chunk))),
+                                               [self.instance] + chunk):
+                rows[row[0]] = row[1:]
+        return rows
+
+    def commitChanges(self, changes: Dict[str, Tuple], activity: Dict) -> None:
+        """
+        Stores the staged changes and moves the counts of the changes whose owner, status or month changed.
+        """
+        known = self.known("SELECT id, owner, status, month FROM gerrit_changes WHERE instance = ? AND id IN ({})",
+                           list(changes))
+        counts = Counter()
+        for id, (owner, status, month, created, updated) in changes.items():
+            old = known.get(id)
+            if old != (owner, status, month):
+                if old is not None:
+                    counts[old] -= 1
+                counts[(owner, status, month)] += 1
+            self.mergeActivity(activity, "owner", str(owner), created, updated)
+
+        self.connection.executemany("INSERT OR REPLACE INTO gerrit_changes VALUES (?, ?, ?, ?, ?)",
+                                    [(self.instance, id, owner, status, month)
+                                     for id, (owner, status, month, _, _) in changes.items()])
+        self.connection.executemany(
+            "INSERT INTO gerrit_owners VALUES (?, ?, ?, ?, ?) ON CONFLICT (instance, owner, status, month) DO UPDATE "
+            "SET changes = changes + excluded.changes",
+            [(self.instance, owner, status, month, count) for (owner, status, month), count in counts.items()
+             if count])
+
+    def commitComments(self, comments: Dict[int, Dict[int, Tuple[str, str]]], activity: Dict) -> None:
+        """
+        Counts the staged comments that are newer than the highest counted comment of their bug.
+        """
+        known = self.known("SELECT bug_id, last_comment FROM bugzilla_bugs WHERE instance = ? AND bug_id IN ({})",
+                           list(comments))
+        bugs = []
+        authors = Counter()
+        for bugID, byID in comments.items():
+            last = known[bugID][0] if bugID in known else -1
+            new = [id for id in byID if id > last]
+            if not new:
+                continue
+            bugs.append((self.instance, bugID, len(new), max(new)))
+            for id in new:
+                author, created = byID[id]
+                authors[author] += 1
+                self.mergeActivity(activity, "author", author, created, created)
+                self.mergeActivity(activity, "bug", str(bugID), created, created)
+
+        self.connection.executemany(
+            "INSERT INTO bugzilla_bugs VALUES (?, ?, ?, ?) ON CONFLICT (instance, bug_id) DO UPDATE SET "
+            "comments = comments + excluded.comments, last_comment = max(last_comment, excluded.last_comment)", bugs)
+        self.connection.executemany(
+            "INSERT INTO bugzilla_authors VALUES (?, ?, ?) ON CONFLICT (instance, author) DO UPDATE SET "
+            "comments = comments + excluded.comments",
+            [(self.instance, author, count) for author, count in authors.items()])
+
+    def changesByOwner(self, owner: int = None) -> List[Tuple[int, str, str, int]]:
+        """
+        Returns the committed amounts of changes per owner, status and month (yyyy-mm).
+
+        :param owner: Optional. Only the changes of this account id. Default are all owners.
+        :type owner: int
+        :return: The owner, status, month and amount of changes
+        :rtype: List[Tuple[int, str, str, int]]
+        """
+        with self.lock:
+            if owner is None:
+                return self.connection.execute("SELECT owner, status, month, changes FROM gerrit_owners WHERE "
+                                               "instance = ? AND changes != 0", (self.instance,)).fetchall()
+            return self.connection.execute("SELECT owner, status, month, changes FROM gerrit_owners WHERE "
+                                           "instance = ? AND owner = ? AND changes != 0",
+                                           (self.instance, owner)).fetchall()
+
+    def commentsByBug(self) -> Dict[int, int]:
+        """
+        Returns the committed amounts of comments per bug id.
+        """
+        with self.lock:
+            return dict(self.connection.execute("SELECT bug_id, comments FROM bugzilla_bugs WHERE instance = ?",
+                                                (self.instance,)))
+
+    def commentsByAuthor(self) -> Dict[str, int]:
+        """
+        Returns the committed amounts of comments per author.
+        """
+        with self.lock:
+            return dict(self.connection.execute("SELECT author, comments FROM bugzilla_authors WHERE instance = ?",
+                                                (self.instance,)))
+
+    def activity(self, kind: str, key: str = None) -> Dict[str, Tuple[str, str]]:
+        """
+        Returns the committed first and last activity times.
+
+        :param kind: 'owner' (Gerrit account ids: first creation, last update of their changes), 'bug' (creation and
+        last change of the bugs and their comments) or 'author' (first and last comment).
+        :type kind: str
+        :param key: Optional. Only the activity of this owner, bug or author. Default are all.
+        :type key: str
+        :return: The first and last time by key
+        :rtype: Dict[str, Tuple[str, str]]
+        """
+        with self.lock:
+            if key is None:
+                rows = self.connection.execute("SELECT key, first, last FROM activity WHERE instance = ? AND "
+                                               "kind = ?", (self.instance, kind))
+            else:
+                rows = self.connection.execute("SELECT key, first, last FROM activity WHERE instance = ? AND "
+                                               "kind = ? AND key = ?", (self.instance, kind, str(key)))
+            return {row[0]: (row[1], row[2]) for row in rows}
+
+    def close(self) -> None:
+        """
+        Closes the file, staged aggregates are discarded.
+        """
+        with self.lock:
+            self.connection.close()
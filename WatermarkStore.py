@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+#amount of items looked up with one query
+CHUNK_SIZE = 500
+
+
+class WatermarkStore:
+    """
+    Stores the high-water marks of earlier crawls in a SQLite file, e.g. the latest update time per Gerrit user or the
+    latest change time of the bugs of a Bugzilla. Incremental crawls only request what changed after them.
+    Watermarks of many items, e.g. of every bug whose comments were crawled, are kept in a separate table that isn't
+    mirrored in memory.
+    """
+
+    def __init__(self, path: str, instance: str) -> None:
+        """
+        Opens or creates the watermark file.
+
+        :param path: The path of the SQLite file.
+        :type path: str
+        :param instance: Identifies the crawled instance and query, so one file can hold the watermarks of several.
+        :type instance: str
+        """
+        self.path = path
+        self.instance = instance
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS watermarks ("
+                                "instance TEXT, key TEXT, value TEXT, PRIMARY KEY (instance, key))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS item_watermarks (instance TEXT, kind TEXT, id INTEGER, "
+                                "value TEXT, PRIMARY KEY (instance, kind, id)) WITHOUT ROWID")
+
+        #watermarks that are set but not committed yet
+        self.staged = {}
+        self.stagedItems = []
+
+        #the watermarks are mirrored in memory
+        self.watermarks = {key: json.loads(value) for key, value in self.connection.execute(
+            "SELECT key, value FROM watermarks WHERE instance = ?", (instance,))}
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns the committed watermark stored under the key or None if there is none yet.
+
+        :param key: E.g. the name of a Gerrit user or 'bugs'.
+        :type key: str
+        :return: The watermark
+        :rtype: Dict
+        """
+        return self.watermarks.get(key)
+
+    def set(self, key: str, value: Dict) -> None:
+        """
+        Stages the watermark under the key. It is stored with the next commit, which must only be called once
+        everything up to it has been written.
+
+        :param key: E.g. the name of a Gerrit user or 'bugs'.
+        :type key: str
+        :param value: The watermark, e.g. {'updated': '2020-01-01 10:00:00.000000000'}.
+        :type value: Dict
+        """
+        with self.lock:
+            self.staged[key] = value
+
+    def getItems(self, kind: str, ids: List[int]) -> Dict[int, str]:
+        """
+        Returns the committed watermarks of the items by id, items without one are left out.
+
+        :param kind: The kind of the items, e.g. 'comments' for the comments of bugs.
+        :type kind: str
+        :param ids: The ids of the items.
+        :type ids: List[int]
+        :return: The watermarks by id
+        :rtype: Dict[int, str]
+        """
+        ids = [int(id) for id in ids]
+        watermarks = {}
+        with self.lock:
+            for start in range(0, len(ids), CHUNK_SIZE):
+                chunk = ids[start:start + CHUNK_SIZE]
+                watermarks.update(self.connection.execute(
+                    "SELECT id, value FROM item_watermarks WHERE instance = ? AND kind = ? AND id IN ({})".format(
+                        ",".join("?" * len(chunk))), [self.instance, kind] + chunk))
+        return watermarks
+
+    def setItems(self, kind: str, ids: Iterable[int], value: str) -> None:
+        """
+        Stages the watermark for the items, items whose committed watermark is later keep it. It is stored with the
+        next commit like the other watermarks.
+
+        :param kind: The kind of the items, e.g. 'comments' for the comments of bugs.
+        :type kind: str
+        :param ids: The ids of the items.
+        :type ids: Iterable[int]
+        :param value: The watermark, e.g. the creation time of the latest comment '2020-01-01T10:00:00Z'.
+        :type value: str
+        """
+        with self.lock:
+            self.stagedItems.append((kind, ids, value))
+
+    def commit(self) -> None:
+        """
+        Stores all staged watermarks in one transaction.
+        """
+        with self.lock:
+            if not self.staged and not self.stagedItems:
+                return
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                                            [(self.instance, key, json.dumps(value))
+                                             for key, value in self.staged.items()])
+                for kind, ids, value in self.stagedItems:
+                    self.connection.executemany(
+                        "INSERT INTO item_watermarks VALUES (?, ?, ?, ?) ON CONFLICT (instance, kind, id) DO UPDATE "
+                        "SET value = max(value, excluded.value)", ((self.instance, kind, int(id), value) for id in ids))
+            self.watermarks.update(self.staged)
+            self.staged = {}
+            self.stagedItems = []
+
+    def close(self) -> None:
+        """
+        Closes the file, staged watermarks are discarded.
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,365 @@
+import abc
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pymongo.database import Database
+
+
+class WorkQueue(abc.ABC):
+    """
+    Shared queue of work units (e.g. Gerrit users or batches of bug IDs) for crawling with several processes or
+    machines. A worker claims units with a lease, keeps the lease alive with heartbeats while it crawls them and marks
+    them done once their outputs are written. Units whose lease expired (because the worker died or hung) are handed
+    out again, units that expired maxAttempts times are marked as failed.
+    The leases use the wall clock, so the clocks of the machines need to be roughly in sync compared to the lease time.
+    """
+
+    def __init__(self, leaseSeconds: float = 60.0, maxAttempts: int = 5) -> None:
+        """
+        :param leaseSeconds: Optional. The seconds a claim is valid without heartbeat. Default is 60.
+        :type leaseSeconds: float
+        :param maxAttempts: Optional. How often a unit is claimed before it is marked as failed. Default is 5.
+        :type maxAttempts: int
+        """
+        self.leaseSeconds = leaseSeconds
+        self.maxAttempts = maxAttempts
+
+        #keys of the units this process holds by worker, renewed by the heartbeat
+        self.held = {}
+        self.heldLock = threading.Lock()
+
+    @staticmethod
+    def workerName() -> str:
+        """
+        Returns a name identifying this process across the machines.
+        """
+        return "{}-{}".format(socket.gethostname(), os.getpid())
+
+    def putUsers(self, users: Iterable[str], unitSize: int = 1) -> None:
+        """
+        Adds Gerrit users in units of unitSize users. Users that are already queued are skipped.
+
+        :param users: The names of the users.
+        :type users: Iterable[str]
+        :param unitSize: Optional. The amount of users per unit. Default is 1.
+        :type unitSize: int
+        """
+        users = list(users)
+        self.put({"users:" + ",".join(users[start:start + unitSize]): users[start:start + unitSize]
+                  for start in range(0, len(users), unitSize)})
+
+    def putBugIDs(self, ids: Iterable[int], unitSize: int = 1000) -> None:
+        """
+        Adds bug IDs (e.g. a BugIDStore) in ranges of unitSize IDs. Ranges that are already queued are skipped.
+
+        :param ids: The bug IDs.
+        :type ids: Iterable[int]
+        :param unitSize: Optional. The amount of bug IDs per unit. Default is 1000.
+        :type unitSize: int
+        """
+        ids = [int(id) for id in ids]
+        self.put({"bugs:{}-{}".format(ids[start], ids[min(len(ids), start + unitSize) - 1]): ids[start:start + unitSize]
+                  for start in range(0, len(ids), unitSize)})
+
+    def claimUnits(self, worker: str, amount: int = 1) -> List[Tuple[str, Any]]:
+        """
+        Claims up to amount pending or expired units for the worker.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        :param amount: Optional. The maximum amount of units. Default is 1.
+        :type amount: int
+        :return: The keys and payloads of the claimed units
+        :rtype: List[Tuple[str, Any]]
+        """
+        units = self.claim(worker, amount, time.time())
+        with self.heldLock:
+            self.held.setdefault(worker, set()).update(key for key, _ in units)
+        return units
+
+    def doneUnits(self, worker: str, keys: Iterable[str]) -> int:
+        """
+        Marks the units as done if the worker still holds their lease.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        :param keys: The keys of the units.
+        :type keys: Iterable[str]
+        :return: The amount of units that were marked, units whose lease was lost meanwhile aren't
+        :rtype: int
+        """
+        keys = list(keys)
+        with self.heldLock:
+            self.held.get(worker, set()).difference_update(keys)
+        return self.finish(worker, keys, "done")
+
+    def releaseUnits(self, worker: str, keys: Iterable[str]) -> int:
+        """
+        Gives the units back to the queue, e.g. if the worker stops before crawling them.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        :param keys: The keys of the units.
+        :type keys: Iterable[str]
+        :return: The amount of units that were released
+        :rtype: int
+        """
+        keys = list(keys)
+        with self.heldLock:
+            self.held.get(worker, set()).difference_update(keys)
+        return self.finish(worker, keys, "pending")
+
+    def failUnits(self, worker: str, keys: Iterable[str]) -> int:
+        """
+        Gives back units whose crawl failed. They are handed out again until they were claimed maxAttempts times, then
+        they are marked as failed.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        :param keys: The keys of the units.
+        :type keys: Iterable[str]
+        :return: The amount of units that were marked as failed
+        :rtype: int
+        """
+        keys = list(keys)
+        with self.heldLock:
+            self.held.get(worker, set()).difference_update(keys)
+        return self.fail(worker, keys)
+
+    @contextlib.contextmanager
+    def heartbeat(self, worker: str) -> Iterator[None]:
+        """
+        Renews the leases of the units the worker holds every third of the lease time while the block runs.
+
+        :param worker: The name of the worker.
+        :type worker: str
+        """
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(self.leaseSeconds / 3):
+                with self.heldLock:
+                    keys = list(self.held.get(worker, ()))
+                if keys:
+                    self.extend(worker, keys, time.time())
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def wait(self) -> bool:
+        """
+        Waits a little if all remaining units are leased by other workers.
+
+        :return: If there are units left that aren't done or failed
+        :rtype: bool
+        """
+        counts = self.counts()
+        if not counts.get("pending", 0) and not counts.get("leased", 0):
+            return False
+        time.sleep(min(1.0, self.leaseSeconds / 10))
+        return True
+
+    #backend
+
+    @abc.abstractmethod
+    def put(self, units: Dict[str, Any]) -> None:
+        """
+        Adds the units (key -> JSON compatible payload) that aren't queued yet.
+        """
+
+    @abc.abstractmethod
+    def claim(self, worker: str, amount: int, now: float) -> List[Tuple[str, Any]]:
+        """
+        Leases up to amount pending or expired units to the worker.
+        """
+
+    @abc.abstractmethod
+    def extend(self, worker: str, keys: List[str], now: float) -> None:
+        """
+        Renews the leases the worker holds on the units.
+        """
+
+    @abc.abstractmethod
+    def finish(self, worker: str, keys: List[str], state: str) -> int:
+        """
+        Sets the state of the units the worker holds and returns their amount.
+        """
+
+    @abc.abstractmethod
+    def fail(self, worker: str, keys: List[str]) -> int:
+        """
+        Marks the units the worker holds as failed if they reached maxAttempts, else as pending, and returns the
+        amount of failed units.
+        """
+
+    @abc.abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the amount of units per state (pending, leased, done, failed).
+        """
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    WorkQueue in a SQLite file, for several processes on one host.
+    """
+
+    def __init__(self, path: str, name: str = "workQueue", leaseSeconds: float = 60.0, maxAttempts: int = 5) -> None:
+        """
+        Opens or creates the queue file.
+
+        :param path: The path of the SQLite file.
+        :type path: str
+        :param name: Optional. Identifies the queue, so one file can hold several. Default is 'workQueue'.
+        :type name: str
+        """
+        super().__init__(leaseSeconds, maxAttempts)
+        self.path = path
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS work_queue (
+                queue TEXT, key TEXT, payload TEXT, state TEXT, worker TEXT, expires REAL, attempts INTEGER,
+                PRIMARY KEY (queue, key));
+            CREATE INDEX IF NOT EXISTS work_queue_state ON work_queue (queue, state, expires);
+        """)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Runs the block in a transaction that holds the write lock of the file from the start.
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def put(self, units: Dict[str, Any]) -> None:
+        with self.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO work_queue VALUES (?, ?, ?, 'pending', NULL, 0, 0)",
+                                   [(self.name, key, json.dumps(payload)) for key, payload in units.items()])
+
+    def claim(self, worker: str, amount: int, now: float) -> List[Tuple[str, Any]]:
+        with self.transaction() as connection:
+            connection.execute("UPDATE work_queue SET state = 'failed' WHERE queue = ? AND state = 'leased' "
+                               "AND expires < ? AND attempts >= ?", (self.name, now, self.maxAttempts))
+            units = connection.execute("SELECT key, payload FROM work_queue WHERE queue = ? AND (state = 'pending' "
+                                       "OR (state = 'leased' AND expires < ?)) ORDER BY rowid LIMIT ?",
+                                       (self.name, now, amount)).fetchall()
+            connection.executemany("UPDATE work_queue SET state = 'leased', worker = ?, expires = ?, "
+                                   "attempts = attempts + 1 WHERE queue = ? AND key = ?",
+                                   [(worker, now + self.leaseSeconds, self.name, key) for key, _ in units])
+        return [(key, json.loads(payload)) for key, payload in units]
+
+    def extend(self, worker: str, keys: List[str], now: float) -> None:
+        with self.transaction() as connection:
+            connection.executemany("UPDATE work_queue SET expires = ? WHERE queue = ? AND key = ? AND worker = ? "
+                                   "AND state = 'leased'",
+                                   [(now + self.leaseSeconds, self.name, key, worker) for key in keys])
+
+    def finish(self, worker: str, keys: List[str], state: str) -> int:
+        with self.transaction() as connection:
+            return sum(connection.execute("UPDATE work_queue SET state = ?, expires = 0 WHERE queue = ? AND key = ? "
+                                          "AND worker = ? AND state = 'leased'",
+                                          (state, self.name, key, worker)).rowcount for key in keys)
+
+    def fail(self, worker: str, keys: List[str]) -> int:
+        with self.transaction() as connection:
+            failed = sum(connection.execute("UPDATE work_queue SET state = 'failed', expires = 0 WHERE queue = ? AND "
+                                            "key = ? AND worker = ? AND state = 'leased' AND attempts >= ?",
+                                            (self.name, key, worker, self.maxAttempts)).rowcount for key in keys)
+            connection.executemany("UPDATE work_queue SET state = 'pending', expires = 0 WHERE queue = ? AND key = ? "
+                                   "AND worker = ? AND state = 'leased'", [(self.name, key, worker) for key in keys])
+        return failed
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.connection.execute("SELECT state, COUNT(*) FROM work_queue WHERE queue = ? "
+                                                "GROUP BY state", (self.name,)).fetchall())
+
+
+class MongoWorkQueue(WorkQueue):
+    """
+    WorkQueue in a MongoDB collection, for workers on several machines. Units are claimed one by one with atomic
+    find-and-modify operations.
+    """
+
+    def __init__(self, mongoDB: "Database", name: str = "workQueue", leaseSeconds: float = 60.0,
+                 maxAttempts: int = 5) -> None:
+        """
+        Opens the queue collection and creates its index.
+
+        :param mongoDB: The database holding the queue.
+        :type mongoDB: pymongo.database.Database
+        :param name: Optional. The name of the collection. Default is 'workQueue'.
+        :type name: str
+        """
+        import pymongo
+        import pymongo.errors
+        self.pymongo = pymongo
+
+        super().__init__(leaseSeconds, maxAttempts)
+        self.collection = mongoDB[name]
+        self.collection.create_index([("state", pymongo.ASCENDING), ("expires", pymongo.ASCENDING)])
+
+    def put(self, units: Dict[str, Any]) -> None:
+        for key, payload in units.items():
+            try:
+                self.collection.insert_one({"_id": key, "payload": payload, "state": "pending", "worker": None,
+                                            "expires": 0, "attempts": 0})
+            except self.pymongo.errors.DuplicateKeyError:
+                pass
+
+    def claim(self, worker: str, amount: int, now: float) -> List[Tuple[str, Any]]:
+        self.collection.update_many({"state": "leased", "expires": {"$lt": now},
+                                     "attempts": {"$gte": self.maxAttempts}}, {"$set": {"state": "failed"}})
+        units = []
+        while len(units) < amount:
+            unit = self.collection.find_one_and_update(
+                {"$or": [{"state": "pending"}, {"state": "leased", "expires": {"$lt": now}}]},
+                {"$set": {"state": "leased", "worker": worker, "expires": now + self.leaseSeconds},
+                 "$inc": {"attempts": 1}},
+                sort=[("_id", self.pymongo.ASCENDING)], return_document=self.pymongo.ReturnDocument.AFTER)
+            if unit is None:
+                break
+            units.append((unit["_id"], unit["payload"]))
+        return units
+
+    def extend(self, worker: str, keys: List[str], now: float) -> None:
+        self.collection.update_many({"_id": {"$in": keys}, "worker": worker, "state": "leased"},
+                                    {"$set": {"expires": now + self.leaseSeconds}})
+
+    def finish(self, worker: str, keys: List[str], state: str) -> int:
+        return self.collection.update_many({"_id": {"$in": keys}, "worker": worker, "state": "leased"},
+                                           {"$set": {"state": state, "expires": 0}}).modified_count
+
+    def fail(self, worker: str, keys: List[str]) -> int:
+        failed = self.collection.update_many({"_id": {"$in": keys}, "worker": worker, "state": "leased",
+                                              "attempts": {"$gte": self.maxAttempts}},
+                                             {"$set": {"state": "failed", "expires": 0}}).modified_count
+        self.collection.update_many({"_id": {"$in": keys}, "worker": worker, "state": "leased"},
+                                    {"$set": {"state": "pending", "expires": 0}})
+        return failed
+
+    def counts(self) -> Dict[str, int]:
+        return {group["_id"]: group["count"] for group in self.collection.aggregate(
+            [{"$group": {"_id": "$state", "count": {"$sum": 1}}}])}
@@ -0,0 +1,183 @@
+"""
+Benchmark of the crawlers against the local mock servers of MockServers.py. Runs the GerritCrawler (one query per
+user and fused queries) and every crawl mode of the BugzillaCrawler, each in its own process, and reports requests/s,
+documents/s, the p50/p99 request latency and the peak RSS. Results can be saved as baseline and later runs compared
+against it, regressions beyond the tolerance make the run fail.
+
+Run with:
+
+> python benchmarks/CrawlerBenchmark.py [--scenarios gerrit bugzilla-CFAST ...] [--latency 0.005] [--error-rate 0.01]
+> python benchmarks/CrawlerBenchmark.py --save benchmarks/baseline.json
+> python benchmarks/CrawlerBenchmark.py --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MockServers
+
+BUGZILLA_MODES = ["BUG", "COMMENT", "BOTH", "CFAST", "BFAST", "CPIPE", "BPIPE"]
+SCENARIOS = ["gerrit", "gerrit-fused"] + ["bugzilla-" + mode for mode in BUGZILLA_MODES]
+
+
+def percentile(values: List[float], share: float) -> float:
+    """
+    Returns the nearest-rank percentile of the values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def countLines(folder: str) -> int:
+    """
+    Counts the documents written into the JSON Lines files of the folder.
+    """
+    amount = 0
+    for name in os.listdir(folder):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(folder, name), "rb") as f:
+                amount += sum(1 for _ in f)
+    return amount
+
+
+def runScenario(scenario: str, url: str, args: argparse.Namespace) -> Dict:
+    """
+    Runs one crawl against the mock server at url and measures it. Called in the child process.
+    """
+    import HttpClient
+
+    #records the latency of every request
+    latencies = []
+    client = HttpClient.HttpClient(rate=args.rate, maxRate=args.max_rate)
+    client.hooks["response"].append(lambda response, *a, **k: latencies.append(response.elapsed.total_seconds()))
+
+    folder = tempfile.mkdtemp(prefix="crawlerbenchmark")
+    start = time.perf_counter()
+    if scenario.startswith("gerrit"):
+        import GerritCrawler
+        crawler = GerritCrawler.GerritCrawler(args.gerrit_page, url, foldername=folder, httpClient=client,
+                                              concurrency=args.workers,
+                                              fuseOwners=20 if scenario == "gerrit-fused" else 1)
+        crawler.enterManyUsersCommits(["user{}".format(i) for i in range(args.users)])
+    else:
+        import BugzillaCrawler
+        mode = BugzillaCrawler.CrawlMode[scenario.split("-", 1)[1]]
+        BugzillaCrawler.BugzillaCrawler(url, mode, foldername=folder, httpClient=client, workers=args.workers,
+                                        commentBatchSize=args.batch, bugList=list(range(1, args.bugs + 1)))
+    duration = time.perf_counter() - start
+
+    documents = countLines(folder)
+    shutil.rmtree(folder, ignore_errors=True)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "seconds": round(duration, 3),
+        "requests": len(latencies),
+        "retries": client.retried,
+        "documents": documents,
+        "requests/s": round(len(latencies) / duration, 1),
+        "documents/s": round(documents / duration, 1),
+        "p50 ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99 ms": round(percentile(latencies, 0.99) * 1000, 2),
+        #ru_maxrss is in KiB on Linux
+        "peak RSS MiB": round(max(usage, children) / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """
+    Prints the change against the baseline and returns the regressions.
+    """
+    regressions = []
+    print("\n{:<20} {:>14} {:>14} {:>14}".format("vs. baseline", "documents/s", "p99 ms", "peak RSS MiB"))
+    for scenario, result in results.items():
+        old = baseline.get(scenario)
+        if not old:
+            continue
+        changes = []
+        for key, higherIsBetter in (("documents/s", True), ("p99 ms", False), ("peak RSS MiB", False)):
+            change = (result[key] - old[key]) / old[key] if old[key] else 0.0
+            changes.append("{:+.1%}".format(change))
+            if (-change if higherIsBetter else change) > tolerance:
+                regressions.append("{} {}: {} -> {}".format(scenario, key, old[key], result[key]))
+        print("{:<20} {:>14} {:>14} {:>14}".format(scenario, *changes))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--users", type=int, default=300, help="Gerrit users")
+    parser.add_argument("--bugs", type=int, default=2000, help="Bugzilla bugs")
+    parser.add_argument("--gerrit-page", type=int, default=100, help="Gerrit query limit")
+    parser.add_argument("--bug-page", type=int, default=500, help="maximum Bugzilla page size")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=10, help="commentBatchSize")
+    parser.add_argument("--rate", type=float, default=20.0, help="initial requests/s of the HttpClient")
+    parser.add_argument("--max-rate", type=float, default=200.0, help="maximum requests/s of the HttpClient")
+    parser.add_argument("--save", help="saves the results as baseline into this file")
+    parser.add_argument("--compare", help="compares the results with the baseline in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against the baseline")
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    #runs one scenario in this (child) process and hands the result to the parent
+    if args.child:
+        print(json.dumps(runScenario(args.child[0], args.child[1], args)))
+        return
+
+    gerrit = MockServers.MockGerrit(args.users, pageSize=args.gerrit_page, latency=args.latency,
+                                    errorRate=args.error_rate, seed=args.seed)
+    bugzilla = MockServers.MockBugzilla(args.bugs, maxPageSize=args.bug_page, latency=args.latency,
+                                        errorRate=args.error_rate, seed=args.seed)
+    urls = {"gerrit": gerrit.start(), "bugzilla": bugzilla.start()}
+
+    #the child gets the same options, the crawl output (progress bars) is hidden
+    options = sys.argv[1:]
+    results = {}
+    print("{:<20} {:>8} {:>8} {:>10} {:>12} {:>12} {:>8} {:>8} {:>9}".format(
+        "scenario", "seconds", "requests", "documents", "requests/s", "documents/s", "p50 ms", "p99 ms", "RSS MiB"))
+    try:
+        for scenario in args.scenarios:
+            url = urls[scenario.split("-", 1)[0]]
+            output = subprocess.run([sys.executable, os.path.abspath(__file__)] + options +
+                                    ["--child", scenario, url], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    check=True).stdout.decode()
+            result = json.loads(output.strip().splitlines()[-1])
+            results[scenario] = result
+            print("{:<20} {:>8} {:>8} {:>10} {:>12} {:>12} {:>8} {:>8} {:>9}".format(
+                scenario, result["seconds"], result["requests"], result["documents"], result["requests/s"],
+                result["documents/s"], result["p50 ms"], result["p99 ms"], result["peak RSS MiB"]))
+    finally:
+        gerrit.stop()
+        bugzilla.stop()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("\nSaved baseline to " + args.save)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions beyond {:.0%}:\n  ".format(args.tolerance) + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
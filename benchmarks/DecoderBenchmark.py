@@ -0,0 +1,125 @@
+"""
+Microbenchmark of the response decoding: compares the former replace + ast.literal_eval path with the
+ResponseDecoder on synthetic Gerrit and Bugzilla pages.
+
+Run with:
+
+> python benchmarks/DecoderBenchmark.py [--repeat 5] [--changes 500] [--bugs 500]
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ResponseDecoder
+
+
+def makeGerritPage(amount: int, seed: int = 0) -> bytes:
+    """
+    Builds a synthetic Gerrit change query response including the XSSI prefix and _more_changes.
+    """
+    rng = random.Random(seed)
+    changes = []
+    for i in range(amount):
+        changes.append({
+            "id": "project~master~I{:040x}".format(rng.getrandbits(160)),
+            "project": "project", "branch": "master", "change_id": "I{:040x}".format(rng.getrandbits(160)),
+            "subject": "Change {} true false null".format(i), "status": "MERGED",
+            "created": "2019-01-01 10:00:00.000000000", "updated": "2019-01-02 10:00:00.000000000",
+            "submittable": False, "mergeable": True, "insertions": rng.randint(0, 500),
+            "deletions": rng.randint(0, 500), "_number": i, "owner": {"_account_id": 1000000 + i % 7},
+        })
+    changes[-1]["_more_changes"] = True
+    return b")]}'\n" + json.dumps(changes, indent=2).encode()
+
+
+def makeBugzillaPage(amount: int, seed: int = 0) -> bytes:
+    """
+    Builds a synthetic Bugzilla bug query response.
+    """
+    rng = random.Random(seed)
+    bugs = []
+    for i in range(amount):
+        bugs.append({
+            "id": i, "summary": "Bug {} is true or false".format(i), "status": "RESOLVED", "is_open": False,
+            "is_confirmed": True, "creation_time": "2019-01-01T10:00:00Z", "resolution": "FIXED",
+            "cc": ["user{}@example.org".format(rng.randint(0, 1000)) for _ in range(5)], "dupe_of": None,
+            "keywords": [], "whiteboard": "", "priority": "P3", "severity": "normal",
+        })
+    return json.dumps({"bugs": bugs, "faults": []}).encode()
+
+
+def legacyGerrit(body: bytes) -> List[Dict]:
+    """
+    The former decoding path of GerritQueryHandler.formatStringToList.
+    """
+    commitsString = body.decode().split("\n", 1)[1]
+    if '"_more_changes": true' in commitsString:
+        commitsString = commitsString.replace('"_more_changes": true\n', '')
+    commitsString = commitsString.replace('true', 'True').replace('false', 'False')
+    return ast.literal_eval(commitsString)
+
+
+def legacyBugzilla(body: bytes) -> List[Dict]:
+    """
+    The former decoding path of BugzillaCrawler.get_all_bugs.
+    """
+    return ast.literal_eval(body.decode().replace('true', 'True').replace('false', 'False').
+                            replace('null', 'None'))["bugs"]
+
+
+def measure(name: str, function: Callable, body: bytes, repeat: int) -> float:
+    """
+    Returns and prints the best time of repeat runs of function on body.
+    """
+    best = min(timeit.repeat(lambda: function(body), number=1, repeat=repeat))
+    print("{:<40} {:>10.2f} ms".format(name, best * 1000))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=500)
+    parser.add_argument("--bugs", type=int, default=500)
+    args = parser.parse_args()
+
+    gerritPage = makeGerritPage(args.changes)
+    bugzillaPage = makeBugzillaPage(args.bugs)
+
+    print("Gerrit page: {} changes, {} KiB".format(args.changes, len(gerritPage) // 1024))
+    legacy = measure("legacy literal_eval", legacyGerrit, gerritPage, args.repeat)
+    for backend in ResponseDecoder.BACKENDS:
+        try:
+            decoder = ResponseDecoder.ResponseDecoder(backend)
+        except ImportError:
+            continue
+        fast = measure("ResponseDecoder ({})".format(backend), decoder.decodeGerrit, gerritPage, args.repeat)
+        print("{:<40} {:>10.1f}x".format("  speedup", legacy / fast))
+
+    print("\nBugzilla page: {} bugs, {} KiB".format(args.bugs, len(bugzillaPage) // 1024))
+    legacy = measure("legacy literal_eval", legacyBugzilla, bugzillaPage, args.repeat)
+    for backend in ResponseDecoder.BACKENDS:
+        try:
+            decoder = ResponseDecoder.ResponseDecoder(backend)
+        except ImportError:
+            continue
+        fast = measure("ResponseDecoder ({})".format(backend), lambda body: decoder.loads(body)["bugs"],
+                       bugzillaPage, args.repeat)
+        print("{:<40} {:>10.1f}x".format("  speedup", legacy / fast))
+
+    chunks = [bugzillaPage[i:i + 64 * 1024] for i in range(0, len(bugzillaPage), 64 * 1024)]
+    stream = measure("ResponseDecoder.iterItems (streamed)",
+                     lambda body: list(ResponseDecoder.ResponseDecoder.iterItems(chunks, "bugs")),
+                     bugzillaPage, args.repeat)
+    print("{:<40} {:>10.1f}x".format("  speedup", legacy / stream))
+
+
+if __name__ == "__main__":
+    main()
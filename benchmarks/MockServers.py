@@ -0,0 +1,300 @@
+"""
+Local stand-ins for a Gerrit and a Bugzilla REST API with seeded synthetic data, used by the crawler benchmarks.
+Both serve from a thread of the calling process and support configurable latency, page sizes and error rates.
+
+MockGerrit implements the change query (changes/?q=owner:...) with S/n paging, _more_changes, since:, OR-fused owners,
+DETAILED_ACCOUNTS and the error of names that only match inactive accounts.
+MockBugzilla implements bug (limit/offset, include_fields/exclude_fields, last_change_time) and bug/{id}/comment
+(ids, new_since, include_fields).
+"""
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class MockServer:
+    """
+    Base of the mock servers: serves requests in a background thread, injects latency and errors and counts the
+    requests.
+    """
+
+    #path of the REST API on the server
+    root = ""
+
+    def __init__(self, latency: float = 0.0, errorRate: float = 0.0, seed: int = 0) -> None:
+        """
+        :param latency: Optional. The seconds every response is delayed. Default is 0.
+        :type latency: float
+        :param errorRate: Optional. The share of requests answered with 503 (and Retry-After: 0). Default is 0.
+        :type errorRate: float
+        :param seed: Optional. The seed of the data and the errors. Default is 0.
+        :type seed: int
+        """
+        self.latency = latency
+        self.errorRate = errorRate
+        self.errors = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = None
+
+    def start(self) -> str:
+        """
+        Starts serving on a free local port.
+
+        :return: The base url of the REST API
+        :rtype: str
+        """
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                with mock.lock:
+                    mock.requests += 1
+                    failing = mock.errors.random() < mock.errorRate
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if failing:
+                    self.reply(503, b"Service Unavailable", {"Retry-After": "0"})
+                    return
+                url = urlparse(self.path)
+                status, body = mock.handle(url.path, parse_qs(url.query))
+                self.reply(status, body)
+
+            def reply(self, status: int, body: bytes, headers: Dict[str, str] = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return "http://127.0.0.1:{}/{}".format(self.server.server_address[1], self.root)
+
+    def stop(self) -> None:
+        """
+        Stops serving.
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def handle(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, bytes]:
+        """
+        Answers a request.
+
+        :return: The status code and body
+        :rtype: Tuple[int, bytes]
+        """
+        raise NotImplementedError
+
+
+def timestamp(rng: random.Random, start: datetime.datetime, days: int) -> datetime.datetime:
+    """
+    Returns a random time within days after start.
+    """
+    return start + datetime.timedelta(seconds=rng.randrange(days * 86400))
+
+
+class MockGerrit(MockServer):
+    """
+    Mock of the Gerrit change query. The amount of changes per user is heavy-tailed: most users have only a few,
+    some have thousands.
+    """
+
+    root = "changes/"
+
+    def __init__(self, users: int = 200, inactiveRate: float = 0.05, pageSize: int = 100, latency: float = 0.0,
+                 errorRate: float = 0.0, seed: int = 0) -> None:
+        """
+        :param users: Optional. The amount of users, named user0, user1, ... Default is 200.
+        :type users: int
+        :param inactiveRate: Optional. The share of inactive users. Default is 0.05.
+        :type inactiveRate: float
+        :param pageSize: Optional. The maximum amount of changes per page (the query limit). Default is 100.
+        :type pageSize: int
+        """
+        super().__init__(latency, errorRate, seed)
+        self.pageSize = pageSize
+
+        rng = random.Random(seed)
+        start = datetime.datetime(2015, 1, 1)
+        self.accounts = {}
+        self.changes = {}
+        number = 0
+        for i in range(users):
+            name = "user{}".format(i)
+            accountID = 1000000 + i
+            self.accounts[name] = (accountID, rng.random() >= inactiveRate)
+            changes = []
+            for _ in range(min(5000, int(rng.paretovariate(1.2)) - 1)):
+                number += 1
+                created = timestamp(rng, start, 5 * 365)
+                updated = created + datetime.timedelta(seconds=rng.randrange(90 * 86400))
+                changes.append({
+                    "id": "project{}~master~I{:040x}".format(number % 17, rng.getrandbits(160)),
+                    "project": "project{}".format(number % 17), "branch": "master",
+                    "change_id": "I{:040x}".format(rng.getrandbits(160)),
+                    "subject": "Change {} of {}".format(number, name),
+                    "status": rng.choice(["MERGED", "MERGED", "MERGED", "ABANDONED", "NEW"]),
+                    "created": created.strftime("%Y-%m-%d %H:%M:%S.000000000"),
+                    "updated": updated.strftime("%Y-%m-%d %H:%M:%S.000000000"),
+                    "mergeable": rng.random() < 0.5, "insertions": rng.randrange(1000),
+                    "deletions": rng.randrange(1000), "_number": number, "owner": {"_account_id": accountID},
+                })
+            self.changes[accountID] = changes
+        self.names = {accountID: name for name, (accountID, _) in self.accounts.items()}
+
+    def users(self) -> List[str]:
+        """
+        Returns the names of all users.
+        """
+        return list(self.accounts)
+
+    def owner(self, term: str) -> Tuple[Optional[int], Optional[bytes]]:
+        """
+        Resolves an owner term (name or account id) into the account id or the error of an unknown or inactive
+        account.
+        """
+        if term.isdigit() and int(term) in self.changes:
+            return int(term), None
+        if term not in self.accounts:
+            return None, "Account '{}' not found".format(term).encode()
+        accountID, active = self.accounts[term]
+        if not active:
+            return None, ("Account '{}' only matches inactive accounts. To use an inactive account, retry with one of "
+                          "the following exact account IDs:\n{}: {} <{}@example.org>\n"
+                          .format(term, accountID, term, term)).encode()
+        return accountID, None
+
+    def handle(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, bytes]:
+        q = query.get("q", [""])[0]
+        changes = []
+        for term in re.findall(r"owner:([^\s()]+)", q):
+            accountID, error = self.owner(term)
+            if error:
+                return 400, error
+            if accountID is not None:
+                changes += self.changes[accountID]
+
+        since = re.search(r'since:"([^"]+)"', q)
+        if since:
+            changes = [change for change in changes if change["updated"][:19] >= since.group(1)]
+        changes.sort(key=lambda change: change["updated"], reverse=True)
+
+        start = int(query.get("S", ["0"])[0])
+        size = min(int(query.get("n", [self.pageSize])[0]), self.pageSize)
+        page = [dict(change) for change in changes[start:start + size]]
+
+        if "DETAILED_ACCOUNTS" in query.get("o", []):
+            for change in page:
+                name = self.names[change["owner"]["_account_id"]]
+                change["owner"] = {"_account_id": change["owner"]["_account_id"], "name": name.title(),
+                                   "email": name + "@example.org", "username": name}
+        if page and start + size < len(changes):
+            page[-1]["_more_changes"] = True
+
+        return 200, b")]}'\n" + json.dumps(page).encode()
+
+
+class MockBugzilla(MockServer):
+    """
+    Mock of the Bugzilla bug and comment resources.
+    """
+
+    root = "rest/"
+
+    def __init__(self, bugs: int = 2000, maxPageSize: int = 500, maxIDs: int = 100, latency: float = 0.0,
+                 errorRate: float = 0.0, seed: int = 0) -> None:
+        """
+        :param bugs: Optional. The amount of bugs. Default is 2000.
+        :type bugs: int
+        :param maxPageSize: Optional. The maximum amount of bugs per page. Default is 500.
+        :type maxPageSize: int
+        :param maxIDs: Optional. The maximum amount of bugs per comment request, more fail with 414. Default is 100.
+        :type maxIDs: int
+        """
+        super().__init__(latency, errorRate, seed)
+        self.maxPageSize = maxPageSize
+        self.maxIDs = maxIDs
+
+        rng = random.Random(seed)
+        start = datetime.datetime(2015, 1, 1)
+        self.bugs = []
+        self.comments = {}
+        commentID = 0
+        for id in range(1, bugs + 1):
+            created = timestamp(rng, start, 5 * 365)
+            comments = []
+            for count in range(int(rng.expovariate(1 / 6))):
+                commentID += 1
+                comments.append({
+                    "id": commentID, "bug_id": id, "count": count, "is_private": False,
+                    "creator": "user{}@example.org".format(rng.randrange(300)),
+                    "creation_time": timestamp(rng, created, 200).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "text": " ".join(rng.choice(["crash", "fix", "patch", "null", "true", "review", "test"])
+                                     for _ in range(rng.randrange(5, 80))),
+                })
+            changed = max([created.strftime("%Y-%m-%dT%H:%M:%SZ")] +
+                          [comment["creation_time"] for comment in comments])
+            self.comments[id] = comments
+            self.bugs.append({
+                "id": id, "summary": "Bug {} crashes".format(id), "status": rng.choice(["NEW", "RESOLVED"]),
+                "resolution": rng.choice(["", "FIXED", "WONTFIX"]), "product": "Product{}".format(id % 5),
+                "component": "Component{}".format(id % 11), "creation_time": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "last_change_time": changed, "creator": "user{}@example.org".format(rng.randrange(300)),
+                "cc": ["user{}@example.org".format(rng.randrange(300)) for _ in range(rng.randrange(8))],
+                "keywords": [], "whiteboard": "", "priority": "P3", "severity": "normal", "is_open": True,
+            })
+
+    def bugIDs(self) -> List[int]:
+        """
+        Returns the IDs of all bugs.
+        """
+        return [bug["id"] for bug in self.bugs]
+
+    @staticmethod
+    def project(documents: List[Dict], query: Dict[str, List[str]]) -> List[Dict]:
+        """
+        Applies include_fields and exclude_fields to the documents.
+        """
+        include = query.get("include_fields", [""])[0].split(",") if "include_fields" in query else None
+        exclude = set(query.get("exclude_fields", [""])[0].split(",")) if "exclude_fields" in query else set()
+        return [{key: value for key, value in document.items()
+                 if (include is None or key in include) and key not in exclude} for document in documents]
+
+    def handle(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, bytes]:
+        comment = re.match(r".*/bug/(\d+)/comment$", path)
+        if comment:
+            ids = [int(comment.group(1))] + [int(id) for id in query.get("ids", [])]
+            if len(ids) > self.maxIDs:
+                return 414, b"URI Too Long"
+            since = query.get("new_since", [""])[0]
+            bugs = {str(id): {"comments": self.project([c for c in self.comments.get(id, [])
+                                                        if c["creation_time"] >= since], query)} for id in ids}
+            return 200, json.dumps({"bugs": bugs, "comments": {}}).encode()
+
+        if path.endswith("/bug"):
+            bugs = self.bugs
+            since = query.get("last_change_time", [""])[0]
+            if since:
+                bugs = [bug for bug in bugs if bug["last_change_time"] >= since]
+            offset = int(query.get("offset", ["0"])[0])
+            limit = min(int(query.get("limit", [self.maxPageSize])[0]), self.maxPageSize)
+            return 200, json.dumps({"bugs": self.project(bugs[offset:offset + limit], query),
+                                    "faults": []}).encode()
+
+        return 404, b"Not Found"
@@ -0,0 +1,154 @@
+"""
+End-to-end check of the SQLiteWorkQueue against the local mock servers of MockServers.py. Several worker processes
+crawl the users of a MockGerrit (GerritCrawler.crawlQueue) and the bug ID ranges of a MockBugzilla
+(BugzillaCrawler.crawl_queue) from one queue file, each into its own folder. Some units are claimed beforehand by a
+worker that dies without crawling them, their leases have to expire and be handed out again. The check fails unless
+every unit ends up done and every change and comment is written exactly once across the folders.
+
+Run with:
+
+> python benchmarks/WorkQueueTest.py [--workers 4] [--users 100] [--bugs 1000] [--lease 2]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MockServers
+import WorkQueue
+
+
+def runWorker(kind: str, url: str, path: str, folder: str, args: argparse.Namespace) -> None:
+    """
+    Crawls the units of the queue as one worker. Called in the child process.
+    """
+    queue = WorkQueue.SQLiteWorkQueue(path, kind, leaseSeconds=args.lease)
+    if kind == "gerrit":
+        import GerritCrawler
+        crawler = GerritCrawler.GerritCrawler(100, url, foldername=folder, concurrency=4)
+        print(json.dumps({"done": crawler.crawlQueue(queue)}))
+    else:
+        import BugzillaCrawler
+        crawler = BugzillaCrawler.BugzillaCrawler(url, foldername=folder, workers=4, commentBatchSize=10)
+        print(json.dumps({"failed": crawler.crawl_queue(queue)}))
+
+
+def writtenIDs(folders: List[str], names: List[str]) -> Counter:
+    """
+    Counts how often every document id was written into the JSON Lines files of the folders.
+    """
+    ids = Counter()
+    for folder in folders:
+        for name in os.listdir(folder):
+            if name in names or (not names and name.endswith(".jsonl")):
+                with open(os.path.join(folder, name), "rb") as f:
+                    ids.update(json.loads(line)["id"] for line in f if line.strip())
+    return ids
+
+
+def check(kind: str, url: str, expected: Counter, names: List[str], args: argparse.Namespace,
+          directory: str) -> List[str]:
+    """
+    Runs the workers of one queue and returns the problems found.
+    """
+    path = os.path.join(directory, "queue.db")
+    queue = WorkQueue.SQLiteWorkQueue(path, kind, leaseSeconds=args.lease)
+    if kind == "gerrit":
+        queue.putUsers(args.userList, unitSize=2)
+    else:
+        queue.putBugIDs(args.bugList, unitSize=100)
+
+    #a worker that claims units and dies without crawling them
+    dead = [key for key, _ in queue.claimUnits("dead", 2)]
+
+    folders = [os.path.join(directory, "{}{}".format(kind, index)) + "/" for index in range(args.workers)]
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__)] + sys.argv[1:] +
+                                ["--child", kind, url, path, folder], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL) for folder in folders]
+    results = [json.loads(worker.communicate()[0].decode().strip().splitlines()[-1]) for worker in workers]
+
+    problems = []
+    if any(worker.returncode for worker in workers):
+        problems.append("{}: a worker exited with an error".format(kind))
+    counts = queue.counts()
+    if set(counts) != {"done"}:
+        problems.append("{}: units are not all done: {}".format(kind, counts))
+    if queue.doneUnits("dead", dead):
+        problems.append("{}: the dead worker still held its leases".format(kind))
+    with sqlite3.connect(path) as connection:
+        attempts = [connection.execute("SELECT attempts FROM work_queue WHERE queue = ? AND key = ?",
+                                       (kind, key)).fetchone()[0] for key in dead]
+    if attempts != [2] * len(dead):
+        problems.append("{}: the expired leases weren't handed out once more: {}".format(kind, attempts))
+
+    written = writtenIDs(folders, names)
+    missing = set(expected) - set(written)
+    duplicated = [id for id, amount in written.items() if amount > 1]
+    if missing or duplicated:
+        problems.append("{}: {} documents missing, {} written more than once".format(kind, len(missing),
+                                                                                    len(duplicated)))
+    print("{:<8} units {:<16} workers {} documents {}".format(kind, str(counts), results, sum(written.values())))
+    return problems
+
+
+def checkFailUnits(directory: str) -> List[str]:
+    """
+    Checks that failed units are handed out again until they reach maxAttempts.
+    """
+    queue = WorkQueue.SQLiteWorkQueue(os.path.join(directory, "queue.db"), "fail", maxAttempts=2)
+    queue.putUsers(["user"])
+    results = []
+    for _ in range(2):
+        key = queue.claimUnits("worker")[0][0]
+        results.append(queue.failUnits("worker", [key]))
+    if results != [0, 1] or queue.counts() != {"failed": 1}:
+        return ["failUnits: {} {}".format(results, queue.counts())]
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="worker processes per queue")
+    parser.add_argument("--users", type=int, default=100, help="Gerrit users")
+    parser.add_argument("--bugs", type=int, default=1000, help="Bugzilla bugs")
+    parser.add_argument("--lease", type=float, default=2.0, help="lease seconds of the queue")
+    parser.add_argument("--child", nargs=4, metavar=("KIND", "URL", "QUEUE", "FOLDER"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runWorker(*args.child, args)
+        return
+
+    gerrit = MockServers.MockGerrit(args.users)
+    bugzilla = MockServers.MockBugzilla(args.bugs)
+    args.userList = gerrit.users()
+    args.bugList = bugzilla.bugIDs()
+    changes = Counter(change["id"] for changes in gerrit.changes.values() for change in changes)
+    comments = Counter(comment["id"] for comments in bugzilla.comments.values() for comment in comments)
+
+    directory = tempfile.mkdtemp(prefix="workqueuetest")
+    try:
+        problems = check("gerrit", gerrit.start(), changes, [], args, directory)
+        problems += check("bugzilla", bugzilla.start(), comments, ["Bugzilla_Comments.jsonl"], args, directory)
+        problems += checkFailUnits(directory)
+    finally:
+        gerrit.stop()
+        bugzilla.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if problems:
+        print("\nFailed:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print("\nEvery unit was crawled exactly once.")
+
+
+if __name__ == "__main__":
+    main()